@@ -0,0 +1,55 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+In-process snapshot of the user allowlist.
+
+Each process keeps the emails allowed to use the app in memory, together with the
+allowlist version it was loaded at. The version lives in Django's cache and is bumped
+whenever a ``UserPermissions`` row is saved or deleted, so the processes sharing the
+cache reload their snapshots on the next request after a change. Changes made with ``QuerySet.update()``
+send no signals and must call ``bump_allowlist_version()`` themselves.
+
+With the default per-process ``LocMemCache`` other processes keep their snapshot until
+they restart.
+"""
+
+import threading
+
+from django.conf import settings
+
+from .cache_versions import CacheVersion
+
+_CACHE_ALIAS = getattr(settings, "ALLOWLIST_CACHE_ALIAS", "default")
+
+_version = CacheVersion("user-allowlist:version", _CACHE_ALIAS)
+
+_lock = threading.Lock()
+_snapshot = (None, frozenset())
+
+
+def allowlist_version():
+    return _version.get()
+
+
+def bump_allowlist_version() -> None:
+    """Makes every process that shares the cache reload its allowlist snapshot."""
+    _version.bump()
+
+
+def allowed_app_emails() -> frozenset:
+    """Returns the lowercased emails of the users allowed to use the app."""
+    global _snapshot
+    version = allowlist_version()
+    if _snapshot[0] == version:
+        return _snapshot[1]
+
+    from .models import UserPermissions
+
+    with _lock:
+        if _snapshot[0] != version:
+            emails = UserPermissions.objects.filter(allow_app=True).values_list(
+                "user_email", flat=True
+            )
+            _snapshot = (version, frozenset(email.lower() for email in emails))
+        return _snapshot[1]
@@ -0,0 +1,46 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Version counters kept in Django's cache.
+
+Data cached from the database records the version it was computed at and is discarded
+once the version moves on. A version is only seen by every process when the cache is
+shared by all of them (see ``CACHES`` in the settings).
+"""
+
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+class CacheVersion:
+    def __init__(self, key: str, alias: str = "default"):
+        self.key = key
+        self.alias = alias
+
+    def _cache(self):
+        return caches[self.alias]
+
+    def get(self) -> int:
+        version = self._cache().get(self.key)
+        if version is None:
+            # Start from the clock so a version lost from the cache never repeats an old one.
+            self._cache().add(self.key, time.time_ns(), timeout=None)
+            version = self._cache().get(self.key)
+        return version
+
+    def _increment(self):
+        try:
+            self._cache().incr(self.key)
+        except ValueError:
+            self._cache().set(self.key, time.time_ns(), timeout=None)
+
+    def bump(self) -> None:
+        """
+        Moves to a new version now, so this thread stops reading old data, and again on
+        commit, so data other requests cached from the not yet committed rows is discarded.
+        """
+        self._increment()
+        transaction.on_commit(self._increment)
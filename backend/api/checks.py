@@ -0,0 +1,32 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""System checks for deployment settings."""
+
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_shared_permission_cache(app_configs, **kwargs):
+    """
+    Folder permissions cached in one process are only invalidated in that process when the
+    cache is a LocMemCache, so a revoked grant would stay live in the other workers.
+    """
+    workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+    timeout = getattr(settings, "PERMISSION_CACHE_TIMEOUT", 5 * 60)
+    alias = getattr(settings, "PERMISSION_CACHE_ALIAS", "default")
+    if workers <= 1 or not timeout or not isinstance(caches[alias], LocMemCache):
+        return []
+    return [
+        Error(
+            f"WEB_CONCURRENCY={workers} web processes cannot share the per-process LocMemCache.",
+            hint="Configure a shared cache with CACHE_BACKEND and CACHE_LOCATION, "
+            "or set PERMISSION_CACHE_TIMEOUT=0.",
+            id="api.E001",
+        )
+    ]
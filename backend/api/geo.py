@@ -0,0 +1,145 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Bounding-box queries over waypoint coordinates.
+
+Waypoints have a composite (latitude, longitude) index, so a box is a range scan on
+latitude filtered by longitude. Results are ordered by an equirectangular distance
+from the centre of the box, which is accurate enough to rank points inside one map
+viewport and needs no spatial database extension.
+"""
+
+import math
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import (
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Abs, Least
+
+from .models import Waypoint
+
+
+@dataclass(frozen=True)
+class BoundingBox:
+    min_lon: Decimal
+    min_lat: Decimal
+    max_lon: Decimal
+    max_lat: Decimal
+
+    @classmethod
+    def parse(cls, value: str) -> "BoundingBox":
+        """
+        Parses ``minlon,minlat,maxlon,maxlat`` in degrees. *minlon* may be greater than
+        *maxlon* for a box that crosses the antimeridian. Raises ValueError.
+        """
+        parts = value.split(",")
+        if len(parts) != 4:
+            raise ValueError("Expected minlon,minlat,maxlon,maxlat")
+        try:
+            min_lon, min_lat, max_lon, max_lat = (
+                Decimal(part.strip()) for part in parts
+            )
+        except InvalidOperation:
+            raise ValueError("Coordinates must be numbers") from None
+        if not all(
+            coordinate.is_finite()
+            for coordinate in (min_lon, min_lat, max_lon, max_lat)
+        ):
+            raise ValueError("Coordinates must be numbers")
+        if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+            raise ValueError("Longitudes must be between -180 and 180")
+        if not -90 <= min_lat <= max_lat <= 90:
+            raise ValueError("Latitudes must be between -90 and 90, minimum first")
+        return cls(min_lon, min_lat, max_lon, max_lat)
+
+    @property
+    def crosses_antimeridian(self) -> bool:
+        return self.min_lon > self.max_lon
+
+    @property
+    def center(self) -> tuple:
+        """The ``(latitude, longitude)`` of the centre of the box."""
+        latitude = (self.min_lat + self.max_lat) / 2
+        longitude = (self.min_lon + self.max_lon) / 2
+        if self.crosses_antimeridian:
+            longitude = longitude + 180 if longitude <= 0 else longitude - 180
+        return latitude, longitude
+
+    def contains(self, prefix: str = "") -> Q:
+        """A filter for rows whose ``latitude`` and ``longitude`` fall inside the box."""
+        inside = Q(
+            **{
+                f"{prefix}latitude__gte": self.min_lat,
+                f"{prefix}latitude__lte": self.max_lat,
+            }
+        )
+        if self.crosses_antimeridian:
+            return inside & (
+                Q(**{f"{prefix}longitude__gte": self.min_lon})
+                | Q(**{f"{prefix}longitude__lte": self.max_lon})
+            )
+        return inside & Q(
+            **{
+                f"{prefix}longitude__gte": self.min_lon,
+                f"{prefix}longitude__lte": self.max_lon,
+            }
+        )
+
+    def distance_from_center(self, prefix: str = ""):
+        """
+        An expression for the squared distance in degrees of latitude between a row's
+        coordinates and the centre of the box, for ordering.
+        """
+        center_lat, center_lon = self.center
+        # Degrees of longitude shrink towards the poles.
+        scale = Value(
+            Decimal(math.cos(math.radians(center_lat))).quantize(Decimal("0.000001"))
+        )
+        d_lat = F(f"{prefix}latitude") - Value(center_lat)
+        d_lon = Abs(F(f"{prefix}longitude") - Value(center_lon))
+        d_lon = Least(d_lon, Value(Decimal(360)) - d_lon) * scale
+        return ExpressionWrapper(
+            d_lat * d_lat + d_lon * d_lon, output_field=FloatField()
+        )
+
+
+def waypoints_in_bbox(queryset: QuerySet, bbox: BoundingBox) -> QuerySet:
+    """The waypoints of *queryset* inside *bbox*, nearest to its centre first."""
+    return (
+        queryset.filter(bbox.contains())
+        .alias(distance=bbox.distance_from_center())
+        .order_by("distance", "id")
+    )
+
+
+def activities_in_bbox(queryset: QuerySet, bbox: BoundingBox) -> QuerySet:
+    """
+    The activities of *queryset* with a waypoint inside *bbox*, ordered by the distance
+    of their nearest such waypoint to its centre.
+    """
+    inside = Waypoint.objects.filter(bbox.contains())
+    nearest = waypoints_in_bbox(
+        Waypoint.objects.filter(group__activity=OuterRef("pk")), bbox
+    )
+    return (
+        # The index finds the waypoints in the box first; only their activities are ranked.
+        queryset.filter(id__in=inside.values("group__activity_id"))
+        .alias(
+            distance=Subquery(
+                nearest.annotate(distance=bbox.distance_from_center()).values(
+                    "distance"
+                )[:1]
+            )
+        )
+        .order_by("distance", "-created")
+    )
@@ -2,44 +2,62 @@
 # Licensed under the MIT License.
 # Copyright (c) Soundscape Community Contributors.
 
-import ipaddress
+import enum
+import hashlib
 import io
+import ipaddress
 import logging
 import os
-import enum
 import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
 from urllib.parse import urljoin, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import XMLGenerator
 
+import gpxpy
+import gpxpy.gpxfield
 import requests
-from django.db import transaction
+from django.conf import settings
+from django.core.cache import caches
 from django.core.files import File
 from django.core.files.images import ImageFile
-from django.conf import settings
-
-import gpxpy
-import gpxpy.gpx
-import gpxpy.gpxfield
-
-from .models import Activity, MediaType, WaypointGroup, Waypoint, ActivityType, WaypointMedia, WaypointGroupType
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from .model_utils import ACTIVITY_TREE_PREFETCH
+from .models import (
+    Activity,
+    ActivityType,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+    prefetched_related,
+)
 
 logger = logging.getLogger(__name__)
 
-try:
-    # Load LXML or fallback to cET or ET
-    import lxml.etree as mod_etree  # type: ignore
-except ImportError:
-    try:
-        import xml.etree.cElementTree as mod_etree  # type: ignore
-    except ImportError:
-        import xml.etree.ElementTree as mod_etree  # type: ignore
-
-
 # ---------------------------------------------------------------------------
 # URL validation helpers (SSRF protection)
 # ---------------------------------------------------------------------------
 
 _MAX_DOWNLOAD_BYTES = getattr(settings, 'GPX_MAX_DOWNLOAD_BYTES', 100 * 1024 * 1024)  # 100 MB
 _DOWNLOAD_TIMEOUT = getattr(settings, 'GPX_DOWNLOAD_TIMEOUT', 100)  # seconds
+_MAX_TOTAL_DOWNLOAD_BYTES = getattr(settings, 'GPX_MAX_TOTAL_DOWNLOAD_BYTES', 250 * 1024 * 1024)  # 250 MB
+_DOWNLOAD_WORKERS = getattr(settings, 'GPX_DOWNLOAD_WORKERS', 8)
+_DOWNLOAD_WORKERS_PER_HOST = getattr(settings, 'GPX_DOWNLOAD_WORKERS_PER_HOST', 4)
+_IMPORT_BATCH_SIZE = getattr(settings, 'GPX_IMPORT_BATCH_SIZE', 500)  # waypoints per INSERT
+_EXPORT_SPOOL_BYTES = getattr(settings, 'GPX_EXPORT_SPOOL_BYTES', 1024 * 1024)  # 1 MB
+_EXPORT_CACHE_ALIAS = getattr(settings, 'GPX_EXPORT_CACHE_ALIAS', 'default')
+_EXPORT_CACHE_TIMEOUT = getattr(settings, 'GPX_EXPORT_CACHE_TIMEOUT', 60 * 60)  # seconds
+_EXPORT_CACHE_MAX_BYTES = getattr(settings, 'GPX_EXPORT_CACHE_MAX_BYTES', 1024 * 1024)  # 1 MB
 
 
 def _is_private_ip(hostname: str) -> bool:
@@ -78,8 +96,11 @@ def _validate_url(url: str) -> None:
         raise ValueError(f"URL resolves to a private/reserved IP address: {hostname}")
 
 
-def _safe_download(url: str) -> bytes:
-    """Download *url* safely with timeout, size limit, and SSRF protection."""
+def _safe_download(url: str, budget: "_DownloadBudget | None" = None) -> bytes:
+    """Download *url* safely with timeout, size limit, and SSRF protection.
+
+    When *budget* is given, every received chunk is also charged against it.
+    """
     _validate_url(url)
     response = requests.get(url, timeout=_DOWNLOAD_TIMEOUT, stream=True, allow_redirects=False)
     try:
@@ -92,21 +113,118 @@ def _safe_download(url: str) -> bytes:
             downloaded += len(chunk)
             if downloaded > _MAX_DOWNLOAD_BYTES:
                 raise ValueError(f"Download exceeds maximum allowed size of {_MAX_DOWNLOAD_BYTES} bytes")
+            if budget is not None:
+                budget.consume(len(chunk))
             chunks.append(chunk)
         return b"".join(chunks)
     finally:
         response.close()
 
+
+class _DownloadBudget:
+    """Thread-safe byte allowance shared by all downloads of one import."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        with self._lock:
+            if self.used + size > self.max_bytes:
+                raise ValueError(f"Import exceeds maximum total download size of {self.max_bytes} bytes")
+            self.used += size
+
+
+class MediaFetcher:
+    """
+    Downloads a set of media URLs in parallel.
+
+    At most ``max_workers`` downloads run at once, and at most ``max_per_host`` of those
+    against the same host. All downloads share one byte budget. Each URL is downloaded once
+    through ``_safe_download``, so the usual SSRF checks, timeout and per-file size limit apply.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_per_host: int | None = None,
+                 max_total_bytes: int | None = None):
+        self.max_workers = max_workers or _DOWNLOAD_WORKERS
+        self.max_per_host = max_per_host or _DOWNLOAD_WORKERS_PER_HOST
+        self.budget = _DownloadBudget(max_total_bytes or _MAX_TOTAL_DOWNLOAD_BYTES)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).hostname or ''
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _download(self, url: str) -> bytes:
+        with self._host_slot(url):
+            return _safe_download(url, budget=self.budget)
+
+    def fetch(self, urls, on_download=None) -> dict:
+        """
+        Returns ``{url: content}`` for every URL that downloaded successfully.
+
+        ``on_download(done)`` is called on the calling thread each time a download
+        finishes, successfully or not.
+        """
+        urls = list(dict.fromkeys(urls))
+        results = {}
+        if not urls:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            futures = {executor.submit(self._download, url): url for url in urls}
+            for done, future in enumerate(as_completed(futures), start=1):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except (ValueError, requests.RequestException) as exc:
+                    logger.warning("Skipping media download from %s: %s", url, exc)
+                if on_download is not None:
+                    on_download(done)
+
+        return results
+
+
+class ImportProgress:
+    """
+    Receives progress notifications from ``gpx_to_activity``.
+
+    The base class ignores them. Downloads are reported before the import transaction
+    starts; ``importing`` is the last call before it.
+    """
+
+    def downloading(self, total: int) -> None:
+        pass
+
+    def media_downloaded(self, done: int) -> None:
+        pass
+
+    def importing(self) -> None:
+        pass
+
+
 GPXSC = 'https://microsoft.com/Soundscape'
 GPXSC_NS = '{gpxsc}'
 GPXSC_NS_FULL = '{' + GPXSC + '}'
 
+GPXSC_PREFIX = 'gpxsc:'
+
 GPX_NSMAP = {
     'gpxtpx': 'https://www.garmin.com/xmlschemas/TrackPointExtension/v1',
     'gpxx': 'https://www.garmin.com/xmlschemas/GpxExtensions/v3',
     'gpxsc': GPXSC
 }
 
+GPX_NS = 'http://www.topografix.com/GPX/1/1'
+XSI_NS = 'http://www.w3.org/2001/XMLSchema-instance'
+GPX_SCHEMA_LOCATION = 'http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd'
+GPX_CREATOR = 'Microsoft Soundscape Authoring Tool'
+
 
 class GPXVersion(enum.Enum):
     """
@@ -127,216 +245,408 @@ class WaypointType(enum.Enum):
     routePoint = 2
     trackPoint = 3
 
-def activity_to_gpx(activity: Activity) -> str:
-    if activity.type == ActivityType.ORIENTEERING:
-        version = GPXVersion.v1
-    else:
-        version = GPXVersion.v2
 
-    gpx = gpxpy.gpx.GPX()
-
-    gpx.nsmap = GPX_NSMAP
-    gpx.creator = 'Microsoft Soundscape Authoring Tool'
-
-    if activity.name:
-        gpx.name = activity.name
+class _GPXWriter:
+    """
+    Incremental, indented XML writer for GPX documents.
 
-    if activity.description:
-        gpx.description = activity.description
+    Elements are written to the output as soon as they are opened, so memory use does not
+    depend on the size of the activity being exported.
+    """
 
-    if activity.author_name:
-        gpx.author_name = activity.author_name
+    INDENT = '  '
 
-    if activity.author_email:
-        gpx.author_email = activity.author_email
+    def __init__(self, output):
+        self._xml = XMLGenerator(output, encoding='UTF-8', short_empty_elements=True)
+        self._has_children = []
 
-    if activity.updated:
-        gpx.time = activity.updated
+    def start_document(self):
+        self._xml.startDocument()
 
-    image_url = activity.image_url
-    if image_url:
-        gpx.link = image_url
-        gpx.link_type = 'image'
-        if activity.image_alt:
-            gpx.link_text = activity.image_alt
+    def end_document(self):
+        self._xml.ignorableWhitespace('\n')
+        self._xml.endDocument()
 
-    gpxsc_meta = mod_etree.Element(GPXSC_NS + 'meta')
+    def start(self, name: str, attrs: dict | None = None):
+        if self._has_children:
+            self._has_children[-1] = True
+            self._xml.ignorableWhitespace('\n' + self.INDENT * len(self._has_children))
+        self._xml.startElement(name, attrs or {})
+        self._has_children.append(False)
 
-    if activity.start:
-        gpxsc_meta.attrib['start'] = gpxpy.gpxfield.format_time(activity.start)
+    def end(self, name: str):
+        if self._has_children.pop():
+            self._xml.ignorableWhitespace('\n' + self.INDENT * len(self._has_children))
+        self._xml.endElement(name)
 
-    if activity.end:
-        gpxsc_meta.attrib['end'] = gpxpy.gpxfield.format_time(activity.end)
+    @contextmanager
+    def element(self, name: str, attrs: dict | None = None):
+        self.start(name, attrs)
+        yield
+        self.end(name)
 
-    if hasattr(activity, 'expires'):
-        gpxsc_meta.attrib['expires'] = 'true' if activity.expires else 'false'
+    def text_element(self, name: str, text, attrs: dict | None = None):
+        self.start(name, attrs)
+        if text:
+            self._xml.characters(str(text))
+        self.end(name)
 
-    if activity.id:
-        elem_id = mod_etree.SubElement(gpxsc_meta, GPXSC_NS + 'id')
-        elem_id.text = str(activity.id)
 
-    if activity.locale:
-        elem_locale = mod_etree.SubElement(gpxsc_meta, GPXSC_NS + 'locale')
-        elem_locale.text = activity.locale
+def _gpx_root_attrs() -> dict:
+    attrs = {'xmlns': GPX_NS}
+    for prefix, uri in sorted(GPX_NSMAP.items()):
+        attrs['xmlns:' + prefix] = uri
+    attrs['xmlns:xsi'] = XSI_NS
+    attrs['xsi:schemaLocation'] = GPX_SCHEMA_LOCATION
+    attrs['version'] = '1.1'
+    attrs['creator'] = GPX_CREATOR
+    return attrs
 
-    elem_behavior = mod_etree.SubElement(gpxsc_meta, GPXSC_NS + 'behavior')
 
-    # if version == GPXVersion.v1:
-    #     elem_behavior.text = 'ScavengerHunt'
-    # else:
-    elem_behavior.text = activity.type
+def _split_email(email: str):
+    if '@' in email:
+        email_id, _, email_domain = email.partition('@')
+        return email_id, email_domain
+    return email, 'unknown'
 
-    elem_version = mod_etree.SubElement(gpxsc_meta, GPXSC_NS + 'version')
-    elem_version.text = str(version.value)
 
-    gpx.metadata_extensions.append(gpxsc_meta)
+def write_activity_gpx(activity: Activity, output) -> None:
+    """
+    Streams the activity as a GPX document into the binary file-like *output*.
 
-    if version == GPXVersion.v1:
-        # Waypoints
-        if activity.waypoints_group is not None:
-            waypoints = activity.waypoints_group.waypoints
-            for waypoint in waypoints:
-                gpx_wps = waypoint_to_gpx(waypoint)
-                gpx.waypoints.append(gpx_wps)
+    The activity's waypoint tree is loaded with a fixed number of queries, unless it has
+    already been prefetched by the caller.
+    """
+    if activity.type == ActivityType.ORIENTEERING:
+        version = GPXVersion.v1
     else:
-        # Waypoints
-        if activity.waypoints_group is not None:
-            gpx_rte = gpxpy.gpx.GPXRoute()
-
-            waypoints = activity.waypoints_group.waypoints
-            for waypoint in waypoints:
-                gpx_rtept = waypoint_to_gpx(waypoint, type=WaypointType.routePoint)
-                gpx_rte.points.append(gpx_rtept)
-
-            gpx.routes.append(gpx_rte)
-
-        # POIs
-        if activity.pois_group is not None:
-            pois = activity.pois_group.waypoints
-            for poi in pois:
-                gpx_wps = waypoint_to_gpx(poi, type=WaypointType.waypoint)
-                gpx.waypoints.append(gpx_wps)
-
-    return gpx.to_xml()
-
-# TODO: Import the new v2 scheme
-
+        version = GPXVersion.v2
 
-def waypoint_to_gpx(waypoint: Waypoint, type: WaypointType = WaypointType.waypoint) -> gpxpy.gpx.GPXWaypoint:
-    if type == WaypointType.waypoint:
-        gpx_wps = gpxpy.gpx.GPXWaypoint()
-    elif type == WaypointType.routePoint:
-        gpx_wps = gpxpy.gpx.GPXRoutePoint()
-    elif type == WaypointType.trackPoint:
-        gpx_wps = gpxpy.gpx.GPXTrackPoint()
+    if prefetched_related(activity, 'waypointgroup_set') is None:
+        prefetch_related_objects([activity], ACTIVITY_TREE_PREFETCH)
 
-    gpx_wps.latitude = waypoint.latitude
-    gpx_wps.longitude = waypoint.longitude
+    writer = _GPXWriter(output)
+    writer.start_document()
 
-    if waypoint.name:
-        gpx_wps.name = waypoint.name
+    with writer.element('gpx', _gpx_root_attrs()):
+        _write_metadata(writer, activity, version)
 
-    if waypoint.description:
-        gpx_wps.description = waypoint.description
+        waypoints_group = activity.waypoints_group
 
-    if waypoint.departure_callout or waypoint.arrival_callout:
-        gpxsc_annotations = mod_etree.Element(GPXSC_NS + 'annotations')
+        if version == GPXVersion.v1:
+            # Waypoints
+            if waypoints_group is not None:
+                for waypoint in waypoints_group.waypoints:
+                    _write_waypoint(writer, waypoint, type=WaypointType.waypoint)
+        else:
+            # POIs
+            pois_group = activity.pois_group
+            if pois_group is not None:
+                for poi in pois_group.waypoints:
+                    _write_waypoint(writer, poi, type=WaypointType.waypoint)
 
-        if waypoint.departure_callout:
-            elem_departure = mod_etree.SubElement(gpxsc_annotations, GPXSC_NS + 'annotation')
-            elem_departure.attrib['type'] = 'departure'
-            elem_departure.text = waypoint.departure_callout
+            # Waypoints
+            if waypoints_group is not None:
+                with writer.element('rte'):
+                    for waypoint in waypoints_group.waypoints:
+                        _write_waypoint(writer, waypoint, type=WaypointType.routePoint)
 
-        if waypoint.arrival_callout:
-            elem_arrival = mod_etree.SubElement(gpxsc_annotations, GPXSC_NS + 'annotation')
-            elem_arrival.attrib['type'] = 'arrival'
-            elem_arrival.text = waypoint.arrival_callout
+    writer.end_document()
 
-        gpx_wps.extensions.append(gpxsc_annotations)
 
-    images = waypoint.images
-    audio_clips = waypoint.audio_clips
+def activity_to_gpx_file(activity: Activity):
+    """
+    Returns a rewound file object containing the activity's GPX document.
 
-    if len(images) > 0 or len(audio_clips) > 0:
-        gpxsc_links = mod_etree.Element(GPXSC_NS + 'links')
+    Small documents stay in memory; larger ones are spooled to a temporary file.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=_EXPORT_SPOOL_BYTES, mode='w+b')  # noqa: SIM115
+    write_activity_gpx(activity, output)
+    output.seek(0)
+    return output
 
-        for image in images:
-            elem_link = mod_etree.SubElement(gpxsc_links, GPXSC_NS + 'link')
-            elem_link.attrib['href'] = image.media_url
 
-            elem_text = mod_etree.SubElement(elem_link, 'text')
-            elem_text.text = image.description
+def activity_gpx_version(activity: Activity) -> str:
+    """
+    Identifies the current GPX document of an activity. Saving the activity or any of its
+    waypoint groups, waypoints or media moves ``updated``, so the version changes with it.
+    """
+    last_published = activity.last_published.isoformat() if activity.last_published else ''
+    source = f'{activity.id}:{activity.updated.isoformat()}:{last_published}'
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
 
-            elem_type = mod_etree.SubElement(elem_link, 'type')
-            elem_type.text = image.mime_type
 
-        for audio_clip in audio_clips:
-            elem_link = mod_etree.SubElement(gpxsc_links, GPXSC_NS + 'link')
-            elem_link.attrib['href'] = audio_clip.media_url
+def open_activity_gpx(activity: Activity):
+    """
+    Returns a file object with the activity's current GPX document.
 
-            elem_text = mod_etree.SubElement(elem_link, 'text')
-            elem_text.text = audio_clip.description
+    The published file is served while it is up to date. Otherwise generated documents
+    are cached by version, so repeated exports of an unchanged activity skip the database.
+    """
+    if activity.last_published and not activity.unpublished_changes \
+            and default_storage.exists(activity.gpx_file_path):
+        return default_storage.open(activity.gpx_file_path, 'rb')
 
-            elem_type = mod_etree.SubElement(elem_link, 'type')
-            elem_type.text = audio_clip.mime_type
+    cache = caches[_EXPORT_CACHE_ALIAS]
+    cache_key = f'activity-gpx:{activity_gpx_version(activity)}'
+    content = cache.get(cache_key)
+    if content is not None:
+        return io.BytesIO(content)
 
-        gpx_wps.extensions.append(gpxsc_links)
+    output = activity_to_gpx_file(activity)
+    if output.seek(0, io.SEEK_END) <= _EXPORT_CACHE_MAX_BYTES:
+        output.seek(0)
+        cache.set(cache_key, output.read(), _EXPORT_CACHE_TIMEOUT)
+    output.seek(0)
+    return output
 
-    return gpx_wps
 
+def activity_to_gpx(activity: Activity) -> str:
+    output = io.BytesIO()
+    write_activity_gpx(activity, output)
+    return output.getvalue().decode('utf-8')
+
+
+def _write_metadata(writer: _GPXWriter, activity: Activity, version: GPXVersion):
+    with writer.element('metadata'):
+        if activity.name:
+            writer.text_element('name', activity.name)
+
+        if activity.description:
+            writer.text_element('desc', activity.description)
+
+        if activity.author_name or activity.author_email:
+            with writer.element('author'):
+                if activity.author_name:
+                    writer.text_element('name', activity.author_name)
+                if activity.author_email:
+                    email_id, email_domain = _split_email(activity.author_email)
+                    writer.text_element('email', None, {'id': email_id, 'domain': email_domain})
+
+        image_url = activity.image_url
+        if image_url:
+            with writer.element('link', {'href': image_url}):
+                if activity.image_alt:
+                    writer.text_element('text', activity.image_alt)
+                writer.text_element('type', 'image')
+
+        if activity.updated:
+            writer.text_element('time', gpxpy.gpxfield.format_time(activity.updated))
+
+        meta_attrs = {}
+        if activity.start:
+            meta_attrs['start'] = gpxpy.gpxfield.format_time(activity.start)
+        if activity.end:
+            meta_attrs['end'] = gpxpy.gpxfield.format_time(activity.end)
+        meta_attrs['expires'] = 'true' if activity.expires else 'false'
+
+        with writer.element('extensions'), writer.element(GPXSC_PREFIX + 'meta', meta_attrs):
+            if activity.id:
+                writer.text_element(GPXSC_PREFIX + 'id', activity.id)
+
+            if activity.locale:
+                writer.text_element(GPXSC_PREFIX + 'locale', activity.locale)
+
+            writer.text_element(GPXSC_PREFIX + 'behavior', activity.type)
+            writer.text_element(GPXSC_PREFIX + 'version', version.value)
+
+
+_WAYPOINT_TAGS = {
+    WaypointType.waypoint: 'wpt',
+    WaypointType.routePoint: 'rtept',
+    WaypointType.trackPoint: 'trkpt',
+}
 
-@transaction.atomic
-def gpx_to_activity(gpx_file: str, user) -> Activity:
-    user_id = user.id
-    if user_id is None:
-        raise Exception("GPX import error: missing required user ID")
 
-    gpx = gpxpy.parse(gpx_file)
-    if gpx is None:
-        raise Exception("GPX import error: invalid GPX file")
+def _write_waypoint(writer: _GPXWriter, waypoint: Waypoint, type: WaypointType = WaypointType.waypoint):
+    tag = _WAYPOINT_TAGS[type]
+
+    with writer.element(tag, {'lat': str(waypoint.latitude), 'lon': str(waypoint.longitude)}):
+        if waypoint.name:
+            writer.text_element('name', waypoint.name)
+
+        if waypoint.description:
+            writer.text_element('desc', waypoint.description)
+
+        has_annotations = waypoint.departure_callout or waypoint.arrival_callout
+        media_items = list(waypoint.images) + list(waypoint.audio_clips)
+
+        if not has_annotations and not media_items:
+            return
+
+        with writer.element('extensions'):
+            if has_annotations:
+                with writer.element(GPXSC_PREFIX + 'annotations'):
+                    if waypoint.departure_callout:
+                        writer.text_element(GPXSC_PREFIX + 'annotation', waypoint.departure_callout,
+                                            {'type': 'departure'})
+                    if waypoint.arrival_callout:
+                        writer.text_element(GPXSC_PREFIX + 'annotation', waypoint.arrival_callout,
+                                            {'type': 'arrival'})
+
+            if media_items:
+                with writer.element(GPXSC_PREFIX + 'links'):
+                    for media in media_items:
+                        with writer.element(GPXSC_PREFIX + 'link', {'href': media.media_url}):
+                            writer.text_element('text', media.description)
+                            writer.text_element('type', media.mime_type)
+
+
+
+def _local_name(tag) -> str:
+    """Strips the ``{namespace}`` prefix from an ElementTree tag."""
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element, name: str) -> str | None:
+    child = next((e for e in element if _local_name(e.tag) == name), None)
+    return child.text if child is not None else None
+
+
+class _GPXMetadata:
+    """Activity-level fields read from the GPX header."""
+
+    def __init__(self):
+        self.name = None
+        self.description = None
+        self.author_name = None
+        self.author_email = None
+        self.time = None
+        self.link = None
+        self.link_text = None
+        self.link_type = None
+        self.meta = None
+
+    @property
+    def image_url(self) -> str | None:
+        if self.link and self.link_type == 'image':
+            return urljoin(settings.FILE_UPLOAD_BASE_URL, self.link)
+        return None
+
+    def read_metadata(self, metadata) -> None:
+        """Reads a GPX 1.1 ``<metadata>`` element."""
+        for element in metadata:
+            name = _local_name(element.tag)
+            if name == 'author':
+                self.author_name = _child_text(element, 'name')
+                email = next((e for e in element if _local_name(e.tag) == 'email'), None)
+                if email is not None and email.get('id') and email.get('domain'):
+                    self.author_email = f"{email.get('id')}@{email.get('domain')}"
+            elif name == 'link':
+                self.link = element.get('href')
+                self.link_text = _child_text(element, 'text')
+                self.link_type = _child_text(element, 'type')
+            elif name == 'extensions':
+                self.meta = next((e for e in element if e.tag == GPXSC_NS_FULL + 'meta'), None)
+            else:
+                self.read_header_field(element)
+
+    def read_header_field(self, element) -> None:
+        """Reads a header field; GPX 1.0 keeps these directly under ``<gpx>``."""
+        name = _local_name(element.tag)
+        if name == 'name':
+            self.name = element.text
+        elif name == 'desc':
+            self.description = element.text
+        elif name == 'time' and element.text:
+            self.time = gpxpy.gpxfield.parse_time(element.text)
+        elif name == 'author' and len(element) == 0:
+            self.author_name = element.text
+        elif name == 'email':
+            self.author_email = element.text
+
+
+def _iter_gpx_elements(gpx_file):
+    """
+    Yields every complete ``metadata``, ``wpt``, ``rte`` and ``rtept``
+    element and every direct child of ``<gpx>``, detaching each from the tree afterwards so
+    memory use stays constant however many points the file contains.
 
+    ``rte`` is yielded once it starts, before its route points.
+    """
+    stack = []
+    for event, element in ElementTree.iterparse(gpx_file, events=('start', 'end')):
+        if event == 'start':
+            if _local_name(element.tag) == 'rte' and len(stack) == 1:
+                yield element
+            stack.append(element)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        name = _local_name(element.tag)
+        if parent is None or name == 'rte':
+            continue
+        if name in ('wpt', 'rtept') or len(stack) == 1:
+            yield element
+            parent.remove(element)
+        elif name == 'trkpt':
+            # Tracks are not imported.
+            parent.remove(element)
+
+
+class _WaypointBatch:
+    """Buffers imported waypoints and media and inserts them with ``bulk_create``."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.waypoints = []
+        self.media_items = []
+
+    def add(self, waypoint: Waypoint, media_items: list) -> None:
+        self.waypoints.append(waypoint)
+        self.media_items.extend(media_items)
+        if len(self.waypoints) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.waypoints:
+            Waypoint.objects.bulk_create(self.waypoints)
+        if self.media_items:
+            WaypointMedia.objects.bulk_create(self.media_items)
+        self.waypoints = []
+        self.media_items = []
+
+
+def _activity_from_metadata(metadata: _GPXMetadata, user_id, media: dict) -> Activity:
     activity = Activity()
     activity.author_id = user_id
 
     # Metadata
-    if gpx.author_name:
-        activity.author_name = gpx.author_name
+    if metadata.author_name:
+        activity.author_name = metadata.author_name
     else:
         raise Exception("GPX import error: missing required field 'author_name'")
 
-    if gpx.author_email:
-        activity.author_email = gpx.author_email
+    if metadata.author_email:
+        activity.author_email = metadata.author_email
 
-    if gpx.name:
-        activity.name = gpx.name
+    if metadata.name:
+        activity.name = metadata.name
     else:
         raise Exception("GPX import error: missing required field 'name'")
 
-    if gpx.description:
-        activity.description = gpx.description
+    if metadata.description:
+        activity.description = metadata.description
     else:
         raise Exception("GPX import error: missing required field 'description'")
 
-    if gpx.time:
-        activity.updated = gpx.time
+    if metadata.time:
+        activity.updated = metadata.time
 
     # Image
-    if gpx.link and gpx.link_type == 'image':
-        link = urljoin(settings.FILE_UPLOAD_BASE_URL, gpx.link)
-        try:
-            image_data = _safe_download(link)
-            filename = os.path.basename(gpx.link)
-            activity.image = ImageFile(io.BytesIO(image_data), name=filename)
-
-            if gpx.link_text:
-                activity.image_alt = gpx.link_text
-        except (ValueError, requests.RequestException) as exc:
-            logger.warning("Skipping image download from %s: %s", link, exc)
+    image_url = metadata.image_url
+    if image_url in media:
+        filename = os.path.basename(metadata.link)
+        activity.image = ImageFile(io.BytesIO(media[image_url]), name=filename)
 
-    # Metadata extensions
-    gpxsc_meta = next((e for e in gpx.metadata_extensions if e.tag == (GPXSC_NS_FULL + 'meta')), None)
+        if metadata.link_text:
+            activity.image_alt = metadata.link_text
 
-    version = GPXVersion.v1
+    # Metadata extensions
+    gpxsc_meta = metadata.meta
 
     if gpxsc_meta is not None:
         if gpxsc_meta.get('expires'):
@@ -353,49 +663,201 @@ def gpx_to_activity(gpx_file: str, user) -> Activity:
                 activity.locale = sub_element.text
             elif sub_element.tag == GPXSC_NS_FULL + 'behavior':
                 activity.type = sub_element.text
-            elif sub_element.tag == GPXSC_NS_FULL + 'version':
-                version = GPXVersion(int(sub_element.text))
 
+    return activity
+
+
+def _create_activity(metadata: _GPXMetadata, user_id, media: dict):
+    activity = _activity_from_metadata(metadata, user_id, media)
     activity.save()
 
     # Waypoint Groups
     waypoints_group = WaypointGroup(activity=activity, name='Default', type=WaypointGroupType.ORDERED)
-    waypoints_group.save()
-
     pois_group = WaypointGroup(activity=activity, name='Points of Interest', type=WaypointGroupType.UNORDERED)
-    pois_group.save()
-
-    if version == GPXVersion.v1:
-        # Waypoints
-        if len(gpx.waypoints) > 0:
-            for index, gpx_waypoint in enumerate(gpx.waypoints):
-                waypoint = gpx_to_waypoint(gpx_waypoint, waypoints_group)
-                waypoint.index = index
-                waypoint.save()
-    else:
-        # Waypoints
-        if len(gpx.routes) > 0:
-            for index, gpx_route_point in enumerate(gpx.routes[0].points):
-                waypoint = gpx_to_waypoint(gpx_route_point, waypoints_group)
-                waypoint.index = index
-                waypoint.save()
-        # POIs
-        if len(gpx.waypoints) > 0:
-            for index, gpx_waypoint in enumerate(gpx.waypoints):
-                waypoint = gpx_to_waypoint(gpx_waypoint, pois_group)
-                waypoint.save()
+    WaypointGroup.objects.bulk_create([waypoints_group, pois_group])
+
+    return activity, waypoints_group, pois_group
+
+
+def _gpx_version(metadata: _GPXMetadata) -> GPXVersion:
+    if metadata.meta is not None:
+        for sub_element in metadata.meta:
+            if sub_element.tag == GPXSC_NS_FULL + 'version':
+                return GPXVersion(int(sub_element.text))
+    return GPXVersion.v1
+
+
+def _collect_media_urls(gpx_file) -> list:
+    """Returns the absolute URL of every image and media link an import would download."""
+    urls = []
+    version = GPXVersion.v1
+    route_count = 0
+    for element in _iter_gpx_elements(gpx_file):
+        name = _local_name(element.tag)
+        if name == 'metadata':
+            metadata = _GPXMetadata()
+            metadata.read_metadata(element)
+            version = _gpx_version(metadata)
+            if metadata.image_url:
+                urls.append(metadata.image_url)
+        elif name == 'rte':
+            route_count += 1
+        elif name == 'wpt' or (name == 'rtept' and version == GPXVersion.v2 and route_count == 1):
+            # Route points are only imported from version 2 files.
+            urls.extend(link.url for link in _iter_waypoint_links(element))
+    return urls
+
+
+def gpx_to_activity(gpx_file, user, progress: ImportProgress = None) -> Activity:
+    """
+    Imports an activity from a GPX upload.
+
+    The document is parsed incrementally and waypoints are inserted in batches of
+    ``GPX_IMPORT_BATCH_SIZE``, so memory use and the number of statements do not grow
+    with every point in the file. Linked media is downloaded concurrently before the
+    database transaction starts, so slow downloads never hold database locks.
+
+    *progress*, when given, is told about each stage as it starts.
+    """
+    user_id = user.id
+    if user_id is None:
+        raise Exception("GPX import error: missing required user ID")
+
+    if isinstance(gpx_file, str):
+        gpx_file = gpx_file.encode('utf-8')
+    if isinstance(gpx_file, bytes):
+        gpx_file = io.BytesIO(gpx_file)
+
+    progress = progress or ImportProgress()
+    media_urls = _collect_media_urls(gpx_file)
+    progress.downloading(len(set(media_urls)))
+    media = MediaFetcher().fetch(media_urls, on_download=progress.media_downloaded)
+    gpx_file.seek(0)
+
+    progress.importing()
+
+    return _import_gpx(gpx_file, user_id, media)
+
+
+@transaction.atomic
+def _import_gpx(gpx_file, user_id, media: dict) -> Activity:
+    metadata = _GPXMetadata()
+    activity = None
+    version = GPXVersion.v1
+    waypoints_group = None
+    pois_group = None
+    batch = _WaypointBatch(_IMPORT_BATCH_SIZE)
+    waypoint_index = 0
+    route_count = 0
+
+    for element in _iter_gpx_elements(gpx_file):
+        name = _local_name(element.tag)
+
+        if name == 'metadata':
+            metadata.read_metadata(element)
+            continue
+
+        if name not in ('wpt', 'rte', 'rtept'):
+            if activity is None:
+                metadata.read_header_field(element)
+            continue
+
+        if activity is None:
+            activity, waypoints_group, pois_group = _create_activity(metadata, user_id, media)
+            version = _gpx_version(metadata)
+
+        if name == 'rte':
+            route_count += 1
+            continue
+
+        if name == 'wpt' and version == GPXVersion.v1:
+            # Waypoints
+            waypoint, media_items = gpx_to_waypoint(element, waypoints_group, media)
+            waypoint.index = waypoint_index
+            waypoint_index += 1
+        elif name == 'wpt':
+            # POIs
+            waypoint, media_items = gpx_to_waypoint(element, pois_group, media)
+        elif version == GPXVersion.v2 and route_count == 1:
+            # Waypoints
+            waypoint, media_items = gpx_to_waypoint(element, waypoints_group, media)
+            waypoint.index = waypoint_index
+            waypoint_index += 1
+        else:
+            continue
+
+        batch.add(waypoint, media_items)
+
+    if activity is None:
+        # A GPX file without any points still creates an (empty) activity.
+        activity, waypoints_group, pois_group = _create_activity(metadata, user_id, media)
+
+    batch.flush()
+
+    # Bulk inserts skip the per-row pre_save receivers, so mark the activity changed once.
+    activity.child_entity_did_update()
 
     return activity
 
 
-def gpx_to_waypoint(gpx_waypoint: gpxpy.gpx.GPXWaypoint, waypoint_group: WaypointGroup) -> Waypoint:
-    activity_waypoint = Waypoint(latitude=gpx_waypoint.latitude,
-                                 longitude=gpx_waypoint.longitude,
+@dataclass(frozen=True)
+class _WaypointLink:
+    url: str
+    mime_type: str
+    type: MediaType
+    description: str
+
+
+def _iter_waypoint_links(gpx_waypoint):
+    """Yields the importable ``gpxsc:link`` media of a ``wpt`` or ``rtept`` element."""
+    extensions = next((e for e in gpx_waypoint if _local_name(e.tag) == 'extensions'), [])
+    gpxsc_links = next((e for e in extensions if e.tag == (GPXSC_NS_FULL + 'links')), None)
+    if gpxsc_links is None:
+        return
+
+    for gpxsc_link in gpxsc_links:
+        href = gpxsc_link.attrib.get('href')
+        if href is None:
+            continue
+
+        mime_type = _child_text(gpxsc_link, 'type')
+        if mime_type is None:
+            continue
+
+        if mime_type.startswith('image'):
+            type = MediaType.IMAGE
+        elif mime_type.startswith('audio'):
+            type = MediaType.AUDIO
+        else:
+            continue
+
+        description = _child_text(gpxsc_link, 'text')
+        if description is None:
+            description = ''
+
+        yield _WaypointLink(urljoin(settings.FILE_UPLOAD_BASE_URL, href), mime_type, type, description)
+
+
+def gpx_to_waypoint(gpx_waypoint, waypoint_group: WaypointGroup, media: dict):
+    """
+    Builds an unsaved waypoint, and its unsaved media items, from a ``wpt`` or ``rtept`` element.
+
+    *media* maps link URLs to their downloaded content; links that failed to download are skipped.
+    """
+    latitude = gpx_waypoint.get('lat')
+    longitude = gpx_waypoint.get('lon')
+    if latitude is None or longitude is None:
+        raise Exception("GPX import error: waypoint is missing its coordinates")
+
+    activity_waypoint = Waypoint(latitude=Decimal(latitude),
+                                 longitude=Decimal(longitude),
                                  group=waypoint_group,
-                                 name=gpx_waypoint.name)
-    activity_waypoint.description = gpx_waypoint.description
+                                 name=_child_text(gpx_waypoint, 'name'))
+    activity_waypoint.description = _child_text(gpx_waypoint, 'desc')
+
+    extensions = next((e for e in gpx_waypoint if _local_name(e.tag) == 'extensions'), [])
 
-    gpxsc_annotations = next((e for e in gpx_waypoint.extensions if e.tag == (GPXSC_NS_FULL + 'annotations')), None)
+    gpxsc_annotations = next((e for e in extensions if e.tag == (GPXSC_NS_FULL + 'annotations')), None)
 
     if gpxsc_annotations is not None:
         for sub_element in gpxsc_annotations:
@@ -404,46 +866,17 @@ def gpx_to_waypoint(gpx_waypoint: gpxpy.gpx.GPXWaypoint, waypoint_group: Waypoin
             elif sub_element.attrib.get('type') == 'departure':
                 activity_waypoint.departure_callout = sub_element.text
 
-    gpxsc_links = next((e for e in gpx_waypoint.extensions if e.tag == (GPXSC_NS_FULL + 'links')), None)
-
     # Waypoint Media
-    if gpxsc_links is not None:
-        activity_waypoint.save()
-
-        for gpxsc_link in gpxsc_links:
-            href = gpxsc_link.attrib.get('href')
-            if href is None:
-                continue
-
-            href = urljoin(settings.FILE_UPLOAD_BASE_URL, href)
-            try:
-                media_data = _safe_download(href)
-            except (ValueError, requests.RequestException) as exc:
-                logger.warning("Skipping media download from %s: %s", href, exc)
-                continue
-
-            filename = os.path.basename(href)
-            media = File(io.BytesIO(media_data), name=filename)
-
-            mime_type_element = next((e for e in gpxsc_link if e.tag == 'type'), None)
-            if mime_type_element is None:
-                continue
-
-            if mime_type_element.text.startswith('image'):
-                type = MediaType.IMAGE
-            elif mime_type_element.text.startswith('audio'):
-                type = MediaType.AUDIO
-            else:
-                continue
-
-            description_element = next((e for e in gpxsc_link if e.tag == 'text'), None)
-            description = description_element.text if description_element is not None else ''
-
-            waypoint_media = WaypointMedia(waypoint=activity_waypoint,
-                                           media=media,
-                                           type=type,
-                                           mime_type=mime_type_element.text,
-                                           description=description)
-            waypoint_media.save()
-
-    return activity_waypoint
+    media_items = []
+    for link in _iter_waypoint_links(gpx_waypoint):
+        if link.url not in media:
+            continue
+
+        filename = os.path.basename(link.url)
+        media_items.append(WaypointMedia(waypoint=activity_waypoint,
+                                         media=File(io.BytesIO(media[link.url]), name=filename),
+                                         type=link.type,
+                                         mime_type=link.mime_type,
+                                         description=link.description))
+
+    return activity_waypoint, media_items
@@ -0,0 +1,262 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Background GPX imports.
+
+An upload is stored on an ``ImportJob`` row and the job table is the queue: workers claim
+the oldest queued job with a conditional UPDATE, so threads in the web process and
+``manage.py process_import_jobs`` workers can share it without an external broker.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .gpx_utils import ImportProgress, gpx_to_activity
+from .models import ImportJob, ImportJobStatus, Waypoint
+
+logger = logging.getLogger(__name__)
+
+_RUN_IN_PROCESS = getattr(settings, "IMPORT_JOBS_RUN_IN_PROCESS", True)
+_WORKERS = getattr(settings, "IMPORT_JOB_WORKERS", 2)
+_STALE_AFTER = getattr(settings, "IMPORT_JOB_STALE_AFTER", 5 * 60)  # seconds
+_HEARTBEAT_INTERVAL = getattr(settings, "IMPORT_JOB_HEARTBEAT", 30)  # seconds
+_PROGRESS_INTERVAL = 0.5  # seconds between media download progress writes
+
+INVALID_GPX_MESSAGE = "Invalid activity. Please use a previously exported GPX file containing the activity."
+INTERRUPTED_MESSAGE = "The import was interrupted. Please try again."
+
+RUNNING_STATUSES = (ImportJobStatus.DOWNLOADING, ImportJobStatus.IMPORTING)
+
+
+def enqueue_import_job(upload, user) -> ImportJob:
+    """Stores *upload* and queues it for import once the current transaction commits."""
+    job = ImportJob(user=user)
+    job.upload.save("upload.gpx", upload, save=False)
+    job.save()
+
+    if _RUN_IN_PROCESS:
+        transaction.on_commit(_dispatch)
+
+    return job
+
+
+def claim_next_import_job() -> ImportJob | None:
+    """Marks the oldest queued job as started and returns it, or None when the queue is empty."""
+    while True:
+        job_id = (
+            ImportJob.objects.filter(status=ImportJobStatus.QUEUED)
+            .order_by("created")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(
+            id=job_id, status=ImportJobStatus.QUEUED
+        ).update(status=ImportJobStatus.DOWNLOADING, started=now, updated=now)
+        if claimed:
+            job = ImportJob.objects.select_related("user").get(id=job_id)
+            job.stage_timings = {
+                "queued": round((now - job.created).total_seconds(), 3)
+            }
+            job.save(update_fields=["stage_timings", "updated"])
+            return job
+        # Another worker claimed it first.
+
+
+def _record_heartbeat(job_id) -> None:
+    ImportJob.objects.filter(id=job_id, status__in=RUNNING_STATUSES).update(
+        updated=timezone.now()
+    )
+
+
+def _beat(job_id, stopped: threading.Event) -> None:
+    try:
+        while not stopped.wait(_HEARTBEAT_INTERVAL):
+            _record_heartbeat(job_id)
+    except Exception:
+        logger.exception("GPX import job %s heartbeat failed", job_id)
+    finally:
+        connections.close_all()
+
+
+class _JobProgress(ImportProgress):
+    """
+    Records the progress and per-stage timings of an import on its job row. While the
+    import runs, a heartbeat keeps bumping ``updated`` so that ``fail_stale_import_jobs``
+    can tell a slow stage (parsing, a large download, the import transaction) from a
+    worker that died.
+    """
+
+    def __init__(self, job: ImportJob):
+        self.job = job
+        self.stage = "scan"
+        self.stage_started = time.monotonic()
+        self.last_write = 0.0
+
+    def _save(self, **fields):
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+        self.job.save(update_fields=[*fields, "stage_timings", "updated"])
+        self.last_write = time.monotonic()
+
+    def _end_stage(self):
+        if self.stage is not None:
+            self.job.stage_timings[self.stage] = round(
+                time.monotonic() - self.stage_started, 3
+            )
+        self.stage = None
+
+    def _begin_stage(self, stage: str, **fields):
+        self._end_stage()
+        self.stage = stage
+        self.stage_started = time.monotonic()
+        self._save(**fields)
+
+    def downloading(self, total: int) -> None:
+        self._begin_stage(
+            "download", status=ImportJobStatus.DOWNLOADING, media_total=total
+        )
+
+    def media_downloaded(self, done: int) -> None:
+        if (
+            done == self.job.media_total
+            or time.monotonic() - self.last_write >= _PROGRESS_INTERVAL
+        ):
+            self._save(media_downloaded=done)
+
+    def importing(self) -> None:
+        self._begin_stage("import", status=ImportJobStatus.IMPORTING)
+
+    def finish(self, **fields) -> None:
+        self._end_stage()
+        self._save(finished=timezone.now(), **fields)
+
+    @contextmanager
+    def heartbeat(self):
+        stopped = threading.Event()
+        beat = threading.Thread(
+            target=_beat,
+            args=(self.job.id, stopped),
+            name=f"gpx-import-heartbeat-{self.job.id}",
+            daemon=True,
+        )
+        beat.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            beat.join()
+
+
+def _error_message(exc: Exception) -> str:
+    if isinstance(exc, ElementTree.ParseError):
+        return f"Invalid GPX file: {exc}"
+    message = str(exc)
+    if message.startswith("GPX import error"):
+        return message
+    return INVALID_GPX_MESSAGE
+
+
+def run_import_job(job: ImportJob) -> ImportJob:
+    """Imports a claimed job's upload and records the outcome. The upload is deleted afterwards."""
+    progress = _JobProgress(job)
+    try:
+        with progress.heartbeat(), job.upload.open("rb") as upload:
+            activity = gpx_to_activity(upload, job.user, progress=progress)
+    except Exception as exc:
+        logger.exception("GPX import job %s failed", job.id)
+        progress.finish(status=ImportJobStatus.FAILED, error=_error_message(exc))
+    else:
+        waypoint_count = Waypoint.objects.filter(group__activity=activity).count()
+        progress.finish(
+            status=ImportJobStatus.SUCCEEDED,
+            activity=activity,
+            waypoint_count=waypoint_count,
+        )
+
+    job.delete_upload()
+    job.upload = None
+    job.save(update_fields=["upload", "updated"])
+    return job
+
+
+def process_import_jobs(limit: int | None = None) -> int:
+    """Runs queued jobs until the queue is empty (or *limit* jobs ran) and returns how many ran."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_import_job()
+        if job is None:
+            break
+        run_import_job(job)
+        processed += 1
+    return processed
+
+
+def fail_stale_import_jobs(stale_after: int = _STALE_AFTER) -> int:
+    """Fails running jobs whose worker stopped sending heartbeats, e.g. after a restart."""
+    now = timezone.now()
+    return ImportJob.objects.filter(
+        status__in=RUNNING_STATUSES, updated__lt=now - timedelta(seconds=stale_after)
+    ).update(
+        status=ImportJobStatus.FAILED,
+        error=INTERRUPTED_MESSAGE,
+        finished=now,
+        updated=now,
+    )
+
+
+# In-process worker pool
+
+_executor = None
+_executor_lock = threading.Lock()
+_RECOVER_UID = "api.import_jobs.recover"
+
+
+def start_in_process_worker():
+    """
+    Called by the WSGI and ASGI applications. Once the process serves its first request,
+    fails the jobs a previous process left running and imports the ones still queued,
+    rather than waiting for the next upload. Starting on a request rather than at import
+    time keeps the pool out of management commands and out of a pre-forking master.
+    """
+    if _RUN_IN_PROCESS:
+        request_started.connect(_recover, dispatch_uid=_RECOVER_UID)
+
+
+def _recover(**kwargs):
+    request_started.disconnect(dispatch_uid=_RECOVER_UID)
+    _dispatch()
+
+
+def _dispatch():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_WORKERS, thread_name_prefix="gpx-import"
+            )
+    _executor.submit(_drain)
+
+
+def _drain():
+    try:
+        fail_stale_import_jobs()
+        process_import_jobs()
+    except Exception:
+        logger.exception("GPX import worker failed")
+    finally:
+        connections.close_all()
@@ -0,0 +1,170 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import io
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.models import (
+    Folder,
+    FolderPermissionAccess,
+    FolderTeamPermission,
+    FolderUserPermission,
+)
+from api.permissions import (
+    _granted_folder_paths,
+    _granted_folders,
+    _recursive_subtree_folder_ids,
+    _subtree_folder_ids,
+)
+from users.models import Team, TeamMembership
+
+
+def _breadth_first_subtree_ids(user, access=None) -> set:
+    """The level-by-level walk used before folders had materialised paths, kept as a baseline."""
+    accessible = set(_granted_folders(user, access).values_list("id", flat=True))
+    frontier = set(accessible)
+    while frontier:
+        child_ids = set(
+            Folder.objects.filter(parent_id__in=frontier)
+            .exclude(id__in=accessible)
+            .values_list("id", flat=True)
+        )
+        accessible |= child_ids
+        frontier = child_ids
+    return accessible
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+STRATEGIES = {
+    "breadth-first": _breadth_first_subtree_ids,
+    "materialised path": lambda user, access=None: _subtree_folder_ids(
+        _granted_folder_paths(user, access)
+    ),
+    "recursive CTE": _recursive_subtree_folder_ids,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark accessible/writable folder lookups on a folder tree seeded by "
+        "seed_activities. The seeded data is rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--folders", type=int, default=10, help="Root folder count."
+        )
+        parser.add_argument(
+            "--children", type=int, default=3, help="Child folders per parent."
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=7,
+            help="Folder depth (the defaults seed about 11k folders).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per strategy; the best time is reported.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded users, team and folders.",
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(1, options["repeat"])
+
+        with transaction.atomic():
+            member = self._seed(options)
+            self.stdout.write(
+                f"Database: {connection.vendor}. Folders: {Folder.objects.count()}. "
+                f"Best of {repeat} runs.\n"
+            )
+            for label, access in (
+                ("accessible", None),
+                ("writable", FolderPermissionAccess.WRITE),
+            ):
+                self._compare(label, member, access, repeat)
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def _seed(self, options):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        owner = User.objects.create_user(username=f"benchmark-owner-{suffix}")
+        member = User.objects.create_user(username=f"benchmark-member-{suffix}")
+        team = Team.objects.create(name=f"Benchmark {suffix}", owner=owner)
+        TeamMembership.objects.create(team=team, user=member)
+
+        self.stdout.write("Seeding folders...")
+        started = time.perf_counter()
+        call_command(
+            "seed_activities",
+            count=0,
+            with_folders=True,
+            folders=options["folders"],
+            children=options["children"],
+            depth=options["depth"],
+            user=owner.username,
+            stdout=io.StringIO(),
+        )
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s.")
+
+        # The team reads every tree; the member writes the first one directly.
+        roots = list(
+            Folder.objects.filter(owner=owner, parent__isnull=True).order_by("name")
+        )
+        if not roots:
+            raise CommandError(
+                "No folders were seeded. Use --folders and --depth greater than zero."
+            )
+        FolderTeamPermission.objects.bulk_create(
+            FolderTeamPermission(
+                folder=root, team=team, access=FolderPermissionAccess.READ
+            )
+            for root in roots
+        )
+        FolderUserPermission.objects.create(
+            folder=roots[0], user=member, access=FolderPermissionAccess.WRITE
+        )
+        return member
+
+    def _compare(self, label, user, access, repeat):
+        results = {}
+        for name, strategy in STRATEGIES.items():
+            timings = []
+            for _ in range(repeat):
+                queries = _QueryCounter()
+                with connection.execute_wrapper(queries):
+                    started = time.perf_counter()
+                    folder_ids = strategy(user, access)
+                    timings.append(time.perf_counter() - started)
+            results[name] = folder_ids
+            self.stdout.write(
+                f"{label:>10} | {name:<17} | {min(timings) * 1000:8.1f} ms | "
+                f"{queries.count:4d} queries | {len(folder_ids)} folders"
+            )
+
+        if len({frozenset(folder_ids) for folder_ids in results.values()}) != 1:
+            raise CommandError(f"Strategies disagree on the {label} folders.")
@@ -0,0 +1,45 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.import_jobs import fail_stale_import_jobs, process_import_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued GPX import jobs. Run several processes to import in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the queue is empty."
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before checking an empty queue again.",
+        )
+
+    def handle(self, *args, **options):
+        once = options["once"]
+        poll_interval = max(0.1, options["poll_interval"])
+
+        while True:
+            stale = fail_stale_import_jobs()
+            if stale:
+                self.stderr.write(
+                    f"Marked {stale} interrupted import job(s) as failed."
+                )
+
+            processed = process_import_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} import job(s).")
+
+            if once:
+                return
+            if not processed:
+                time.sleep(poll_interval)
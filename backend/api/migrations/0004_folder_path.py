@@ -0,0 +1,41 @@
+# Copyright (c) Soundscape Community Contributors.
+# Generated by Django 5.2.18 on 2026-10-18 00:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_folder_paths(apps, schema_editor):
+    Folder = apps.get_model("api", "Folder")
+    paths = {}
+    level = list(Folder.objects.filter(parent__isnull=True))
+    while level:
+        for folder in level:
+            folder.path = f"{paths.get(folder.parent_id, '')}{folder.id}/"
+            paths[folder.id] = folder.path
+        Folder.objects.bulk_update(level, ["path"], batch_size=500)
+        level = list(
+            Folder.objects.filter(parent_id__in=[folder.id for folder in level])
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0003_import_job"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="folder",
+            name="path",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.RunPython(populate_folder_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="folder",
+            index=models.Index(
+                fields=["path"], name="folder_path", opclasses=["text_pattern_ops"]
+            ),
+        ),
+    ]
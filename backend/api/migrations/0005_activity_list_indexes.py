@@ -0,0 +1,25 @@
+# Copyright (c) Soundscape Community Contributors.
+# Generated by Django 5.2.18 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0004_folder_path"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activity",
+            index=models.Index(
+                fields=["author_id", "-created"], name="activity_author_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="activity",
+            index=models.Index(
+                fields=["folder", "-created"], name="activity_folder_created"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Copyright (c) Soundscape Community Contributors.
+# Generated by Django 5.2.18 on 2026-10-18 01:30
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # The search document is only maintained on PostgreSQL.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    quote = schema_editor.quote_name
+    activities = quote(apps.get_model("api", "Activity")._meta.db_table)
+    groups = quote(apps.get_model("api", "WaypointGroup")._meta.db_table)
+    waypoints = quote(apps.get_model("api", "Waypoint")._meta.db_table)
+    config = getattr(settings, "ACTIVITY_SEARCH_CONFIG", "english")
+
+    # The same document as api.models.activity_search_document().
+    schema_editor.execute(
+        f"UPDATE {activities} AS a SET search_document ="
+        " setweight(to_tsvector(%s::regconfig, COALESCE(a.name, '')), 'A')"
+        " || setweight(to_tsvector(%s::regconfig, COALESCE(a.description, '')), 'B')"
+        " || setweight(to_tsvector(%s::regconfig, COALESCE(("
+        "   SELECT string_agg(concat_ws(' ', w.name, w.description, w.departure_callout, w.arrival_callout), ' ')"
+        f"   FROM {waypoints} AS w JOIN {groups} AS g ON g.id = w.group_id"
+        "   WHERE g.activity_id = a.id"
+        " ), '')), 'C')",
+        [config, config, config],
+    )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS activity_search_document ON {activities} USING gin (search_document)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS activity_search_document")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0005_activity_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="activity",
+            name="search_document",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Copyright (c) Soundscape Community Contributors.
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0006_activity_search_document"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="waypoint",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="waypoint_lat_lon"
+            ),
+        ),
+    ]
@@ -1,16 +1,74 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from .models import Activity, WaypointGroup, Waypoint, WaypointMedia
+import uuid
+
 from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Activity,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+    mark_activity_changed,
+)
+
+# Groups -> waypoints -> media, loaded with one query per level.
+ACTIVITY_TREE_PREFETCH = 'waypointgroup_set__waypoint_set__waypointmedia_set'
+
+
+def prefetch_activity_tree(queryset: QuerySet) -> QuerySet:
+    """
+    Loads the waypoint groups, waypoints and media of every activity in the queryset
+    up front, so serializing an activity costs a fixed number of queries.
+    """
+    return queryset.prefetch_related(ACTIVITY_TREE_PREFETCH)
+
+
+def _count_per_activity(queryset: QuerySet, activity_field: str):
+    counts = (
+        queryset.filter(**{activity_field: OuterRef('pk')})
+        .order_by()
+        .values(activity_field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def annotate_activity_counts(queryset: QuerySet) -> QuerySet:
+    """
+    Adds ``waypoint_count``, ``poi_count`` and ``media_count`` to every activity in the
+    queryset, computed by correlated subqueries in the same query.
+    """
+    return queryset.annotate(
+        waypoint_count=_count_per_activity(
+            Waypoint.objects.filter(group__type=WaypointGroupType.ORDERED), 'group__activity'
+        ),
+        poi_count=_count_per_activity(
+            Waypoint.objects.filter(group__type=WaypointGroupType.UNORDERED), 'group__activity'
+        ),
+        media_count=_count_per_activity(WaypointMedia.objects.all(), 'waypoint__group__activity'),
+    )
 
 
 @transaction.atomic
 def duplicate_activity(activity: Activity) -> Activity:
-    waypoint_groups = activity.waypoint_groups_all
+    """
+    Copies an activity with its waypoint groups, waypoints and media. The tree is read
+    with one query per level and written with one bulk insert per level. Media files
+    are shared with the original rather than copied.
+    """
+    groups = list(WaypointGroup.objects.filter(activity=activity))
+    waypoints = list(Waypoint.objects.filter(group__activity=activity))
+    media_items = list(WaypointMedia.objects.filter(waypoint__group__activity=activity))
 
     # TODO: duplicate featured image
-    activity.name = '{} copy'.format(activity.name)
+    activity.name = f'{activity.name} copy'
     activity.pk = None
     activity.id = None
     activity.last_published = None
@@ -18,55 +76,157 @@ def duplicate_activity(activity: Activity) -> Activity:
     activity._state.adding = True
     activity.save()
 
-    for group in waypoint_groups.iterator():
-        duplicate_waypoint_group(group=group, activity=activity)
-
-    return activity
-
+    group_ids = _assign_new_ids(groups)
+    for group in groups:
+        group.activity = activity
+    WaypointGroup.objects.bulk_create(groups)
 
-@transaction.atomic
-def duplicate_waypoint_group(group: WaypointGroup, activity: Activity):
-    waypoints = group.waypoints
-
-    group.activity = activity
-    group.pk = None
-    group.id = None
-    group._state.adding = True
-    group.save()
+    waypoint_ids = _assign_new_ids(waypoints)
+    for waypoint in waypoints:
+        waypoint.group_id = group_ids[waypoint.group_id]
+    Waypoint.objects.bulk_create(waypoints)
 
-    for waypoint in waypoints.iterator():
-        duplicate_waypoint(waypoint=waypoint, group=group)
+    _assign_new_ids(media_items)
+    for waypoint_media in media_items:
+        waypoint_media.waypoint_id = waypoint_ids[waypoint_media.waypoint_id]
+    WaypointMedia.objects.bulk_create(media_items)
 
-# TODO: support waypoint media
+    # The bulk inserts send no signals; this also rebuilds the copy's search document.
+    mark_activity_changed(activity_id=activity.id)
+    return activity
 
 
-def duplicate_waypoint(waypoint: Waypoint, group: WaypointGroup):
-    waypoint_media_items = waypoint.media_items
+def _assign_new_ids(instances: list) -> dict:
+    """Turns loaded rows into unsaved copies, returning a map of old to new primary keys."""
+    new_ids = {}
+    for instance in instances:
+        new_id = uuid.uuid4()
+        new_ids[instance.pk] = new_id
+        instance.pk = new_id
+        instance._state.adding = True
+    return new_ids
+
+
+def shift_waypoints_after_delete(group: WaypointGroup, deleted_index: int | None):
+    """
+    Closes the gap left by a deleted waypoint with two UPDATEs, whatever the route length.
+    Lowering every later index in one statement could collide with ``unique_group_index``
+    part way through, so the later waypoints first move to negative indexes. A waypoint
+    without an index left no gap.
+    """
+    if deleted_index is None:
+        return
+
+    later_waypoints = Waypoint.objects.filter(group=group, index__gt=deleted_index)
+    if not later_waypoints.update(index=-F('index')):
+        return
+
+    Waypoint.objects.filter(group=group, index__lt=-deleted_index).update(
+        index=-F('index') - 1,
+        updated=timezone.now(),
+    )
+    mark_activity_changed(activity_id=group.activity_id)
+
+
+def renumber_waypoints(waypoints: list) -> bool:
+    """
+    Gives the waypoints of an ordered group the indexes 0, 1, ... in list order, writing
+    only those that move. The moved waypoints first take negative indexes so that no
+    intermediate state breaks ``unique_group_index``. Returns whether anything moved.
+    """
+    moved = [(index, waypoint) for index, waypoint in enumerate(waypoints) if waypoint.index != index]
+    if not moved:
+        return False
+
+    for offset, (_, waypoint) in enumerate(moved):
+        waypoint.index = -(offset + 1)
+    Waypoint.objects.bulk_update([waypoint for _, waypoint in moved], ['index'])
+
+    updated_at = timezone.now()
+    for index, waypoint in moved:
+        waypoint.index = index
+        waypoint.updated = updated_at
+    Waypoint.objects.bulk_update([waypoint for _, waypoint in moved], ['index', 'updated'])
+    return True
 
-    waypoint.group = group
-    waypoint.pk = None
-    waypoint.id = None
-    waypoint._state.adding = True
-    waypoint.save()
 
-    for waypoint_media in waypoint_media_items.iterator():
-        duplicate_waypoint_media(waypoint_media=waypoint_media, waypoint=waypoint)
+@transaction.atomic
+def apply_waypoint_batch(group: WaypointGroup, waypoints: list, creates: list, updates: list, delete_ids: set) -> list:
+    """
+    Applies a batch of waypoint changes to *group* with a fixed number of statements.
+
+    *waypoints* are the group's waypoints in index order, *creates* the field values of
+    new waypoints and *updates* pairs of an existing waypoint and its new field values.
+    Ordered groups are renumbered after the deletes and new waypoints are appended to
+    the end. Returns the created waypoints.
+    """
+    if delete_ids:
+        Waypoint.objects.filter(group=group, id__in=delete_ids).delete()
+
+    remaining = [waypoint for waypoint in waypoints if waypoint.id not in delete_ids]
+    ordered = group.type == WaypointGroupType.ORDERED
+    if ordered:
+        renumber_waypoints(remaining)
+
+    if updates:
+        updated_at = timezone.now()
+        fields = {'updated'}
+        for waypoint, values in updates:
+            for field, value in values.items():
+                setattr(waypoint, field, value)
+            waypoint.updated = updated_at
+            fields.update(values)
+        Waypoint.objects.bulk_update([waypoint for waypoint, _ in updates], sorted(fields))
+
+    created = [
+        Waypoint(group=group, index=len(remaining) + offset if ordered else None, **values)
+        for offset, values in enumerate(creates)
+    ]
+    Waypoint.objects.bulk_create(created)
+
+    if delete_ids or updates or created:
+        mark_activity_changed(activity_id=group.activity_id)
+    return created
 
 
 @transaction.atomic
-def duplicate_waypoint_media(waypoint_media: WaypointMedia, waypoint: Waypoint):
-    waypoint_media.waypoint = waypoint
-    waypoint_media.pk = None
-    waypoint_media.id = None
-    waypoint_media._state.adding = True
-    waypoint_media.save()
-
-
-def shift_waypoints_after_delete(group: WaypointGroup, deleted_index: int):
-    # Get all waypoints after the deleted index
-    greater_waypoints = Waypoint.objects.filter(group=group, index__gt=deleted_index)
-
-    # Decrease their index
-    for waypoint in greater_waypoints.iterator():
-        waypoint.index -= 1
-        waypoint.save()
+def append_return_route(group: WaypointGroup, waypoints: list) -> list:
+    """
+    Appends the way back to an ordered group: every waypoint but the last, in reverse.
+    *waypoints* are the group's waypoints in index order with their media prefetched.
+    The copies share the original media files. Returns the new waypoints.
+    """
+    if len(waypoints) < 2:
+        return []
+
+    return_waypoints = []
+    return_media = []
+    next_index = len(waypoints)
+    for waypoint in reversed(waypoints[:-1]):
+        return_waypoint = Waypoint(
+            group=group,
+            index=next_index,
+            name=waypoint.name,
+            description=waypoint.description,
+            departure_callout=waypoint.departure_callout,
+            arrival_callout=waypoint.arrival_callout,
+            latitude=waypoint.latitude,
+            longitude=waypoint.longitude,
+        )
+        return_waypoints.append(return_waypoint)
+        next_index += 1
+
+        for waypoint_media in waypoint.media_items:
+            return_media.append(WaypointMedia(
+                waypoint=return_waypoint,
+                media=waypoint_media.media.name,
+                type=waypoint_media.type,
+                mime_type=waypoint_media.mime_type,
+                description=waypoint_media.description,
+                index=waypoint_media.index,
+            ))
+
+    Waypoint.objects.bulk_create(return_waypoints)
+    WaypointMedia.objects.bulk_create(return_media)
+    mark_activity_changed(activity_id=group.activity_id)
+    return return_waypoints
@@ -4,15 +4,24 @@
 
 import os
 import uuid
+import weakref
 
 from django.conf import settings
-from django.core.exceptions import MultipleObjectsReturned
-from django.db import models
-from django.db.models.signals import pre_save, post_delete
+from django.core.exceptions import MultipleObjectsReturned, ValidationError
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.db.models.signals import pre_save, post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.files.storage import default_storage
 
+from .allowlist_cache import bump_allowlist_version
+from .permission_cache import bump_permission_generation
+
+_SEARCH_CONFIG = getattr(settings, 'ACTIVITY_SEARCH_CONFIG', 'english')
+
 # Constants
 geographic_decimal_places = 6
 geographic_digits = geographic_decimal_places + 3
@@ -37,6 +46,11 @@ def waypointMediaStorageName(instance, filename):
     return os.path.join(instance.waypoint.group.activity.waypoints_media_directory_path, updated_filename)
 
 
+def importJobUploadStorageName(instance, filename):
+    # imports/{job_id}/upload.gpx
+    return os.path.join('imports', str(instance.id), 'upload.gpx')
+
+
 def waypointImageStorageName(instance, filename):
     """Deprecated. Keep for migration history."""
 
@@ -57,6 +71,120 @@ def file_proxy_url(file: models.FileField):
     return file.url
 
 
+def prefetched_related(instance: models.Model, accessor: str):
+    """
+    Returns the rows loaded for *accessor* by ``prefetch_related``,
+    or None when the relation has not been prefetched on *instance*.
+    """
+    return getattr(instance, '_prefetched_objects_cache', {}).get(accessor)
+
+
+class _PendingActivityChanges:
+    """
+    The activities touched by the current transaction. Registered as an ``on_commit``
+    callback, which marks them all as having unpublished changes in a single UPDATE.
+
+    Groups and waypoints are recorded by id when their activity is not already loaded,
+    and resolved to their activity by the UPDATE itself.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.activity_ids = set()
+        self.group_ids = set()
+        self.waypoint_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        changed = models.Q(id__in=self.activity_ids)
+        if self.group_ids:
+            groups = WaypointGroup.objects.using(self.using).filter(id__in=self.group_ids)
+            changed |= models.Q(id__in=groups.values('activity_id'))
+        if self.waypoint_ids:
+            waypoints = Waypoint.objects.using(self.using).filter(id__in=self.waypoint_ids)
+            changed |= models.Q(id__in=waypoints.values('group__activity_id'))
+
+        values = {'unpublished_changes': True, 'updated': timezone.now()}
+        if connections[self.using].vendor == 'postgresql':
+            values['search_document'] = activity_search_document()
+        Activity.objects.using(self.using).filter(changed).update(**values)
+
+
+def _pending_activity_changes(connection):
+    # The pending changes of each open atomic block on the connection, keyed by its
+    # savepoint ids. Only the on_commit callback holds a pending set strongly, so the set
+    # drops out when Django discards the callback on a (savepoint) rollback.
+    try:
+        return connection.pending_activity_changes
+    except AttributeError:
+        connection.pending_activity_changes = weakref.WeakValueDictionary()
+        return connection.pending_activity_changes
+
+
+def mark_activity_changed(activity_id=None, group_id=None, waypoint_id=None, using=None):
+    """
+    Marks an activity as having unpublished changes once the current transaction commits,
+    or immediately outside a transaction. The activity can be given directly or through
+    one of its waypoint groups or waypoints. The calls made within a transaction (or
+    savepoint) are folded into a single UPDATE.
+    """
+    connection = transaction.get_connection(using)
+    pending_by_block = _pending_activity_changes(connection)
+    # Only join the changes of the current savepoint, so the ids of a savepoint that is
+    # rolled back are discarded along with its callback.
+    block = tuple(connection.savepoint_ids)
+    pending = pending_by_block.get(block) if connection.in_atomic_block else None
+    is_new = pending is None or pending.done
+    if is_new:
+        pending = _PendingActivityChanges(connection.alias)
+
+    if activity_id is not None:
+        pending.activity_ids.add(activity_id)
+    if group_id is not None:
+        pending.group_ids.add(group_id)
+    if waypoint_id is not None:
+        pending.waypoint_ids.add(waypoint_id)
+
+    if is_new:
+        if connection.in_atomic_block:
+            pending_by_block[block] = pending
+        transaction.on_commit(pending, using=connection.alias)
+
+
+def activity_search_document():
+    """
+    The PostgreSQL expression for an activity's ``search_document``: its name, its
+    description and the text of its waypoints, weighted in that order.
+    """
+    from django.contrib.postgres.aggregates import StringAgg
+
+    waypoint_text = (
+        Waypoint.objects.filter(group__activity=models.OuterRef('pk'))
+        .order_by()
+        .values('group__activity')
+        .annotate(text=StringAgg(
+            Concat('name', models.Value(' '), 'description', models.Value(' '),
+                   'departure_callout', models.Value(' '), 'arrival_callout'),
+            delimiter=' ',
+        ))
+        .values('text')
+    )
+    return (
+        SearchVector('name', weight='A', config=_SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=_SEARCH_CONFIG)
+        + SearchVector(Coalesce(models.Subquery(waypoint_text), models.Value('')), weight='C', config=_SEARCH_CONFIG)
+    )
+
+
+def _mark_group_activity_changed(group_id, group, using):
+    # Avoids fetching the group when only its id is known.
+    if group is not None:
+        mark_activity_changed(activity_id=group.activity_id, using=using)
+    else:
+        mark_activity_changed(group_id=group_id, using=using)
+
+
 class ActivityType(models.TextChoices):
     ORIENTEERING = 'Orienteering', _('Orienteering')
     GUIDED_TOUR = 'GuidedTour', _('Guided Tour')
@@ -77,6 +205,14 @@ class MediaType(models.TextChoices):
 class Locale(models.TextChoices):
     EN_US = 'en_US', _('English (United States)')
 
+
+class ImportJobStatus(models.TextChoices):
+    QUEUED = 'queued', _('Queued')
+    DOWNLOADING = 'downloading', _('Downloading media')
+    IMPORTING = 'importing', _('Importing')
+    SUCCEEDED = 'succeeded', _('Succeeded')
+    FAILED = 'failed', _('Failed')
+
 # Models
 
 
@@ -105,9 +241,16 @@ class Activity(CommonModel):
     last_published = models.DateTimeField(blank=True, null=True)
     unpublished_changes = models.BooleanField(default=False)
     folder = models.ForeignKey("Folder", blank=True, null=True, on_delete=models.SET_NULL, related_name="activities")
+    # Full-text search document, kept up to date on PostgreSQL only. See activity_search_document().
+    search_document = SearchVectorField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Activity list pages, newest first, by author and by folder.
+            models.Index(fields=['author_id', '-created'], name='activity_author_created'),
+            models.Index(fields=['folder', '-created'], name='activity_folder_created'),
+        ]
 
     def __str__(self):
         return self.name
@@ -117,6 +260,13 @@ class Activity(CommonModel):
         if update_fields is None or 'unpublished_changes' not in update_fields:
             instance.unpublished_changes = True
 
+    @receiver(post_save, sender='api.Activity')
+    def update_search_document(sender, instance, using, update_fields, **kwargs):
+        if update_fields is not None and not {'name', 'description'} & set(update_fields):
+            return
+        if connections[using].vendor == 'postgresql':
+            Activity.objects.using(using).filter(id=instance.id).update(search_document=activity_search_document())
+
     @receiver(post_delete, sender='api.Activity')
     def delete_file(sender, instance, **kwargs):
         instance.deletePublishedFile()
@@ -147,13 +297,19 @@ class Activity(CommonModel):
     def waypoint_groups(self, type: WaypointGroupType):
         return self.waypoint_groups_all.filter(type=type)
 
+    def first_waypoint_group(self, type: WaypointGroupType):
+        groups = prefetched_related(self, 'waypointgroup_set')
+        if groups is not None:
+            return next((group for group in groups if group.type == type), None)
+        return self.waypoint_groups(type=type).first()
+
     @property
     def waypoints_group(self):
-        return self.waypoint_groups(type=WaypointGroupType.ORDERED).first()
+        return self.first_waypoint_group(type=WaypointGroupType.ORDERED)
 
     @property
     def pois_group(self):
-        return self.waypoint_groups(type=WaypointGroupType.UNORDERED).first()
+        return self.first_waypoint_group(type=WaypointGroupType.UNORDERED)
 
     @property
     def image_url(self):
@@ -161,7 +317,7 @@ class Activity(CommonModel):
 
     def child_entity_did_update(self):
         self.unpublished_changes = True
-        self.save()
+        mark_activity_changed(activity_id=self.id)
 
     def storePublishedFile(self, content):
         self.deletePublishedFile()
@@ -195,12 +351,15 @@ class WaypointGroup(CommonModel):
     def __str__(self):
         return '{0} ({1})'.format(self.name, self.activity.name)
 
-    @receiver(pre_save, sender='api.WaypointGroup')
-    def checker(sender, instance, raw, using, update_fields, *args, **kwargs):
-        instance.activity.child_entity_did_update()
+    @receiver([pre_save, post_delete], sender='api.WaypointGroup')
+    def checker(sender, instance, using, **kwargs):
+        mark_activity_changed(activity_id=instance.activity_id, using=using)
 
     @property
     def waypoints(self):
+        waypoints = prefetched_related(self, 'waypoint_set')
+        if waypoints is not None:
+            return waypoints
         return Waypoint.objects.filter(group=self)
 
     @property
@@ -233,14 +392,20 @@ class Waypoint(CommonModel):
         constraints = [
             models.UniqueConstraint(fields=["group", "index"], name="unique_group_index")
         ]
+        indexes = [
+            # Bounding-box queries from the map (api.geo).
+            models.Index(fields=['latitude', 'longitude'], name='waypoint_lat_lon'),
+        ]
 
     def __str__(self):
         return '{0}. {1} ({2},{3})'.format(self.index, self.name, self.latitude, self.longitude)
 
-    @receiver(pre_save, sender='api.Waypoint')
-    def checker(sender, instance, raw, using, update_fields, *args, **kwargs):
-        activity = instance.group.activity
-        activity.child_entity_did_update()
+    # After the save, so the activity's search document is built from the saved text when
+    # the change is flushed straight away outside a transaction.
+    @receiver([post_save, post_delete], sender='api.Waypoint')
+    def checker(sender, instance, using, **kwargs):
+        group = instance.group if Waypoint.group.is_cached(instance) else None
+        _mark_group_activity_changed(instance.group_id, group, using)
 
     @property
     def type(self):
@@ -248,15 +413,24 @@ class Waypoint(CommonModel):
 
     @property
     def media_items(self):
+        media_items = prefetched_related(self, 'waypointmedia_set')
+        if media_items is not None:
+            return media_items
         return WaypointMedia.objects.filter(waypoint=self)
 
+    def media_items_of_type(self, type: MediaType):
+        media_items = prefetched_related(self, 'waypointmedia_set')
+        if media_items is not None:
+            return [media for media in media_items if media.type == type]
+        return WaypointMedia.objects.filter(waypoint=self, type=type)
+
     @property
     def images(self):
-        return WaypointMedia.objects.filter(waypoint=self, type=MediaType.IMAGE)
+        return self.media_items_of_type(MediaType.IMAGE)
 
     @property
     def audio_clips(self):
-        return WaypointMedia.objects.filter(waypoint=self, type=MediaType.AUDIO)
+        return self.media_items_of_type(MediaType.AUDIO)
 
 
 class WaypointMedia(CommonModel):
@@ -270,10 +444,15 @@ class WaypointMedia(CommonModel):
     class Meta:
         ordering = ['index']
 
-    @receiver(pre_save, sender='api.WaypointMedia')
-    def checker(sender, instance, raw, using, update_fields, *args, **kwargs):
-        activity = instance.waypoint.group.activity
-        activity.child_entity_did_update()
+    @receiver([pre_save, post_delete], sender='api.WaypointMedia')
+    def checker(sender, instance, using, **kwargs):
+        if not WaypointMedia.waypoint.is_cached(instance):
+            mark_activity_changed(waypoint_id=instance.waypoint_id, using=using)
+            return
+
+        waypoint = instance.waypoint
+        group = waypoint.group if Waypoint.group.is_cached(waypoint) else None
+        _mark_group_activity_changed(waypoint.group_id, group, using)
 
     @receiver(post_delete, sender='api.WaypointMedia')
     def delete_file(sender, instance, **kwargs):
@@ -294,6 +473,41 @@ class WaypointMedia(CommonModel):
             default_storage.delete(self.media.name)
 
 
+class ImportJob(CommonModel):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="import_jobs")
+    upload = models.FileField(blank=True, null=True, upload_to=importJobUploadStorageName)
+    status = models.CharField(max_length=20, choices=ImportJobStatus.choices, default=ImportJobStatus.QUEUED)
+    media_total = models.IntegerField(default=0)
+    media_downloaded = models.IntegerField(default=0)
+    waypoint_count = models.IntegerField(default=0)
+    stage_timings = models.JSONField(default=dict)  # seconds spent per stage
+    error = models.TextField(blank=True, null=True)
+    activity = models.ForeignKey(Activity, blank=True, null=True, on_delete=models.SET_NULL, related_name="+")
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['status', 'created'], name='import_job_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} ({self.status})'
+
+    @receiver(post_delete, sender='api.ImportJob')
+    def delete_file(sender, instance, **kwargs):
+        instance.delete_upload()
+
+    @property
+    def is_finished(self):
+        return self.status in (ImportJobStatus.SUCCEEDED, ImportJobStatus.FAILED)
+
+    def delete_upload(self):
+        if self.upload and self.upload.name and default_storage.exists(self.upload.name):
+            default_storage.delete(self.upload.name)
+
+
 class UserPermissions(models.Model):
     user_email = models.EmailField(unique=True)
     allow_app = models.BooleanField(default=False)
@@ -302,14 +516,24 @@ class UserPermissions(models.Model):
     def __str__(self):
         return '{0} allow app: {1}, allow api {2}'.format(self.user_email, self.allow_app, self.allow_api)
 
+    @receiver([post_save, post_delete], sender='api.UserPermissions')
+    def allowlist_did_change(sender, **kwargs):
+        bump_allowlist_version()
+
 
 class Folder(CommonModel):
     name = models.TextField()
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="folders")
     parent = models.ForeignKey("self", blank=True, null=True, on_delete=models.CASCADE, related_name="children")
+    # Materialised path: the ids of the folder's ancestors and itself, root first, each followed by '/'.
+    # Maintained by save(); descendants are the folders whose path starts with this one.
+    path = models.TextField(default="", editable=False)
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["path"], name="folder_path", opclasses=["text_pattern_ops"]),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["owner", "parent", "name"],
@@ -326,6 +550,50 @@ class Folder(CommonModel):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def child_path(parent_path: str, folder_id) -> str:
+        return f"{parent_path}{folder_id}/"
+
+    @property
+    def ancestor_ids(self) -> list:
+        """IDs of this folder's ancestors and the folder itself, root first. Needs no query."""
+        return [uuid.UUID(folder_id) for folder_id in self.path.split("/") if folder_id]
+
+    def ancestors(self):
+        return Folder.objects.filter(id__in=self.ancestor_ids)
+
+    def descendants(self, include_self=False):
+        descendants = Folder.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(id=self.id)
+        return descendants
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parent" not in update_fields:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Read both paths from the database so a stale instance cannot corrupt the tree.
+            paths = dict(
+                Folder.objects.filter(id__in=[self.id, self.parent_id]).values_list("id", "path")
+            )
+            parent_path = paths.get(self.parent_id, "") if self.parent_id else ""
+            if str(self.id) in parent_path.split("/"):
+                raise ValidationError("Folder cannot be moved under its descendant")
+
+            old_path = paths.get(self.id)
+            self.path = Folder.child_path(parent_path, self.id)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "path"}
+            super().save(*args, **kwargs)
+
+            if old_path and old_path != self.path:
+                # Re-root the moved subtree in a single statement.
+                Folder.objects.filter(path__startswith=old_path).exclude(id=self.id).update(
+                    path=Concat(models.Value(self.path), Substr("path", len(old_path) + 1))
+                )
+
 
 class FolderPermissionAccess(models.TextChoices):
     READ = "read", _("Read")
@@ -362,6 +630,14 @@ class FolderTeamPermission(CommonModel):
         return f"{self.folder} -> team:{self.team} ({self.access})"
 
 
+@receiver([post_save, post_delete], sender='api.Folder')
+@receiver([post_save, post_delete], sender='api.FolderUserPermission')
+@receiver([post_save, post_delete], sender='api.FolderTeamPermission')
+@receiver([post_save, post_delete], sender='users.TeamMembership')
+def folder_permissions_did_change(sender, **kwargs):
+    bump_permission_generation()
+
+
 class _FolderPermissionCompatQuerySet:
     def __init__(self, user_qs, team_qs):
         self.user_qs = user_qs
@@ -0,0 +1,21 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+_ACTIVITY_LIST_PAGE_SIZE = getattr(settings, "ACTIVITY_LIST_PAGE_SIZE", 100)
+_ACTIVITY_LIST_MAX_PAGE_SIZE = getattr(settings, "ACTIVITY_LIST_MAX_PAGE_SIZE", 500)
+
+
+class ActivityCursorPagination(CursorPagination):
+    """
+    Pages through activities newest first. The cursor encodes the creation time of the
+    last activity on the page, so each page is an indexed range scan rather than an
+    OFFSET, and pages stay consistent while activities are added.
+    """
+
+    ordering = "-created"
+    page_size = _ACTIVITY_LIST_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = _ACTIVITY_LIST_MAX_PAGE_SIZE
@@ -0,0 +1,74 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Caching for folder permission lookups.
+
+Results are memoised for the rest of the current request and kept in Django's cache
+across requests. Cache keys include a permission generation that is bumped whenever a
+folder, folder permission or team membership changes, so an entry is never read after
+the data it was computed from changed.
+
+The cache must be shared by every process serving requests. The default per-process
+``LocMemCache`` is only correct while a single process handles the API.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+from .cache_versions import CacheVersion
+
+_CACHE_ALIAS = getattr(settings, "PERMISSION_CACHE_ALIAS", "default")
+_CACHE_TIMEOUT = getattr(settings, "PERMISSION_CACHE_TIMEOUT", 5 * 60)  # seconds
+
+_generation = CacheVersion("folder-permissions:generation", _CACHE_ALIAS)
+
+_request_state = threading.local()
+
+
+def _cache():
+    return caches[_CACHE_ALIAS]
+
+
+def permission_generation():
+    return _generation.get()
+
+
+def bump_permission_generation() -> None:
+    """Invalidates every cached permission lookup."""
+    memo = getattr(_request_state, "memo", None)
+    if memo is not None:
+        memo.clear()
+    _generation.bump()
+
+
+def cached_permission(user, key: str, compute):
+    """Returns the cached result of *compute* for *user* and *key*, computing it when missing."""
+    memo = getattr(_request_state, "memo", None)
+    memo_key = (user.pk, key)
+    if memo is not None and memo_key in memo:
+        return memo[memo_key]
+
+    cache_key = f"folder-permissions:{permission_generation()}:{user.pk}:{key}"
+    value = _cache().get(cache_key)
+    if value is None:
+        value = compute()
+        _cache().set(cache_key, value, _CACHE_TIMEOUT)
+
+    if memo is not None:
+        memo[memo_key] = value
+    return value
+
+
+@receiver(request_started)
+def _start_request_memo(sender, **kwargs):
+    _request_state.memo = {}
+
+
+@receiver(request_finished)
+def _end_request_memo(sender, **kwargs):
+    _request_state.memo = None
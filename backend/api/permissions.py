@@ -3,12 +3,20 @@
 
 from __future__ import annotations
 
+import operator
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterable, Optional
+from functools import reduce
+from itertools import chain
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
 
 from users.models import TeamMembership
 
 from .models import Folder, FolderPermissionAccess, FolderTeamPermission, FolderUserPermission
+from .permission_cache import cached_permission
 
 
 @dataclass(frozen=True)
@@ -17,17 +25,80 @@ class FolderAccess:
     can_write: bool
 
 
-def _iter_folder_ancestors(folder: Folder, max_depth: int = 100) -> Iterable[Folder]:
-    current: Optional[Folder] = folder
-    seen_ids = set()
-    depth = 0
-    while current is not None and depth < max_depth:
-        if current.id in seen_ids:
-            break
-        seen_ids.add(current.id)
-        yield current
-        current = current.parent
-        depth += 1
+# Subtree prefixes per query; keeps the OR chain well inside SQLite's expression depth limit.
+_SUBTREE_QUERY_CHUNK = 500
+
+
+def _granted_folders(user, access: str | None = None):
+    """Folders the user owns or holds a permission on, directly or through a team.
+
+    With *access*, only permissions of that level count.
+    """
+    team_ids = TeamMembership.objects.filter(user_id=user.id).values("team_id")
+    user_permissions = FolderUserPermission.objects.filter(user_id=user.id)
+    team_permissions = FolderTeamPermission.objects.filter(team_id__in=team_ids)
+    if access is not None:
+        user_permissions = user_permissions.filter(access=access)
+        team_permissions = team_permissions.filter(access=access)
+
+    return Folder.objects.filter(
+        Q(owner_id=user.id)
+        | Q(id__in=user_permissions.values("folder_id"))
+        | Q(id__in=team_permissions.values("folder_id"))
+    )
+
+
+def _granted_folder_paths(user, access: str | None = None) -> set:
+    return set(_granted_folders(user, access).values_list("path", flat=True))
+
+
+def _subtree_folder_ids(paths: Iterable[str]) -> set:
+    """IDs of the folders at *paths* and all of their descendants.
+
+    Paths nested under another path are dropped first, so the lookup is a single
+    indexed prefix query per chunk of independent subtrees.
+    """
+    prefixes = []
+    for path in sorted(paths):
+        # Sorted order puts every descendant path right after its ancestor.
+        if path and not (prefixes and path.startswith(prefixes[-1])):
+            prefixes.append(path)
+
+    folder_ids = set()
+    for start in range(0, len(prefixes), _SUBTREE_QUERY_CHUNK):
+        chunk = prefixes[start:start + _SUBTREE_QUERY_CHUNK]
+        condition = reduce(operator.or_, (Q(path__startswith=prefix) for prefix in chunk))
+        folder_ids.update(Folder.objects.filter(condition).values_list("id", flat=True))
+    return folder_ids
+
+
+def _recursive_subtree_folder_ids(user, access: str | None = None) -> set:
+    """IDs of the user's granted folders and all of their descendants, in a single
+    ``WITH RECURSIVE`` query that follows ``parent_id`` down from the granted folders.
+    """
+    granted_sql, params = _granted_folders(user, access).order_by().values("id").query.sql_with_params()
+    quote_name = connection.ops.quote_name
+    table = quote_name(Folder._meta.db_table)
+    id_column = quote_name(Folder._meta.pk.column)
+    parent_column = quote_name(Folder._meta.get_field("parent").column)
+    sql = (
+        f"WITH RECURSIVE subtree (folder_id) AS ("
+        f"{granted_sql} "
+        f"UNION SELECT child.{id_column} FROM {table} child "
+        f"INNER JOIN subtree ON child.{parent_column} = subtree.folder_id"
+        f") SELECT folder_id FROM subtree"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {Folder._meta.pk.to_python(row[0]) for row in cursor.fetchall()}
+
+
+def _accessible_subtree_ids(user, access: str | None = None) -> set:
+    # PostgreSQL answers the whole tree walk in one round trip over the parent_id index.
+    # Elsewhere the granted folders' materialised paths are matched by prefix instead.
+    if connection.vendor == "postgresql":
+        return _recursive_subtree_folder_ids(user, access)
+    return _subtree_folder_ids(_granted_folder_paths(user, access))
 
 
 def _access_from_permissions(permissions: Iterable) -> FolderAccess:
@@ -52,21 +123,56 @@ def resolve_folder_access(user, folder: Folder) -> FolderAccess:
     if folder.owner_id == user.id:
         return FolderAccess(can_read=True, can_write=True)
 
+    return cached_permission(user, f"access:{folder.id}", lambda: _resolve_granted_access(user, folder))
+
+
+def _permissions_by_folder(user, folder_ids: Iterable) -> dict:
+    """Permissions held by the user or their teams on *folder_ids*, grouped by folder. Two queries."""
     team_ids = TeamMembership.objects.filter(user_id=user.id).values_list("team_id", flat=True)
+    user_permissions = FolderUserPermission.objects.filter(folder_id__in=folder_ids, user_id=user.id)
+    team_permissions = FolderTeamPermission.objects.filter(folder_id__in=folder_ids, team_id__in=team_ids)
 
-    ancestor_folders = list(_iter_folder_ancestors(folder))
-    user_permissions = FolderUserPermission.objects.filter(folder__in=ancestor_folders, user_id=user.id)
-    team_permissions = FolderTeamPermission.objects.filter(folder__in=ancestor_folders, team_id__in=team_ids)
+    permissions = defaultdict(list)
+    for permission in chain(user_permissions, team_permissions):
+        permissions[permission.folder_id].append(permission)
+    return permissions
 
-    user_access = _access_from_permissions(user_permissions)
-    team_access = _access_from_permissions(team_permissions)
 
-    return FolderAccess(
-        can_read=user_access.can_read or team_access.can_read,
-        can_write=user_access.can_write or team_access.can_write,
+def _access_through_ancestors(folder: Folder, permissions_by_folder: dict) -> FolderAccess:
+    # The materialised path lists every ancestor, so the depth of the tree costs no queries.
+    return _access_from_permissions(
+        permission
+        for ancestor_id in folder.ancestor_ids
+        for permission in permissions_by_folder.get(ancestor_id, ())
     )
 
 
+def _resolve_granted_access(user, folder: Folder) -> FolderAccess:
+    return _access_through_ancestors(folder, _permissions_by_folder(user, folder.ancestor_ids))
+
+
+def resolve_folder_access_bulk(user, folders: Iterable[Folder]) -> dict:
+    """Return ``{folder.id: FolderAccess}`` for *folders*.
+
+    Uses at most two queries however many folders are given and however deep they are.
+    """
+    folders = list(folders)
+    if not user or not user.is_authenticated:
+        return {folder.id: FolderAccess(can_read=False, can_write=False) for folder in folders}
+
+    if user.is_staff:
+        return {folder.id: FolderAccess(can_read=True, can_write=True) for folder in folders}
+
+    shared_folders = [folder for folder in folders if folder.owner_id != user.id]
+    ancestor_ids = {ancestor_id for folder in shared_folders for ancestor_id in folder.ancestor_ids}
+    permissions_by_folder = _permissions_by_folder(user, ancestor_ids) if ancestor_ids else {}
+
+    access = {folder.id: FolderAccess(can_read=True, can_write=True) for folder in folders}
+    for folder in shared_folders:
+        access[folder.id] = _access_through_ancestors(folder, permissions_by_folder)
+    return access
+
+
 def can_write_activity(user, activity) -> bool:
     if not user or not user.is_authenticated:
         return False
@@ -91,12 +197,13 @@ def can_manage_team(user, team) -> bool:
     ).exists()
 
 
-def get_accessible_folder_ids(user, max_depth: int = 100) -> set:
+def get_accessible_folder_ids(user) -> set:
     """Return IDs of all folders the user may access (read or write).
 
     Instead of loading every folder in the database, we start from the
     known "roots" of access (owned folders + folders with explicit
-    permissions) and walk *down* to collect descendants.
+    permissions) and collect their subtrees: with a recursive CTE on
+    PostgreSQL, by materialised path elsewhere.
     """
     if not user or not user.is_authenticated:
         return set()
@@ -104,32 +211,19 @@ def get_accessible_folder_ids(user, max_depth: int = 100) -> set:
     if user.is_staff:
         return set(Folder.objects.values_list("id", flat=True))
 
-    # Folders directly owned by the user.
-    owned_ids = set(Folder.objects.filter(owner=user).values_list("id", flat=True))
+    return set(cached_permission(user, "accessible", lambda: _accessible_subtree_ids(user)))
 
-    # Folders that have an explicit permission for this user or their teams.
-    team_ids = list(TeamMembership.objects.filter(user_id=user.id).values_list("team_id", flat=True))
-    user_perm_folder_ids = set(FolderUserPermission.objects.filter(user_id=user.id).values_list("folder_id", flat=True))
-    team_perm_folder_ids = set(
-        FolderTeamPermission.objects.filter(team_id__in=team_ids).values_list("folder_id", flat=True)
-    )
-    perm_folder_ids = user_perm_folder_ids | team_perm_folder_ids
-
-    accessible = owned_ids | perm_folder_ids
-
-    # Walk down the folder tree to collect all descendants of accessible folders.
-    frontier = set(accessible)
-    depth = 0
-    while frontier and depth < max_depth:
-        child_ids = set(
-            Folder.objects.filter(parent_id__in=frontier)
-            .exclude(id__in=accessible)
-            .values_list("id", flat=True)
-        )
-        if not child_ids:
-            break
-        accessible |= child_ids
-        frontier = child_ids
-        depth += 1
-
-    return accessible
+
+def get_writable_folder_ids(user) -> set:
+    """Return IDs of all folders the user may write: owned folders, folders with a
+    WRITE permission for the user or their teams, and everything below them.
+    """
+    if not user or not user.is_authenticated:
+        return set()
+
+    if user.is_staff:
+        return set(Folder.objects.values_list("id", flat=True))
+
+    return set(cached_permission(
+        user, "writable", lambda: _accessible_subtree_ids(user, access=FolderPermissionAccess.WRITE)
+    ))
@@ -0,0 +1,114 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Searching users, teams and activities.
+
+Name search for typeahead fields: on PostgreSQL the searched columns have ``pg_trgm``
+GIN indexes on ``UPPER(column)``, which serve both the case-insensitive substring match
+and the prefix match, and results are ranked by trigram similarity. Other databases
+have a B-tree index on ``LOWER(column)``, so prefix searches for ASCII terms are turned
+into an indexed range scan; the database's ``LOWER`` may not fold other characters the
+way Python does, so those use an unindexed ``istartswith``.
+
+Activity search: on PostgreSQL activities are matched against their GIN-indexed
+``search_document`` and ranked with ``ts_rank``. Other databases fall back to substring
+matches on the same text, without an index.
+"""
+
+import sys
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Value,
+    When,
+)
+from django.db.models.functions import Length, Lower
+
+from .models import Waypoint
+
+_SEARCH_CONFIG = getattr(settings, "ACTIVITY_SEARCH_CONFIG", "english")
+
+
+def _prefix_upper_bound(prefix: str) -> str | None:
+    # The smallest string greater than every string that starts with prefix, or None
+    # when there is none, as for a prefix of only the largest code point.
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def ranked_search(
+    queryset: QuerySet, field: str, term: str, prefix: bool = False
+) -> QuerySet:
+    """
+    Filters *queryset* to rows whose *field* contains *term*, or starts with it when
+    *prefix* is set, ignoring case. Exact matches come first, then prefix matches, then
+    the remaining rows by similarity (PostgreSQL) or length.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    postgresql = connections[queryset.db].vendor == "postgresql"
+    if not prefix:
+        queryset = queryset.filter(**{f"{field}__icontains": term})
+    elif postgresql or not term.isascii():
+        queryset = queryset.filter(**{f"{field}__istartswith": term})
+    else:
+        lowered = term.lower()
+        queryset = queryset.alias(search_key=Lower(field)).filter(
+            search_key__gte=lowered
+        )
+        upper_bound = _prefix_upper_bound(lowered)
+        if upper_bound is not None:
+            queryset = queryset.filter(search_key__lt=upper_bound)
+
+    rank = Case(
+        When(**{f"{field}__iexact": term}, then=Value(0)),
+        When(**{f"{field}__istartswith": term}, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    ordering = [rank]
+    if postgresql:
+        ordering.append(TrigramSimilarity(field, term).desc())
+    ordering += [Length(field), field]
+    return queryset.order_by(*ordering)
+
+
+def search_activities(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Filters *queryset* to the activities whose name, description or waypoint text match
+    *query*, best match first. On PostgreSQL *query* uses web search syntax: quoted
+    phrases, ``or`` and ``-`` for words to leave out.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        search_query = SearchQuery(
+            query, search_type="websearch", config=_SEARCH_CONFIG
+        )
+        return (
+            queryset.filter(search_document=search_query)
+            .annotate(rank=SearchRank(F("search_document"), search_query))
+            .order_by("-rank", "-created")
+        )
+
+    waypoints = Waypoint.objects.filter(group__activity=OuterRef("pk")).filter(
+        Q(name__icontains=query)
+        | Q(description__icontains=query)
+        | Q(departure_callout__icontains=query)
+        | Q(arrival_callout__icontains=query)
+    )
+    return queryset.filter(
+        Q(name__icontains=query) | Q(description__icontains=query) | Exists(waypoints)
+    ).order_by("-created")
@@ -5,6 +5,7 @@
 from rest_framework import serializers
 
 from django.contrib.auth import get_user_model
+from django.db import models
 from users.models import Team, TeamMembership
 
 from .models import (
@@ -13,10 +14,12 @@ from .models import (
     FolderTeamPermission,
     FolderPermissionAccess,
     FolderUserPermission,
+    ImportJob,
     WaypointGroup,
     Waypoint,
     WaypointMedia,
 )
+from .permissions import resolve_folder_access, resolve_folder_access_bulk
 
 User = get_user_model()
 
@@ -51,6 +54,14 @@ class WaypointSerializer(serializers.ModelSerializer):
         ]
 
 
+class WaypointBatchFieldsSerializer(serializers.ModelSerializer):
+    """The waypoint fields a batch operation can set. Indexes follow the batch order."""
+
+    class Meta:
+        model = Waypoint
+        fields = ['name', 'latitude', 'longitude', 'description', 'departure_callout', 'arrival_callout']
+
+
 class WaypointGroupSerializer(serializers.ModelSerializer):
     waypoints = WaypointSerializer(many=True, read_only=True)
 
@@ -60,17 +71,37 @@ class WaypointGroupSerializer(serializers.ModelSerializer):
 
 
 class ActivityListSerializer(serializers.ModelSerializer):
+    # Long free-text fields that a list request may leave out with ?omit=description,image_alt
+    omittable_fields = ('description', 'image_alt')
+
     image_url = serializers.URLField(read_only=True)
+    waypoint_count = serializers.IntegerField(read_only=True)
+    poi_count = serializers.IntegerField(read_only=True)
+    media_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Activity
         fields = ['id', 'author_id', 'author_name', 'author_email', 'name', 'description',
-                  'type', 'start', 'end', 'expires', 'image', 'image_url', 'image_alt', 'folder']
+                  'type', 'start', 'end', 'expires', 'image', 'image_url', 'image_alt', 'folder',
+                  'waypoint_count', 'poi_count', 'media_count']
         extra_kwargs = {
             'image': {'write_only': True},
             'image_url': {'read_only': True},
         }
 
+    @classmethod
+    def omitted_fields(cls, request) -> set:
+        if request is None:
+            return set()
+        requested = request.query_params.get('omit', '')
+        return {field.strip() for field in requested.split(',')} & set(cls.omittable_fields)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in self.omitted_fields(self.context.get('request')):
+            fields.pop(field, None)
+        return fields
+
 
 class ActivityDetailSerializer(serializers.ModelSerializer):
     waypoints_group = WaypointGroupSerializer(read_only=True)
@@ -88,8 +119,29 @@ class ActivityDetailSerializer(serializers.ModelSerializer):
         }
 
 
+class FolderListSerializer(serializers.ListSerializer):
+    """
+    Resolves the requesting user's access to every folder in the list up front, and passes
+    it to the child serializer as ``folder_access`` in the context.
+    """
+
+    def to_representation(self, data):
+        folders = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        self.context['folder_access'] = resolve_folder_access_bulk(getattr(request, 'user', None), folders)
+        return super().to_representation(folders)
+
+
 class FolderSerializer(serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
+    can_write = serializers.SerializerMethodField()
+
+    def get_can_write(self, obj):
+        access = self.context.get('folder_access', {}).get(obj.id)
+        if access is None:
+            request = self.context.get('request')
+            access = resolve_folder_access(getattr(request, 'user', None), obj)
+        return access.can_write
 
     def validate(self, attrs):
         name = attrs.get("name")
@@ -112,7 +164,8 @@ class FolderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Folder
-        fields = ['id', 'name', 'owner', 'parent', 'created', 'updated']
+        fields = ['id', 'name', 'owner', 'parent', 'created', 'updated', 'can_write']
+        list_serializer_class = FolderListSerializer
 
 
 class FolderPermissionSerializer(serializers.Serializer):
@@ -206,3 +259,11 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username']
         read_only_fields = ['id', 'username']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'status', 'media_total', 'media_downloaded', 'waypoint_count', 'stage_timings',
+                  'error', 'activity', 'created', 'started', 'finished']
+        read_only_fields = fields
@@ -2,6 +2,7 @@
 """Shared test utilities for the API test suite."""
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 from rest_framework.test import APITestCase
 from users.models import Team, TeamMembership
@@ -23,6 +24,8 @@ class FolderTestMixin:
 
     def setUp(self):
         super().setUp()
+        # Cached permissions are keyed by primary keys, which the test database reuses.
+        cache.clear()
         self.owner = User.objects.create_user(username="owner", password="pass")
         self.member = User.objects.create_user(username="member", password="pass")
 
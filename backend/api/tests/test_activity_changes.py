@@ -0,0 +1,164 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for marking activities as changed when their waypoints and media change."""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.models import (
+    Activity,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+
+
+class ActivityChangeTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.activity = self._create_activity("Walk")
+        self.group = WaypointGroup.objects.create(
+            activity=self.activity, type=WaypointGroupType.ORDERED
+        )
+        self._mark_published(self.activity)
+
+    def _create_activity(self, name):
+        return Activity.objects.create(
+            author_id=str(self.user.id), name=name, description=""
+        )
+
+    def _mark_published(self, activity):
+        Activity.objects.filter(id=activity.id).update(unpublished_changes=False)
+
+    def _create_waypoint(self, group, index):
+        return Waypoint.objects.create(
+            group=group,
+            index=index,
+            name=f"Stop {index}",
+            latitude=Decimal("1.0"),
+            longitude=Decimal("2.0"),
+        )
+
+    def _activity_updates(self, queries):
+        return [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "api_activity"')
+        ]
+
+    def test_changes_are_marked_with_one_update_on_commit(self):
+        group = WaypointGroup.objects.get(id=self.group.id)
+
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+            transaction.atomic(),
+        ):
+            for index in range(10):
+                self._create_waypoint(group, index)
+
+            self.activity.refresh_from_db()
+            self.assertFalse(self.activity.unpublished_changes)
+
+        self.assertEqual(len(self._activity_updates(queries)), 1)
+        # Only the refresh above reads the activity; the waypoints fetch neither group nor activity.
+        self.assertEqual(
+            len([query for query in queries if query["sql"].startswith("SELECT")]), 1
+        )
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
+
+    def test_children_saved_without_loaded_parents_mark_their_activity(self):
+        waypoint = self._create_waypoint(self.group, 0)
+        other = self._create_activity("Run")
+        other_group = WaypointGroup.objects.create(
+            activity=other, type=WaypointGroupType.UNORDERED
+        )
+        other_waypoint = self._create_waypoint(other_group, 0)
+        self._mark_published(self.activity)
+        self._mark_published(other)
+
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+            transaction.atomic(),
+        ):
+            WaypointMedia.objects.create(
+                waypoint_id=waypoint.id,
+                media="media.jpg",
+                type=MediaType.IMAGE,
+                mime_type="image/jpeg",
+            )
+            stop = Waypoint.objects.get(id=other_waypoint.id)
+            stop.name = "Renamed"
+            stop.save()
+
+        self.assertEqual(len(self._activity_updates(queries)), 1)
+        self.assertEqual(
+            set(
+                Activity.objects.filter(unpublished_changes=True).values_list(
+                    "id", flat=True
+                )
+            ),
+            {self.activity.id, other.id},
+        )
+
+    def test_rolled_back_changes_are_not_marked(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self._create_waypoint(self.group, 0)
+                transaction.set_rollback(True)
+
+            self.activity.refresh_from_db()
+            self.assertFalse(self.activity.unpublished_changes)
+
+            with transaction.atomic():
+                self._create_waypoint(self.group, 0)
+
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
+
+    def test_rolled_back_savepoint_keeps_the_outer_changes(self):
+        other = self._create_activity("Run")
+        other_group = WaypointGroup.objects.create(
+            activity=other, type=WaypointGroupType.UNORDERED
+        )
+        self._mark_published(other)
+        self._mark_published(self.activity)
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self._create_waypoint(self.group, 0)
+            with transaction.atomic():
+                self._create_waypoint(other_group, 0)
+                transaction.set_rollback(True)
+
+        self.assertEqual(
+            set(
+                Activity.objects.filter(unpublished_changes=True).values_list(
+                    "id", flat=True
+                )
+            ),
+            {self.activity.id},
+        )
+
+    def test_changes_after_the_callback_ran_are_marked_again(self):
+        with transaction.atomic():
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self._create_waypoint(self.group, 0)
+            self.assertEqual(len(callbacks), 1)
+            self._mark_published(self.activity)
+
+            # The same atomic block, but its pending changes have already been applied.
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self._create_waypoint(self.group, 1)
+
+        self.assertEqual(len(callbacks), 1)
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
@@ -0,0 +1,157 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Query budget for serializing a single activity with its waypoint tree."""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.model_utils import prefetch_activity_tree
+from api.models import (
+    Activity,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+from api.serializers import ActivityDetailSerializer
+
+# Activity, waypoint groups, waypoints and waypoint media.
+ACTIVITY_TREE_QUERIES = 4
+
+
+class ActivityDetailQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.media_file = default_storage.save(
+            "query_budget.jpg", ContentFile(b"image")
+        )
+
+    def tearDown(self):
+        default_storage.delete(self.media_file)
+
+    def _create_activity(self, waypoint_count):
+        activity = Activity.objects.create(
+            author_id=str(self.user.id),
+            author_name="Author",
+            name=f"Tour with {waypoint_count} waypoints",
+            description="Query budget test",
+        )
+        route = WaypointGroup.objects.create(
+            activity=activity, name="Default", type=WaypointGroupType.ORDERED
+        )
+        pois = WaypointGroup.objects.create(
+            activity=activity,
+            name="Points of Interest",
+            type=WaypointGroupType.UNORDERED,
+        )
+
+        waypoints = [
+            Waypoint(
+                group=route,
+                index=index,
+                name=f"Stop {index}",
+                latitude=Decimal("47.600000"),
+                longitude=Decimal("-122.300000"),
+            )
+            for index in range(waypoint_count)
+        ]
+        waypoints.append(
+            Waypoint(
+                group=pois,
+                name="Landmark",
+                latitude=Decimal("47.610000"),
+                longitude=Decimal("-122.310000"),
+            )
+        )
+        Waypoint.objects.bulk_create(waypoints)
+
+        media_items = []
+        for waypoint in waypoints:
+            media_items.append(
+                WaypointMedia(
+                    waypoint=waypoint,
+                    media=self.media_file,
+                    type=MediaType.IMAGE,
+                    mime_type="image/jpeg",
+                    description="Image",
+                    index=0,
+                )
+            )
+            media_items.append(
+                WaypointMedia(
+                    waypoint=waypoint,
+                    media=self.media_file,
+                    type=MediaType.AUDIO,
+                    mime_type="audio/mpeg",
+                    description="Audio",
+                    index=0,
+                )
+            )
+        WaypointMedia.objects.bulk_create(media_items)
+
+        return activity
+
+    def _serialize(self, activity):
+        activity = prefetch_activity_tree(Activity.objects.filter(id=activity.id)).get()
+        return ActivityDetailSerializer(activity).data
+
+    def test_serializer_query_count_is_constant(self):
+        for waypoint_count in (1, 50, 500):
+            with self.subTest(waypoint_count=waypoint_count):
+                activity = self._create_activity(waypoint_count)
+
+                with self.assertNumQueries(ACTIVITY_TREE_QUERIES):
+                    data = self._serialize(activity)
+
+                route = data["waypoints_group"]["waypoints"]
+                self.assertEqual(len(route), waypoint_count)
+                self.assertEqual(
+                    [waypoint["index"] for waypoint in route],
+                    list(range(waypoint_count)),
+                )
+                self.assertEqual(len(data["pois_group"]["waypoints"]), 1)
+                for waypoint in route:
+                    self.assertEqual(
+                        [image["type"] for image in waypoint["images"]],
+                        [MediaType.IMAGE],
+                    )
+                    self.assertEqual(
+                        [clip["type"] for clip in waypoint["audio_clips"]],
+                        [MediaType.AUDIO],
+                    )
+
+    def test_serializer_matches_unprefetched_output(self):
+        activity = self._create_activity(3)
+
+        self.assertEqual(
+            self._serialize(activity), ActivityDetailSerializer(activity).data
+        )
+
+    def test_retrieve_query_count_does_not_depend_on_waypoint_count(self):
+        query_counts = []
+        for waypoint_count in (1, 50, 500):
+            activity = self._create_activity(waypoint_count)
+            cache.clear()
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f"/api/v1/activities/{activity.id}/")
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                len(response.data["waypoints_group"]["waypoints"]), waypoint_count
+            )
+            query_counts.append(len(queries))
+
+        self.assertEqual(len(set(query_counts)), 1, query_counts)
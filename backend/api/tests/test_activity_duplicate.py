@@ -0,0 +1,155 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for duplicating an activity with its waypoints and media."""
+
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.model_utils import duplicate_activity
+from api.models import (
+    Activity,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+
+
+class DuplicateActivityTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.activity = Activity.objects.create(
+            author_id=str(self.user.id),
+            name="Walk",
+            description="Around the park",
+            last_published=timezone.now(),
+        )
+        self.route = WaypointGroup.objects.create(
+            activity=self.activity, name="Route", type=WaypointGroupType.ORDERED
+        )
+        self.pois = WaypointGroup.objects.create(
+            activity=self.activity, name="POIs", type=WaypointGroupType.UNORDERED
+        )
+
+    def _create_waypoints(self, group, count):
+        return [
+            Waypoint.objects.create(
+                group=group,
+                index=index if group.type == WaypointGroupType.ORDERED else None,
+                name=f"{group.name} {index}",
+                latitude=Decimal("1.000000") + index,
+                longitude=Decimal("2.000000"),
+            )
+            for index in range(count)
+        ]
+
+    def test_copies_the_activity_tree(self):
+        first, _ = self._create_waypoints(self.route, 2)
+        self._create_waypoints(self.pois, 1)
+        media = WaypointMedia.objects.create(
+            waypoint=first,
+            media=ContentFile(b"image", name="first.jpg"),
+            type=MediaType.IMAGE,
+            mime_type="image/jpeg",
+            description="Alt text",
+            index=0,
+        )
+
+        duplicated = duplicate_activity(Activity.objects.get(id=self.activity.id))
+
+        duplicated.refresh_from_db()
+        self.assertNotEqual(duplicated.id, self.activity.id)
+        self.assertEqual(duplicated.name, "Walk copy")
+        self.assertIsNone(duplicated.last_published)
+        self.assertTrue(duplicated.unpublished_changes)
+
+        route = list(duplicated.waypoints_group.waypoints)
+        self.assertEqual(
+            [(w.index, w.name) for w in route], [(0, "Route 0"), (1, "Route 1")]
+        )
+        self.assertEqual(route[1].latitude, Decimal("2.000000"))
+        self.assertEqual([w.name for w in duplicated.pois_group.waypoints], ["POIs 0"])
+
+        copied_media = WaypointMedia.objects.get(waypoint__group__activity=duplicated)
+        self.assertEqual(copied_media.waypoint, route[0])
+        self.assertEqual(
+            (copied_media.media.name, copied_media.description),
+            (media.media.name, "Alt text"),
+        )
+
+        self.assertEqual(
+            Waypoint.objects.filter(group__activity=self.activity).count(), 3
+        )
+        self.assertEqual(
+            WaypointMedia.objects.get(waypoint__group__activity=self.activity), media
+        )
+
+        # The copy shares the media file, which stays until its last reference is deleted.
+        duplicated.delete()
+        self.assertTrue(default_storage.exists(media.media.name))
+        self.activity.delete()
+        self.assertFalse(default_storage.exists(media.media.name))
+
+    def test_query_count_does_not_depend_on_waypoint_count(self):
+        waypoints = self._create_waypoints(self.route, 50)
+        for waypoint in waypoints[:10]:
+            WaypointMedia.objects.create(
+                waypoint=waypoint,
+                media="shared.mp3",
+                type=MediaType.AUDIO,
+                mime_type="audio/mpeg",
+            )
+
+        activity = Activity.objects.get(id=self.activity.id)
+
+        # Savepoint, three reads, the activity insert, three bulk inserts and the savepoint release.
+        with self.assertNumQueries(9):
+            duplicated = duplicate_activity(activity)
+
+        self.assertEqual(
+            Waypoint.objects.filter(group__activity=duplicated).count(), 50
+        )
+        self.assertEqual(
+            WaypointMedia.objects.filter(waypoint__group__activity=duplicated).count(),
+            10,
+        )
+
+    def test_duplicate_endpoint(self):
+        self._create_waypoints(self.route, 3)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(f"/api/v1/activities/{self.activity.id}/duplicate/")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["name"], "Walk copy")
+        self.assertEqual(len(response.data["waypoints_group"]["waypoints"]), 3)
+
+    @skipUnless(
+        connection.vendor == "postgresql",
+        "Activity search documents are only kept on PostgreSQL",
+    )
+    def test_copy_is_found_by_waypoint_text(self):
+        self._create_waypoints(self.route, 1)
+        self.route.waypoint_set.update(name="Bandstand")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            duplicated = duplicate_activity(Activity.objects.get(id=self.activity.id))
+
+        response = client.get("/api/v1/activities/search/", {"q": "bandstand"})
+
+        self.assertIn(
+            str(duplicated.id), [item["id"] for item in response.data["results"]]
+        )
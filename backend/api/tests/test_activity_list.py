@@ -0,0 +1,129 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the paginated activity list."""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import (
+    Activity,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+
+
+class ActivityListTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_activity(self, name, waypoints=0, pois=0, media=0):
+        activity = Activity.objects.create(
+            author_id=str(self.user.id), name=name, description="A long description"
+        )
+        route = WaypointGroup.objects.create(
+            activity=activity, type=WaypointGroupType.ORDERED
+        )
+        poi_group = WaypointGroup.objects.create(
+            activity=activity, type=WaypointGroupType.UNORDERED
+        )
+        created = Waypoint.objects.bulk_create(
+            [
+                Waypoint(
+                    group=route, index=index, name=f"W{index}", latitude=1, longitude=2
+                )
+                for index in range(waypoints)
+            ]
+            + [
+                Waypoint(group=poi_group, name=f"P{index}", latitude=1, longitude=2)
+                for index in range(pois)
+            ]
+        )
+        WaypointMedia.objects.bulk_create(
+            WaypointMedia(
+                waypoint=created[0],
+                media="clip.mp3",
+                type=MediaType.AUDIO,
+                mime_type="audio/mpeg",
+            )
+            for _ in range(media)
+        )
+        return activity
+
+    def test_lists_activities_with_counts(self):
+        activity = self._create_activity("Walk", waypoints=3, pois=2, media=4)
+        empty = self._create_activity("Empty")
+
+        response = self.client.get("/api/v1/activities/")
+
+        self.assertEqual(response.status_code, 200)
+        results = {item["id"]: item for item in response.data["results"]}
+        self.assertEqual(
+            [
+                results[str(activity.id)][key]
+                for key in ("waypoint_count", "poi_count", "media_count")
+            ],
+            [3, 2, 4],
+        )
+        self.assertEqual(
+            [
+                results[str(empty.id)][key]
+                for key in ("waypoint_count", "poi_count", "media_count")
+            ],
+            [0, 0, 0],
+        )
+        self.assertEqual(results[str(activity.id)]["description"], "A long description")
+
+    def test_pages_follow_the_cursor_newest_first(self):
+        activities = [self._create_activity(f"Activity {index}") for index in range(5)]
+
+        names = []
+        response = self.client.get("/api/v1/activities/", {"page_size": 2})
+        while True:
+            self.assertLessEqual(len(response.data["results"]), 2)
+            names.extend(item["name"] for item in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(names, [activity.name for activity in reversed(activities)])
+
+    def test_heavy_fields_can_be_omitted(self):
+        self._create_activity("Walk")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/v1/activities/", {"omit": "description,image_alt,name"}
+            )
+
+        item = response.data["results"][0]
+        self.assertNotIn("description", item)
+        self.assertNotIn("image_alt", item)
+        self.assertEqual(item["name"], "Walk")
+        activity_query = next(
+            query["sql"] for query in queries if 'FROM "api_activity"' in query["sql"]
+        )
+        self.assertNotIn('"api_activity"."description"', activity_query)
+
+    def test_query_count_does_not_depend_on_activity_count(self):
+        for index in range(3):
+            self._create_activity(f"Activity {index}", waypoints=2, pois=1, media=1)
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/api/v1/activities/")
+
+        for index in range(10):
+            self._create_activity(f"More {index}", waypoints=2, pois=1, media=1)
+
+        with CaptureQueriesContext(connection) as many:
+            self.client.get("/api/v1/activities/")
+
+        self.assertEqual(len(few), len(many))
@@ -0,0 +1,86 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for searching activities by their own and their waypoints' text."""
+
+from rest_framework import status
+
+from api.models import Activity, Waypoint, WaypointGroup, WaypointGroupType
+
+from .base import FolderAPITestCase
+
+
+class ActivitySearchTests(FolderAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.harbour = self._create_activity("Harbour walk", "Along the old docks")
+        self.museum = self._create_activity("Museum tour", "Paintings and sculptures")
+        route = WaypointGroup.objects.create(
+            activity=self.museum, type=WaypointGroupType.ORDERED
+        )
+        Waypoint.objects.create(
+            group=route,
+            index=0,
+            name="Entrance",
+            latitude=1,
+            longitude=2,
+            arrival_callout="You are next to the lighthouse model",
+        )
+
+    def _create_activity(self, name, description, owner=None, folder=None):
+        owner = owner or self.owner
+        return Activity.objects.create(
+            author_id=str(owner.id),
+            author_name=owner.username,
+            name=name,
+            description=description,
+            folder=folder,
+        )
+
+    def _search(self, query, **params):
+        return self.client.get("/api/v1/activities/search/", {"q": query, **params})
+
+    def _names(self, response):
+        return [item["name"] for item in response.data["results"]]
+
+    def test_matches_activity_and_waypoint_text(self):
+        self.client.force_authenticate(user=self.owner)
+
+        self.assertEqual(self._names(self._search("harbour")), ["Harbour walk"])
+        self.assertEqual(self._names(self._search("DOCKS")), ["Harbour walk"])
+        self.assertEqual(self._names(self._search("lighthouse")), ["Museum tour"])
+        self.assertEqual(self._names(self._search("spaceship")), [])
+
+    def test_results_use_the_list_serializer(self):
+        self.client.force_authenticate(user=self.owner)
+
+        item = self._search("lighthouse", omit="description").data["results"][0]
+
+        self.assertEqual(item["id"], str(self.museum.id))
+        self.assertEqual(item["waypoint_count"], 1)
+        self.assertNotIn("description", item)
+
+    def test_only_accessible_activities_are_found(self):
+        shared = self._create_activity("Harbour tour", "Shared", folder=self.root)
+        self._create_activity("Harbour secrets", "Private", owner=self.member)
+
+        self.client.force_authenticate(user=self.member)
+        self.assertEqual(self._names(self._search("harbour")), ["Harbour secrets"])
+
+        self._grant_access(self.root, team=self.team)
+        self.assertEqual(
+            self._names(self._search("harbour")), ["Harbour secrets", "Harbour tour"]
+        )
+        self.assertEqual(
+            self._names(self._search("harbour", folder_id=str(self.root.id))),
+            [shared.name],
+        )
+
+    def test_query_is_required(self):
+        self.client.force_authenticate(user=self.owner)
+
+        response = self._search("  ")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("q", response.data)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self._search("harbour").status_code, status.HTTP_403_FORBIDDEN)
@@ -20,7 +20,7 @@ class ActivitySharingTests(FolderAPITestCase):
 
         list_response = self.client.get("/api/v1/activities/")
         self.assertEqual(list_response.status_code, status.HTTP_200_OK)
-        activity_ids = {item["id"] for item in list_response.data}
+        activity_ids = {item["id"] for item in list_response.data["results"]}
         self.assertIn(str(self.activity.id), activity_ids)
 
         detail_response = self.client.get(f"/api/v1/activities/{self.activity.id}/")
@@ -61,7 +61,7 @@ class ActivitySharingTests(FolderAPITestCase):
         list_response = self.client.get("/api/v1/activities/")
 
         self.assertEqual(list_response.status_code, status.HTTP_200_OK)
-        activity_ids = {item["id"] for item in list_response.data}
+        activity_ids = {item["id"] for item in list_response.data["results"]}
         self.assertIn(str(self.activity.id), activity_ids)
 
     def test_staff_can_edit_unfoldered_activity(self):
@@ -0,0 +1,163 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for bounding-box queries of waypoints and activities."""
+
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework import status
+
+from api.geo import BoundingBox
+from api.models import Activity, Waypoint, WaypointGroup, WaypointGroupType
+
+from .base import FolderAPITestCase
+
+
+class BoundingBoxTests(SimpleTestCase):
+    def test_parses_coordinates(self):
+        bbox = BoundingBox.parse("-1.5, 50, 2,51.25")
+
+        self.assertEqual(
+            (bbox.min_lon, bbox.min_lat, bbox.max_lon, bbox.max_lat),
+            (Decimal("-1.5"), Decimal(50), Decimal(2), Decimal("51.25")),
+        )
+        self.assertEqual(bbox.center, (Decimal("50.625"), Decimal("0.25")))
+        self.assertFalse(bbox.crosses_antimeridian)
+
+    def test_center_of_a_box_across_the_antimeridian(self):
+        bbox = BoundingBox.parse("170,-10,-160,10")
+
+        self.assertTrue(bbox.crosses_antimeridian)
+        self.assertEqual(bbox.center, (0, Decimal(-175)))
+
+    def test_rejects_invalid_boxes(self):
+        for value in (
+            "",
+            "1,2,3",
+            "a,b,c,d",
+            "nan,0,1,1",
+            "0,0,181,1",
+            "0,1,1,0",
+            "0,-91,1,1",
+        ):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                BoundingBox.parse(value)
+
+
+class BoundingBoxAPITests(FolderAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.london = self._create_activity("London")
+        self.paris = self._create_activity("Paris")
+        self.fiji = self._create_activity("Fiji")
+        self.big_ben = self._create_waypoint(self.london, "Big Ben", 51.5007, -0.1246)
+        self.tower = self._create_waypoint(
+            self.london, "Tower Bridge", 51.5055, -0.0754
+        )
+        self.eiffel = self._create_waypoint(self.paris, "Eiffel Tower", 48.8584, 2.2945)
+        self.suva = self._create_waypoint(self.fiji, "Suva", -18.1416, 178.4419)
+        self.taveuni = self._create_waypoint(self.fiji, "Taveuni", -16.8, -179.9)
+
+    def _create_activity(self, name, owner=None, folder=None):
+        owner = owner or self.owner
+        activity = Activity.objects.create(
+            author_id=str(owner.id),
+            author_name=owner.username,
+            name=name,
+            description=name,
+            folder=folder,
+        )
+        WaypointGroup.objects.create(activity=activity, type=WaypointGroupType.ORDERED)
+        return activity
+
+    def _create_waypoint(self, activity, name, latitude, longitude):
+        group = activity.waypoint_groups_all.get()
+        return Waypoint.objects.create(
+            group=group,
+            index=group.newWaypointIndex,
+            name=name,
+            latitude=latitude,
+            longitude=longitude,
+        )
+
+    def _waypoint_names(self, bbox):
+        response = self.client.get("/api/v1/waypoints/", {"bbox": bbox})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [waypoint["name"] for waypoint in response.data]
+
+    def _activity_names(self, bbox, **params):
+        response = self.client.get("/api/v1/activities/", {"bbox": bbox, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [activity["name"] for activity in response.data["results"]]
+
+    def test_waypoints_in_the_box_nearest_first(self):
+        self.client.force_authenticate(user=self.owner)
+
+        # Centred near Tower Bridge.
+        self.assertEqual(
+            self._waypoint_names("-0.15,51.4,0,51.6"), ["Tower Bridge", "Big Ben"]
+        )
+        # Centred near Big Ben.
+        self.assertEqual(
+            self._waypoint_names("-0.3,51.4,0.05,51.6"), ["Big Ben", "Tower Bridge"]
+        )
+        self.assertEqual(
+            self._waypoint_names("-1,48,3,52"),
+            ["Eiffel Tower", "Tower Bridge", "Big Ben"],
+        )
+        self.assertEqual(self._waypoint_names("10,10,11,11"), [])
+
+    def test_waypoints_across_the_antimeridian(self):
+        self.client.force_authenticate(user=self.owner)
+
+        self.assertEqual(self._waypoint_names("178,-19,-179,-16"), ["Taveuni", "Suva"])
+
+    def test_waypoint_fields_are_serialized(self):
+        self.client.force_authenticate(user=self.owner)
+
+        # Folder access, the waypoints with their groups, and their media; none per waypoint.
+        with self.assertNumQueries(4):
+            waypoint = self.client.get(
+                "/api/v1/waypoints/", {"bbox": "2,48,3,49"}
+            ).data[0]
+
+        self.assertEqual(waypoint["id"], str(self.eiffel.id))
+        self.assertEqual(waypoint["type"], WaypointGroupType.ORDERED)
+        self.assertEqual(waypoint["images"], [])
+
+    def test_activities_with_a_waypoint_in_the_box_nearest_first(self):
+        self.client.force_authenticate(user=self.owner)
+
+        self.assertEqual(self._activity_names("-1,48,3,52"), ["Paris", "London"])
+        self.assertEqual(self._activity_names("-1,50,3,52"), ["London"])
+        self.assertEqual(self._activity_names("178,-19,-179,-16"), ["Fiji"])
+
+        item = self.client.get(
+            "/api/v1/activities/", {"bbox": "-1,50,3,52", "omit": "description"}
+        ).data["results"][0]
+        self.assertEqual(item["waypoint_count"], 2)
+        self.assertNotIn("description", item)
+
+    def test_only_accessible_items_are_returned(self):
+        shared = self._create_activity("Shared", folder=self.root)
+        self._create_waypoint(shared, "Louvre", 48.8606, 2.3376)
+        private = self._create_activity("Private", owner=self.member)
+        self._create_waypoint(private, "Notre-Dame", 48.853, 2.3499)
+
+        self.client.force_authenticate(user=self.member)
+        self.assertEqual(self._waypoint_names("2,48,3,49"), ["Notre-Dame"])
+        self.assertEqual(self._activity_names("2,48,3,49"), ["Private"])
+
+        self._grant_access(self.root, team=self.team)
+        self.assertEqual(self._waypoint_names("2,48,3,49"), ["Notre-Dame", "Louvre"])
+        self.assertEqual(
+            self._activity_names("2,48,3,49", folder_id=str(self.root.id)), ["Shared"]
+        )
+
+    def test_invalid_box_is_rejected(self):
+        self.client.force_authenticate(user=self.owner)
+
+        for path in ("/api/v1/waypoints/", "/api/v1/activities/"):
+            with self.subTest(path=path):
+                response = self.client.get(path, {"bbox": "0,1,2"})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("bbox", response.data)
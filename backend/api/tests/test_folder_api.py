@@ -1,10 +1,13 @@
 # Copyright (c) Soundscape Community Contributors.
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 from users.models import Team, TeamMembership
 
 from api.models import Activity, Folder, FolderPermission
+from api.serializers import FolderSerializer
 
 
 class FolderApiTests(APITestCase):
@@ -20,6 +23,7 @@ class FolderApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data["name"], "Root")
         self.assertEqual(self.owner.id, response.data["owner"])
+        self.assertTrue(response.data["can_write"])
 
     def test_team_permission_allows_read(self):
         team = Team.objects.create(name="Editors", owner=self.owner)
@@ -39,6 +43,45 @@ class FolderApiTests(APITestCase):
         folder_ids = {item["id"] for item in response.data}
         self.assertIn(str(root.id), folder_ids)
 
+    def test_folder_list_reports_write_access_without_per_row_queries(self):
+        team = Team.objects.create(name="Editors", owner=self.owner)
+        TeamMembership.objects.create(user=self.member, team=team)
+        read_root = Folder.objects.create(name="Read", owner=self.owner)
+        write_root = Folder.objects.create(name="Write", owner=self.owner)
+        FolderPermission.objects.create(folder=read_root, team=team, access=FolderPermission.Access.READ)
+        FolderPermission.objects.create(folder=write_root, user=self.member, access=FolderPermission.Access.WRITE)
+        self.client.force_authenticate(user=self.member)
+
+        query_counts = []
+        for folder_count in (1, 20):
+            for index in range(folder_count):
+                Folder.objects.create(name=f"Read {folder_count}-{index}", owner=self.owner, parent=read_root)
+                Folder.objects.create(name=f"Write {folder_count}-{index}", owner=self.owner, parent=write_root)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/v1/folders/")
+            query_counts.append(len(queries))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            can_write = {item["name"]: item["can_write"] for item in response.data}
+            self.assertFalse(can_write["Read"])
+            self.assertTrue(can_write["Write"])
+            self.assertFalse(can_write[f"Read {folder_count}-0"])
+            self.assertTrue(can_write[f"Write {folder_count}-0"])
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_folder_list_passes_access_through_the_context(self):
+        root = Folder.objects.create(name="Root", owner=self.owner)
+        request = APIRequestFactory().get("/api/v1/folders/")
+        request.user = self.owner
+
+        serializer = FolderSerializer([root], many=True, context={"request": request})
+
+        self.assertTrue(serializer.data[0]["can_write"])
+        self.assertIn(root.id, serializer.context["folder_access"])
+        self.assertNotIn("folder_access", vars(serializer.child))
+
     def test_owner_can_manage_team_membership(self):
         self.client.force_authenticate(user=self.owner)
         team_response = self.client.post("/api/v1/teams/", {"name": "Team"}, format="json")
@@ -75,6 +118,6 @@ class FolderApiTests(APITestCase):
         response = self.client.get("/api/v1/activities/?folder_id=none")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        activity_names = {item["name"] for item in response.data}
+        activity_names = {item["name"] for item in response.data["results"]}
         self.assertIn("Unfoldered Activity", activity_names)
         self.assertNotIn("Foldered Activity", activity_names)
@@ -1,11 +1,17 @@
 # Copyright (c) Soundscape Community Contributors.
+from unittest import mock
+
 from rest_framework import status
 from rest_framework.test import APITestCase
-from users.models import TeamMembership
 
 from api.models import Activity, Folder, FolderPermission
 from api.permissions import can_manage_team
 from api.tests.base import FolderTestMixin, User
+from users.models import TeamMembership
+
+# For tests that change permissions with QuerySet.update(), which sends no signals and so
+# cannot invalidate the cross-request permission cache.
+_without_permission_cache = mock.patch("api.permission_cache._CACHE_TIMEOUT", 0)
 
 
 class FolderApiAdditionalTests(FolderTestMixin, APITestCase):
@@ -52,6 +58,7 @@ class FolderApiAdditionalTests(FolderTestMixin, APITestCase):
         self.assertIn(str(self.child.id), folder_ids)
         self.assertNotIn(str(self.root.id), folder_ids)
 
+    @_without_permission_cache
     def test_create_folder_requires_write_on_parent(self):
         FolderPermission.objects.create(
             folder=self.root,
@@ -69,6 +76,7 @@ class FolderApiAdditionalTests(FolderTestMixin, APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @_without_permission_cache
     def test_update_folder_requires_write(self):
         FolderPermission.objects.create(
             folder=self.root,
@@ -114,6 +122,7 @@ class FolderApiAdditionalTests(FolderTestMixin, APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    @_without_permission_cache
     def test_delete_folder_requires_write(self):
         FolderPermission.objects.create(
             folder=self.root,
@@ -168,7 +177,7 @@ class FolderApiAdditionalTests(FolderTestMixin, APITestCase):
         response = self.client.get(f"/api/v1/activities/?folder_id={self.root.id}")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        activity_names = {item["name"] for item in response.data}
+        activity_names = {item["name"] for item in response.data["results"]}
         self.assertIn("Rooted Activity", activity_names)
         self.assertNotIn("Child Activity", activity_names)
 
@@ -198,6 +207,7 @@ class FolderPermissionApiTests(FolderTestMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 0)
 
+    @_without_permission_cache
     def test_permissions_create_requires_write_or_owner(self):
         FolderPermission.objects.create(
             folder=self.root,
@@ -350,6 +360,7 @@ class ActivityFolderAccessTests(FolderTestMixin, APITestCase):
             payload["folder"] = str(folder_id)
         return payload
 
+    @_without_permission_cache
     def test_create_activity_requires_folder_write(self):
         FolderPermission.objects.create(
             folder=self.root,
@@ -368,6 +379,7 @@ class ActivityFolderAccessTests(FolderTestMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(str(response.data["folder"]), str(self.root.id))
 
+    @_without_permission_cache
     def test_update_activity_requires_write_on_current_and_target(self):
         activity = Activity.objects.create(
             author_id=str(self.member.id),
@@ -0,0 +1,235 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the materialised folder path and the permission lookups built on it."""
+
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+
+from api import permissions
+from api.models import Folder, FolderPermission
+from api.permissions import (
+    get_accessible_folder_ids,
+    get_writable_folder_ids,
+    resolve_folder_access,
+)
+from api.tests.base import FolderTestMixin, User
+
+
+class FolderPathTests(FolderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = Folder.objects.create(
+            name="Child", owner=self.owner, parent=self.root
+        )
+        self.grandchild = Folder.objects.create(
+            name="Grandchild", owner=self.owner, parent=self.child
+        )
+
+    def test_path_lists_ancestors_root_first(self):
+        self.assertEqual(self.root.path, f"{self.root.id}/")
+        self.assertEqual(
+            self.grandchild.path,
+            f"{self.root.id}/{self.child.id}/{self.grandchild.id}/",
+        )
+        self.assertEqual(
+            self.grandchild.ancestor_ids,
+            [self.root.id, self.child.id, self.grandchild.id],
+        )
+        self.assertEqual(set(self.root.descendants()), {self.child, self.grandchild})
+
+    def test_moving_a_folder_moves_its_subtree(self):
+        other_root = Folder.objects.create(name="Other", owner=self.owner)
+
+        self.child.parent = other_root
+        self.child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(
+            self.grandchild.ancestor_ids,
+            [other_root.id, self.child.id, self.grandchild.id],
+        )
+        self.assertEqual(set(self.root.descendants()), set())
+
+    def test_moving_to_root_level(self):
+        self.child.parent = None
+        self.child.save(update_fields=["parent"])
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f"{self.child.id}/{self.grandchild.id}/")
+
+    def test_stale_instance_does_not_corrupt_paths(self):
+        stale_grandchild = Folder.objects.get(id=self.grandchild.id)
+        other_root = Folder.objects.create(name="Other", owner=self.owner)
+        self.child.parent = other_root
+        self.child.save()
+
+        stale_grandchild.name = "Renamed"
+        stale_grandchild.save()
+
+        stale_grandchild.refresh_from_db()
+        self.assertEqual(
+            stale_grandchild.ancestor_ids,
+            [other_root.id, self.child.id, self.grandchild.id],
+        )
+
+    def test_folder_cannot_move_under_its_descendant(self):
+        self.root.parent = self.grandchild
+
+        with self.assertRaises(ValidationError):
+            self.root.save()
+
+    def test_move_under_descendant_is_rejected_by_api(self):
+        self.client.force_login(self.owner)
+
+        response = self.client.patch(
+            f"/api/v1/folders/{self.root.id}/",
+            {"parent": str(self.grandchild.id)},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_move_under_descendant_is_rejected_by_api(self):
+        self.client.force_login(self.owner)
+
+        # The view's own check passed on data that a concurrent move made stale.
+        with mock.patch("api.views.FolderViewSet._validate_parent"):
+            response = self.client.patch(
+                f"/api/v1/folders/{self.root.id}/",
+                {"parent": str(self.grandchild.id)},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ["Folder cannot be moved under its descendant"])
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent_id)
+
+
+class FolderPermissionQueryTests(FolderTestMixin, TestCase):
+    def _chain(self, depth):
+        folder = self.root
+        for level in range(depth):
+            folder = Folder.objects.create(
+                name=f"Level {level} of {depth}", owner=self.owner, parent=folder
+            )
+        return folder
+
+    def test_resolve_folder_access_cost_does_not_depend_on_depth(self):
+        FolderPermission.objects.create(
+            folder=self.root, team=self.team, access=FolderPermission.Access.WRITE
+        )
+
+        for depth in (1, 10, 50):
+            with self.subTest(depth=depth):
+                leaf = Folder.objects.get(id=self._chain(depth).id)
+
+                # User permissions and team permissions.
+                with self.assertNumQueries(2):
+                    access = resolve_folder_access(self.member, leaf)
+
+                self.assertTrue(access.can_write)
+
+    def test_accessible_folder_ids_cost_does_not_depend_on_depth(self):
+        FolderPermission.objects.create(
+            folder=self.root, team=self.team, access=FolderPermission.Access.READ
+        )
+        leaf = self._chain(30)
+        unrelated = Folder.objects.create(name="Unrelated", owner=self.owner)
+
+        # Granted folder paths and their subtrees.
+        with self.assertNumQueries(2):
+            accessible = get_accessible_folder_ids(self.member)
+
+        self.assertIn(leaf.id, accessible)
+        self.assertIn(self.root.id, accessible)
+        self.assertNotIn(unrelated.id, accessible)
+        self.assertEqual(len(accessible), 31)
+
+    def test_writable_folder_ids_only_follow_write_grants(self):
+        read_root = Folder.objects.create(name="Read only", owner=self.owner)
+        read_child = Folder.objects.create(
+            name="Read child", owner=self.owner, parent=read_root
+        )
+        write_child = Folder.objects.create(
+            name="Write child", owner=self.owner, parent=self.root
+        )
+        FolderPermission.objects.create(
+            folder=read_root, user=self.member, access=FolderPermission.Access.READ
+        )
+        FolderPermission.objects.create(
+            folder=self.root, team=self.team, access=FolderPermission.Access.WRITE
+        )
+        own = Folder.objects.create(name="Own", owner=self.member)
+
+        writable = get_writable_folder_ids(self.member)
+
+        self.assertEqual(writable, {self.root.id, write_child.id, own.id})
+        self.assertIn(read_child.id, get_accessible_folder_ids(self.member))
+
+    def test_anonymous_and_staff(self):
+        staff = User.objects.create_user(
+            username="admin", password="pass", is_staff=True
+        )
+        self._chain(2)
+
+        self.assertEqual(get_accessible_folder_ids(None), set())
+        self.assertEqual(
+            get_writable_folder_ids(staff),
+            set(Folder.objects.values_list("id", flat=True)),
+        )
+
+
+class RecursiveFolderQueryTests(FolderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = Folder.objects.create(
+            name="Child", owner=self.owner, parent=self.root
+        )
+        self.grandchild = Folder.objects.create(
+            name="Grandchild", owner=self.owner, parent=self.child
+        )
+        self.shared = Folder.objects.create(name="Shared", owner=self.owner)
+        self.shared_child = Folder.objects.create(
+            name="Shared child", owner=self.owner, parent=self.shared
+        )
+        FolderPermission.objects.create(
+            folder=self.child, team=self.team, access=FolderPermission.Access.READ
+        )
+        FolderPermission.objects.create(
+            folder=self.shared, user=self.member, access=FolderPermission.Access.WRITE
+        )
+
+    def test_recursive_query_matches_path_lookup(self):
+        for access in (None, FolderPermission.Access.WRITE):
+            with self.subTest(access=access):
+                with self.assertNumQueries(1):
+                    recursive_ids = permissions._recursive_subtree_folder_ids(
+                        self.member, access
+                    )
+
+                self.assertEqual(
+                    recursive_ids,
+                    permissions._subtree_folder_ids(
+                        permissions._granted_folder_paths(self.member, access)
+                    ),
+                )
+
+        self.assertEqual(
+            permissions._recursive_subtree_folder_ids(self.member),
+            {self.child.id, self.grandchild.id, self.shared.id, self.shared_child.id},
+        )
+
+    def test_postgresql_uses_recursive_query(self):
+        with (
+            mock.patch.object(connection, "vendor", "postgresql"),
+            mock.patch(
+                "api.permissions._recursive_subtree_folder_ids",
+                return_value={self.root.id},
+            ) as recursive,
+        ):
+            self.assertEqual(get_accessible_folder_ids(self.member), {self.root.id})
+
+        recursive.assert_called_once_with(self.member, None)
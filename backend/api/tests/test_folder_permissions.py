@@ -3,7 +3,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.test import TestCase
 
 from api.models import Folder, FolderPermission
-from api.permissions import resolve_folder_access
+from api.permissions import resolve_folder_access, resolve_folder_access_bulk
 from api.tests.base import FolderTestMixin, User
 
 
@@ -117,3 +117,47 @@ class FolderPermissionTests(FolderTestMixin, TestCase):
 
         self.assertFalse(Folder.objects.filter(id=child_id).exists())
         self.assertEqual(FolderPermission.objects.count(), 0)
+
+
+class FolderAccessBulkTests(FolderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = Folder.objects.create(name="Child", owner=self.owner, parent=self.root)
+        self.grandchild = Folder.objects.create(name="Grandchild", owner=self.owner, parent=self.child)
+        self.private = Folder.objects.create(name="Private", owner=self.owner)
+        self.own = Folder.objects.create(name="Own", owner=self.member)
+        FolderPermission.objects.create(folder=self.root, team=self.team, access=FolderPermission.Access.READ)
+        FolderPermission.objects.create(folder=self.child, user=self.member, access=FolderPermission.Access.WRITE)
+        self.folders = [self.root, self.child, self.grandchild, self.private, self.own]
+
+    def test_matches_single_folder_resolution(self):
+        access = resolve_folder_access_bulk(self.member, self.folders)
+
+        self.assertEqual(access, {folder.id: resolve_folder_access(self.member, folder) for folder in self.folders})
+        self.assertEqual(
+            {folder.name for folder in self.folders if access[folder.id].can_write},
+            {"Child", "Grandchild", "Own"},
+        )
+        self.assertFalse(access[self.private.id].can_read)
+
+    def test_query_count_does_not_depend_on_folder_count(self):
+        folders = list(Folder.objects.all())
+        for index in range(20):
+            folders.append(Folder.objects.create(name=f"Nested {index}", owner=self.owner, parent=folders[-1]))
+
+        # User permissions and team permissions.
+        with self.assertNumQueries(2):
+            access = resolve_folder_access_bulk(self.member, folders)
+
+        self.assertEqual(len(access), len(folders))
+
+    def test_owned_folders_need_no_queries(self):
+        with self.assertNumQueries(0):
+            access = resolve_folder_access_bulk(self.owner, [self.root, self.child])
+
+        self.assertTrue(all(folder_access.can_write for folder_access in access.values()))
+
+    def test_unauthenticated_user_has_no_access(self):
+        access = resolve_folder_access_bulk(AnonymousUser(), self.folders)
+
+        self.assertFalse(any(folder_access.can_read for folder_access in access.values()))
@@ -0,0 +1,248 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the streaming GPX export engine."""
+
+from decimal import Decimal
+from unittest import mock
+
+import gpxpy
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import gpx_utils
+from api.gpx_utils import GPXSC_NS_FULL, activity_to_gpx
+from api.models import (
+    Activity,
+    ActivityType,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+
+
+class GPXExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_activity(self, waypoint_count, type=ActivityType.GUIDED_TOUR):
+        activity = Activity.objects.create(
+            author_id=str(self.user.id),
+            author_name="Author & <Co>",
+            author_email="author@example.com",
+            name='Tour & "friends"',
+            description="Walk <fast>",
+            type=type,
+        )
+        route = WaypointGroup.objects.create(
+            activity=activity, name="Default", type=WaypointGroupType.ORDERED
+        )
+        pois = WaypointGroup.objects.create(
+            activity=activity,
+            name="Points of Interest",
+            type=WaypointGroupType.UNORDERED,
+        )
+        waypoints = [
+            Waypoint(
+                group=route,
+                index=index,
+                name=f"Stop {index}",
+                description=f"Stop {index} description",
+                departure_callout="Leaving <now>",
+                arrival_callout="Arrived & done",
+                latitude=Decimal("47.600000"),
+                longitude=Decimal("-122.300000"),
+            )
+            for index in range(waypoint_count)
+        ]
+        waypoints.append(
+            Waypoint(
+                group=pois,
+                name="Landmark",
+                latitude=Decimal("47.610000"),
+                longitude=Decimal("-122.310000"),
+            )
+        )
+        Waypoint.objects.bulk_create(waypoints)
+        WaypointMedia.objects.bulk_create(
+            [
+                WaypointMedia(
+                    waypoint=waypoint,
+                    media="activities/shared/image.jpg",
+                    type=MediaType.IMAGE,
+                    mime_type="image/jpeg",
+                    description="Alt & text",
+                    index=0,
+                )
+                for waypoint in waypoints
+            ]
+        )
+        return Activity.objects.get(id=activity.id)
+
+    def test_export_query_count_is_constant(self):
+        for waypoint_count in (1, 50, 500):
+            with self.subTest(waypoint_count=waypoint_count):
+                activity = self._create_activity(waypoint_count)
+
+                # Waypoint groups, waypoints and waypoint media.
+                with self.assertNumQueries(3):
+                    content = activity_to_gpx(activity)
+
+                gpx = gpxpy.parse(content)
+                self.assertEqual(len(gpx.routes[0].points), waypoint_count)
+
+    def test_guided_tour_round_trips_through_gpxpy(self):
+        activity = self._create_activity(2)
+
+        gpx = gpxpy.parse(activity_to_gpx(activity))
+
+        self.assertEqual(gpx.name, activity.name)
+        self.assertEqual(gpx.description, activity.description)
+        self.assertEqual(gpx.author_name, activity.author_name)
+        self.assertEqual(gpx.author_email, activity.author_email)
+        self.assertEqual(
+            [point.name for point in gpx.routes[0].points], ["Stop 0", "Stop 1"]
+        )
+        self.assertEqual([waypoint.name for waypoint in gpx.waypoints], ["Landmark"])
+
+        meta = next(
+            e for e in gpx.metadata_extensions if e.tag == GPXSC_NS_FULL + "meta"
+        )
+        self.assertEqual(meta.get("expires"), "false")
+        self.assertEqual(
+            {child.tag.replace(GPXSC_NS_FULL, ""): child.text for child in meta},
+            {
+                "id": str(activity.id),
+                "locale": activity.locale,
+                "behavior": ActivityType.GUIDED_TOUR,
+                "version": "2",
+            },
+        )
+
+        point = gpx.routes[0].points[0]
+        self.assertEqual(point.latitude, 47.6)
+        self.assertEqual(point.description, "Stop 0 description")
+        annotations, links = point.extensions
+        self.assertEqual(
+            [(annotation.get("type"), annotation.text) for annotation in annotations],
+            [("departure", "Leaving <now>"), ("arrival", "Arrived & done")],
+        )
+        self.assertEqual(
+            [(child.tag, child.text) for child in links[0]],
+            [("text", "Alt & text"), ("type", "image/jpeg")],
+        )
+
+    def test_orienteering_exports_route_as_waypoints(self):
+        activity = self._create_activity(3, type=ActivityType.ORIENTEERING)
+
+        gpx = gpxpy.parse(activity_to_gpx(activity))
+
+        self.assertEqual(gpx.routes, [])
+        self.assertEqual(
+            [waypoint.name for waypoint in gpx.waypoints],
+            ["Stop 0", "Stop 1", "Stop 2"],
+        )
+
+    def test_export_endpoint_returns_attachment(self):
+        activity = self._create_activity(2)
+
+        response = self.client.get(f"/api/v1/activities/{activity.id}/export_gpx/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/gpx+xml")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        gpx = gpxpy.parse(b"".join(response.streaming_content).decode("utf-8"))
+        self.assertEqual(len(gpx.routes[0].points), 2)
+
+    def test_publish_stores_gpx_file(self):
+        activity = self._create_activity(2)
+
+        response = self.client.post(f"/api/v1/activities/{activity.id}/publish/")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(default_storage.exists(activity.gpx_file_path))
+        with default_storage.open(activity.gpx_file_path) as stored:
+            gpx = gpxpy.parse(stored.read().decode("utf-8"))
+        self.assertEqual(gpx.name, activity.name)
+        activity.delete()
+
+
+class GPXExportCachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="author", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.activity = Activity.objects.create(
+            author_id=str(self.user.id), name="Tour", description=""
+        )
+        self.route = WaypointGroup.objects.create(
+            activity=self.activity, type=WaypointGroupType.ORDERED
+        )
+        Waypoint.objects.create(
+            group=self.route, index=0, name="Start", latitude=1, longitude=2
+        )
+        self.url = f"/api/v1/activities/{self.activity.id}/export_gpx/"
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_matching_etag_gets_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+        self.assertIn("no-cache", not_modified["Cache-Control"])
+
+    def test_repeat_exports_reuse_the_generated_document(self):
+        generate = mock.patch.object(
+            gpx_utils, "activity_to_gpx_file", wraps=gpx_utils.activity_to_gpx_file
+        )
+        with generate as generate_mock:
+            first = self._content(self.client.get(self.url))
+            second = self._content(self.client.get(self.url))
+
+        self.assertEqual(first, second)
+        self.assertEqual(generate_mock.call_count, 1)
+
+    def test_changes_produce_a_new_version(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("Start", self._content(response))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Waypoint.objects.filter(group=self.route).delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotIn("Start", self._content(response))
+
+    def test_current_published_file_is_served(self):
+        self.client.post(f"/api/v1/activities/{self.activity.id}/publish/")
+        self.addCleanup(self.activity.delete)
+        self.activity.storePublishedFile(ContentFile(b"<gpx>stored</gpx>"))
+
+        self.assertEqual(self._content(self.client.get(self.url)), "<gpx>stored</gpx>")
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            Waypoint.objects.create(
+                group=self.route, index=1, name="Finish", latitude=1, longitude=2
+            )
+
+        self.assertIn("Finish", self._content(self.client.get(self.url)))
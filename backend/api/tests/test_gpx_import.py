@@ -0,0 +1,319 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the streaming GPX importer."""
+
+import io
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.gpx_utils import (
+    MediaFetcher,
+    _collect_media_urls,
+    activity_to_gpx,
+    gpx_to_activity,
+)
+from api.models import (
+    Activity,
+    ActivityType,
+    MediaType,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+    WaypointMedia,
+)
+
+
+def _gpx_document(points):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxsc="https://microsoft.com/Soundscape" '
+        'version="1.1" creator="test">'
+        "<metadata><name>Imported</name><desc>Imported description</desc>"
+        '<author><name>Importer</name><email id="importer" domain="example.com"/></author>'
+        '<extensions><gpxsc:meta expires="true"><gpxsc:behavior>GuidedTour</gpxsc:behavior>'
+        "<gpxsc:version>2</gpxsc:version></gpxsc:meta></extensions></metadata>"
+        "<rte>"
+        + "".join(
+            f'<rtept lat="47.{i:06d}" lon="-122.300000"><name>Stop {i}</name></rtept>'
+            for i in range(points)
+        )
+        + "</rte></gpx>"
+    )
+
+
+class GPXImportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="importer", password="pass"
+        )
+
+    def _create_activity(self):
+        activity = Activity.objects.create(
+            author_id=str(self.user.id),
+            author_name="Author",
+            author_email="author@example.com",
+            name="Round trip",
+            description="Round trip description",
+            type=ActivityType.GUIDED_TOUR,
+        )
+        route = WaypointGroup.objects.create(
+            activity=activity, name="Default", type=WaypointGroupType.ORDERED
+        )
+        pois = WaypointGroup.objects.create(
+            activity=activity,
+            name="Points of Interest",
+            type=WaypointGroupType.UNORDERED,
+        )
+        first = Waypoint.objects.create(
+            group=route,
+            index=0,
+            name="First",
+            description="First stop",
+            departure_callout="Leaving",
+            arrival_callout="Arrived & <done>",
+            latitude=Decimal("47.600000"),
+            longitude=Decimal("-122.300000"),
+        )
+        Waypoint.objects.create(
+            group=route,
+            index=1,
+            name="Second",
+            latitude=Decimal("47.700000"),
+            longitude=Decimal("-122.400000"),
+        )
+        Waypoint.objects.create(
+            group=pois,
+            name="Landmark",
+            latitude=Decimal("47.800000"),
+            longitude=Decimal("-122.500000"),
+        )
+        WaypointMedia.objects.bulk_create(
+            [
+                WaypointMedia(
+                    waypoint=first,
+                    media="activities/shared/image.jpg",
+                    type=MediaType.IMAGE,
+                    mime_type="image/jpeg",
+                    description="Alt text",
+                    index=0,
+                ),
+                WaypointMedia(
+                    waypoint=first,
+                    media="activities/shared/clip.mp3",
+                    type=MediaType.AUDIO,
+                    mime_type="audio/mpeg",
+                    description="Clip text",
+                    index=0,
+                ),
+            ]
+        )
+        return Activity.objects.get(id=activity.id)
+
+    @mock.patch("api.gpx_utils._safe_download", return_value=b"media")
+    def test_round_trip_preserves_activity(self, _download):
+        source = self._create_activity()
+
+        activity = gpx_to_activity(activity_to_gpx(source), self.user)
+
+        self.assertEqual(activity.name, "Round trip")
+        self.assertEqual(activity.description, "Round trip description")
+        self.assertEqual(activity.author_name, "Author")
+        self.assertEqual(activity.author_email, "author@example.com")
+        self.assertEqual(activity.type, ActivityType.GUIDED_TOUR)
+        self.assertEqual(activity.author_id, self.user.id)
+
+        route = list(activity.waypoints_group.waypoints)
+        self.assertEqual(
+            [(w.index, w.name) for w in route], [(0, "First"), (1, "Second")]
+        )
+        self.assertEqual(route[0].description, "First stop")
+        self.assertEqual(route[0].departure_callout, "Leaving")
+        self.assertEqual(route[0].arrival_callout, "Arrived & <done>")
+        self.assertEqual(route[1].latitude, Decimal("47.700000"))
+        self.assertEqual(
+            [poi.name for poi in activity.pois_group.waypoints], ["Landmark"]
+        )
+
+        self.assertEqual(
+            [(m.description, m.mime_type) for m in route[0].images],
+            [("Alt text", "image/jpeg")],
+        )
+        self.assertEqual(
+            [(m.description, m.mime_type) for m in route[0].audio_clips],
+            [("Clip text", "audio/mpeg")],
+        )
+        with route[0].images[0].media.open() as media:
+            self.assertEqual(media.read(), b"media")
+
+        activity.refresh_from_db()
+        self.assertTrue(activity.unpublished_changes)
+        activity.delete()
+
+    def test_waypoints_are_inserted_in_batches(self):
+        bulk_create = mock.patch.object(
+            Waypoint.objects, "bulk_create", wraps=Waypoint.objects.bulk_create
+        )
+        with (
+            mock.patch("api.gpx_utils._IMPORT_BATCH_SIZE", 500),
+            bulk_create as bulk_create_mock,
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            activity = gpx_to_activity(_gpx_document(1200), self.user)
+
+        self.assertEqual(bulk_create_mock.call_count, 3)
+        activity_updates = [
+            q for q in queries if q["sql"].startswith('UPDATE "api_activity"')
+        ]
+        self.assertEqual(len(activity_updates), 1)
+        self.assertEqual(
+            Waypoint.objects.filter(group__activity=activity).count(), 1200
+        )
+        self.assertEqual(
+            list(activity.waypoints_group.waypoints.values_list("index", flat=True)),
+            list(range(1200)),
+        )
+        self.assertTrue(activity.expires)
+
+    def test_only_first_route_is_imported(self):
+        document = _gpx_document(2).replace(
+            "</rte></gpx>",
+            '</rte><rte><rtept lat="1.0" lon="2.0"><name>Ignored</name></rtept></rte></gpx>',
+        )
+
+        activity = gpx_to_activity(document, self.user)
+
+        self.assertEqual(
+            [w.name for w in activity.waypoints_group.waypoints], ["Stop 0", "Stop 1"]
+        )
+
+    def test_route_point_media_is_only_collected_from_version_2_files(self):
+        links = (
+            "<name>Stop 0</name><extensions><gpxsc:links>"
+            '<gpxsc:link href="https://media.example.com/a.jpg"><text>A</text><type>image/jpeg</type></gpxsc:link>'
+            "</gpxsc:links></extensions>"
+        )
+        document = _gpx_document(1).replace("<name>Stop 0</name>", links)
+        v1_document = document.replace("<gpxsc:version>2</gpxsc:version>", "")
+
+        self.assertEqual(
+            _collect_media_urls(io.BytesIO(document.encode())),
+            ["https://media.example.com/a.jpg"],
+        )
+        self.assertEqual(_collect_media_urls(io.BytesIO(v1_document.encode())), [])
+
+    def test_missing_required_metadata_is_rejected(self):
+        document = _gpx_document(1).replace("<name>Imported</name>", "")
+
+        with self.assertRaisesMessage(Exception, "missing required field 'name'"):
+            gpx_to_activity(document, self.user)
+
+        self.assertFalse(Activity.objects.exists())
+
+
+class _FakeResponse:
+    is_redirect = False
+    is_permanent_redirect = False
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class MediaFetcherTests(TestCase):
+    def test_downloads_each_url_once_within_per_host_cap(self):
+        lock = threading.Lock()
+        active = {}
+        peak = {}
+        calls = []
+
+        def download(url, budget=None):
+            host = url.split("/")[2]
+            with lock:
+                calls.append(url)
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+            return url.encode()
+
+        urls = [
+            f"https://{host}.example.com/{i}.jpg"
+            for host in ("a", "b")
+            for i in range(6)
+        ]
+        with mock.patch("api.gpx_utils._safe_download", side_effect=download):
+            results = MediaFetcher(max_workers=8, max_per_host=2).fetch(urls + urls)
+
+        self.assertEqual(sorted(calls), sorted(urls))
+        self.assertEqual(results, {url: url.encode() for url in urls})
+        self.assertLessEqual(max(peak.values()), 2)
+
+    def test_downloads_stop_at_total_byte_budget(self):
+        response = _FakeResponse([b"x" * 60])
+        urls = [f"https://media.example.com/{i}.jpg" for i in range(3)]
+
+        with (
+            mock.patch("api.gpx_utils._validate_url"),
+            mock.patch("api.gpx_utils.requests.get", return_value=response),
+            self.assertLogs("api.gpx_utils", level="WARNING"),
+        ):
+            results = MediaFetcher(max_workers=1, max_total_bytes=150).fetch(urls)
+
+        self.assertEqual(len(results), 2)
+
+    def test_failed_downloads_are_skipped(self):
+        def download(url, budget=None):
+            if "bad" in url:
+                raise ValueError("private address")
+            return b"ok"
+
+        with (
+            mock.patch("api.gpx_utils._safe_download", side_effect=download),
+            self.assertLogs("api.gpx_utils", level="WARNING"),
+        ):
+            results = MediaFetcher().fetch(
+                ["https://good.example.com/a.jpg", "https://bad.example.com/b.jpg"]
+            )
+
+        self.assertEqual(results, {"https://good.example.com/a.jpg": b"ok"})
+
+    def test_media_is_downloaded_before_the_import_transaction(self):
+        user = get_user_model().objects.create_user(
+            username="importer", password="pass"
+        )
+        document = _gpx_document(1).replace(
+            "<name>Stop 0</name>",
+            "<name>Stop 0</name><extensions><gpxsc:links>"
+            '<gpxsc:link href="https://media.example.com/a.jpg"><text>Alt</text><type>image/jpeg</type></gpxsc:link>'
+            "</gpxsc:links></extensions>",
+        )
+        baseline_depth = len(connection.savepoint_ids)
+        depths = []
+
+        def fetch(fetcher, urls, on_download=None):
+            depths.append(len(connection.savepoint_ids))
+            return {url: b"image" for url in urls}
+
+        with mock.patch.object(MediaFetcher, "fetch", autospec=True, side_effect=fetch):
+            activity = gpx_to_activity(document, user)
+
+        self.assertEqual(depths, [baseline_depth])
+        waypoint = activity.waypoints_group.waypoints.get()
+        self.assertEqual([media.description for media in waypoint.images], ["Alt"])
+        activity.delete()
@@ -0,0 +1,302 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for background GPX import jobs."""
+
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_started
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import import_jobs
+from api.import_jobs import (
+    INTERRUPTED_MESSAGE,
+    claim_next_import_job,
+    enqueue_import_job,
+    fail_stale_import_jobs,
+    process_import_jobs,
+)
+from api.models import Activity, ImportJob, ImportJobStatus
+from api.tests.test_gpx_import import _gpx_document
+
+
+def _gpx_upload(document):
+    return SimpleUploadedFile(
+        "activity.gpx", document.encode("utf-8"), content_type="application/gpx+xml"
+    )
+
+
+class ImportJobAPITests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="importer", password="pass"
+        )
+        self.other = get_user_model().objects.create_user(
+            username="other", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for job in ImportJob.objects.all():
+            job.delete_upload()
+        for activity in Activity.objects.all():
+            activity.delete()
+
+    def test_upload_is_queued_and_not_imported_in_the_request(self):
+        with (
+            mock.patch.object(import_jobs, "_RUN_IN_PROCESS", True),
+            self.captureOnCommitCallbacks(execute=False) as callbacks,
+        ):
+            response = self.client.post(
+                "/api/v1/import_jobs/",
+                {"gpx": _gpx_upload(_gpx_document(3))},
+                format="multipart",
+            )
+
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data["status"], ImportJobStatus.QUEUED)
+        self.assertIsNone(response.data["activity"])
+        self.assertEqual(callbacks, [import_jobs._dispatch])
+        self.assertFalse(Activity.objects.exists())
+
+        job = ImportJob.objects.get(id=response.data["id"])
+        self.assertEqual(job.user, self.user)
+        self.assertTrue(default_storage.exists(job.upload.name))
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post("/api/v1/import_jobs/", {}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_job_reports_result_after_processing(self):
+        response = self.client.post(
+            "/api/v1/import_jobs/",
+            {"gpx": _gpx_upload(_gpx_document(3))},
+            format="multipart",
+        )
+        upload_name = ImportJob.objects.get(id=response.data["id"]).upload.name
+
+        self.assertEqual(process_import_jobs(), 1)
+
+        response = self.client.get(f"/api/v1/import_jobs/{response.data['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], ImportJobStatus.SUCCEEDED)
+        self.assertEqual(response.data["waypoint_count"], 3)
+        self.assertIsNone(response.data["error"])
+        self.assertEqual(
+            set(response.data["stage_timings"]),
+            {"queued", "scan", "download", "import"},
+        )
+        self.assertIsNotNone(response.data["finished"])
+        self.assertFalse(default_storage.exists(upload_name))
+
+        activity = Activity.objects.get(id=response.data["activity"])
+        self.assertEqual(activity.name, "Imported")
+        self.assertEqual(activity.author_id, str(self.user.id))
+
+    def test_jobs_are_private_to_their_user(self):
+        job = enqueue_import_job(
+            ContentFile(_gpx_document(1).encode("utf-8")), self.other
+        )
+
+        self.assertEqual(
+            self.client.get(f"/api/v1/import_jobs/{job.id}/").status_code, 404
+        )
+        self.assertEqual(self.client.get("/api/v1/import_jobs/").data, [])
+
+
+class ImportJobWorkerTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="importer", password="pass"
+        )
+
+    def tearDown(self):
+        for job in ImportJob.objects.all():
+            job.delete_upload()
+
+    def _enqueue(self, document):
+        return enqueue_import_job(ContentFile(document.encode("utf-8")), self.user)
+
+    def test_jobs_are_claimed_once_in_queue_order(self):
+        first = self._enqueue(_gpx_document(1))
+        second = self._enqueue(_gpx_document(1))
+
+        self.assertEqual(claim_next_import_job().id, first.id)
+        self.assertEqual(claim_next_import_job().id, second.id)
+        self.assertIsNone(claim_next_import_job())
+        self.assertEqual(
+            ImportJob.objects.get(id=first.id).status, ImportJobStatus.DOWNLOADING
+        )
+
+    def test_invalid_upload_fails_with_error(self):
+        job = self._enqueue("<gpx")
+
+        with self.assertLogs("api.import_jobs", level="ERROR"):
+            process_import_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJobStatus.FAILED)
+        self.assertTrue(job.error.startswith("Invalid GPX file"))
+        self.assertIsNone(job.activity)
+        self.assertFalse(Activity.objects.exists())
+
+    def test_missing_metadata_error_is_reported(self):
+        job = self._enqueue(_gpx_document(1).replace("<name>Imported</name>", ""))
+
+        with self.assertLogs("api.import_jobs", level="ERROR"):
+            process_import_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJobStatus.FAILED)
+        self.assertEqual(job.error, "GPX import error: missing required field 'name'")
+
+    def test_media_download_progress_is_recorded(self):
+        document = _gpx_document(2).replace(
+            "<name>Stop 0</name>",
+            "<name>Stop 0</name><extensions><gpxsc:links>"
+            '<gpxsc:link href="https://media.example.com/a.jpg"><text>A</text><type>image/jpeg</type></gpxsc:link>'
+            '<gpxsc:link href="https://media.example.com/b.mp3"><text>B</text><type>audio/mpeg</type></gpxsc:link>'
+            "</gpxsc:links></extensions>",
+        )
+        job = self._enqueue(document)
+
+        with mock.patch("api.gpx_utils._safe_download", return_value=b"media"):
+            process_import_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJobStatus.SUCCEEDED)
+        self.assertEqual((job.media_total, job.media_downloaded), (2, 2))
+        job.activity.delete()
+
+    def test_stale_running_jobs_are_failed(self):
+        stale = self._enqueue(_gpx_document(1))
+        running = self._enqueue(_gpx_document(1))
+        ImportJob.objects.filter(id=stale.id).update(
+            status=ImportJobStatus.IMPORTING,
+            updated=timezone.now() - timedelta(hours=2),
+        )
+        ImportJob.objects.filter(id=running.id).update(status=ImportJobStatus.IMPORTING)
+
+        self.assertEqual(fail_stale_import_jobs(stale_after=60 * 60), 1)
+
+        stale.refresh_from_db()
+        self.assertEqual(
+            (stale.status, stale.error), (ImportJobStatus.FAILED, INTERRUPTED_MESSAGE)
+        )
+        self.assertEqual(
+            ImportJob.objects.get(id=running.id).status, ImportJobStatus.IMPORTING
+        )
+
+    def test_running_job_sends_heartbeats(self):
+        job = self._enqueue(_gpx_document(1))
+        gpx_to_activity = import_jobs.gpx_to_activity
+        beats = threading.Event()
+
+        def slow_import(*args, **kwargs):
+            self.assertTrue(beats.wait(5))
+            return gpx_to_activity(*args, **kwargs)
+
+        with (
+            mock.patch.object(import_jobs, "_HEARTBEAT_INTERVAL", 0.01),
+            mock.patch.object(
+                import_jobs, "_record_heartbeat", side_effect=lambda _: beats.set()
+            ) as record_heartbeat,
+            mock.patch.object(import_jobs, "gpx_to_activity", side_effect=slow_import),
+        ):
+            process_import_jobs()
+            calls = record_heartbeat.call_count
+            time.sleep(0.05)
+            self.assertEqual(record_heartbeat.call_count, calls)
+
+        record_heartbeat.assert_called_with(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJobStatus.SUCCEEDED)
+        job.activity.delete()
+
+    def test_heartbeat_keeps_only_running_jobs_fresh(self):
+        running = self._enqueue(_gpx_document(1))
+        finished = self._enqueue(_gpx_document(1))
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        ImportJob.objects.filter(id=running.id).update(
+            status=ImportJobStatus.DOWNLOADING, updated=an_hour_ago
+        )
+        ImportJob.objects.filter(id=finished.id).update(
+            status=ImportJobStatus.FAILED, updated=an_hour_ago
+        )
+
+        import_jobs._record_heartbeat(running.id)
+        import_jobs._record_heartbeat(finished.id)
+
+        self.assertEqual(fail_stale_import_jobs(stale_after=60), 0)
+        self.assertGreater(ImportJob.objects.get(id=running.id).updated, an_hour_ago)
+        self.assertEqual(ImportJob.objects.get(id=finished.id).updated, an_hour_ago)
+
+
+class InProcessWorkerTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="importer", password="pass"
+        )
+
+    def tearDown(self):
+        request_started.disconnect(dispatch_uid=import_jobs._RECOVER_UID)
+        for job in ImportJob.objects.all():
+            job.delete_upload()
+        for activity in Activity.objects.all():
+            activity.delete()
+
+    def test_first_request_starts_the_worker(self):
+        with (
+            mock.patch.object(import_jobs, "_RUN_IN_PROCESS", True),
+            mock.patch.object(import_jobs, "_dispatch") as dispatch,
+        ):
+            import_jobs.start_in_process_worker()
+            self.client.get("/api/v1/runtime-config/")
+            self.client.get("/api/v1/runtime-config/")
+
+        dispatch.assert_called_once_with()
+
+    def test_worker_is_not_started_when_jobs_run_elsewhere(self):
+        with (
+            mock.patch.object(import_jobs, "_RUN_IN_PROCESS", False),
+            mock.patch.object(import_jobs, "_dispatch") as dispatch,
+        ):
+            import_jobs.start_in_process_worker()
+            self.client.get("/api/v1/runtime-config/")
+
+        dispatch.assert_not_called()
+
+    def test_worker_recovers_interrupted_and_queued_jobs(self):
+        interrupted = enqueue_import_job(
+            ContentFile(_gpx_document(1).encode("utf-8")), self.user
+        )
+        ImportJob.objects.filter(id=interrupted.id).update(
+            status=ImportJobStatus.DOWNLOADING,
+            updated=timezone.now() - timedelta(hours=2),
+        )
+        queued = enqueue_import_job(
+            ContentFile(_gpx_document(1).encode("utf-8")), self.user
+        )
+
+        # The worker closes its connections when done, which would end the test transaction.
+        with mock.patch.object(import_jobs.connections, "close_all"):
+            import_jobs._drain()
+
+        interrupted.refresh_from_db()
+        self.assertEqual(
+            (interrupted.status, interrupted.error),
+            (ImportJobStatus.FAILED, INTERRUPTED_MESSAGE),
+        )
+        self.assertEqual(
+            ImportJob.objects.get(id=queued.id).status, ImportJobStatus.SUCCEEDED
+        )
@@ -0,0 +1,134 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the request and cross-request folder permission cache."""
+
+import os
+from unittest import mock
+
+from django.core.signals import request_finished, request_started
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.checks import check_shared_permission_cache
+from api.models import Folder, FolderPermission
+from api.permissions import (
+    can_write_activity,
+    get_accessible_folder_ids,
+    resolve_folder_access,
+)
+from api.tests.base import FolderTestMixin
+from users.models import TeamMembership
+
+
+class PermissionCacheTests(FolderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = Folder.objects.create(
+            name="Child", owner=self.owner, parent=self.root
+        )
+        self.permission = FolderPermission.objects.create(
+            folder=self.root, team=self.team, access=FolderPermission.Access.READ
+        )
+
+    def test_repeat_lookups_skip_permission_queries(self):
+        resolve_folder_access(self.member, self.child)
+        get_accessible_folder_ids(self.member)
+
+        # Only the permission generation is read from the cache.
+        with self.assertNumQueries(0):
+            access = resolve_folder_access(self.member, self.child)
+            accessible = get_accessible_folder_ids(self.member)
+
+        self.assertEqual((access.can_read, access.can_write), (True, False))
+        self.assertEqual(accessible, {self.root.id, self.child.id})
+
+    def test_permission_change_invalidates_cached_access(self):
+        self.assertFalse(resolve_folder_access(self.member, self.child).can_write)
+
+        self.permission.access = FolderPermission.Access.WRITE
+        self.permission.save()
+
+        self.assertTrue(resolve_folder_access(self.member, self.child).can_write)
+
+    def test_membership_removal_invalidates_cached_folder_ids(self):
+        self.assertEqual(
+            get_accessible_folder_ids(self.member), {self.root.id, self.child.id}
+        )
+
+        TeamMembership.objects.filter(user=self.member).delete()
+
+        self.assertEqual(get_accessible_folder_ids(self.member), set())
+
+    def test_folder_changes_invalidate_cached_folder_ids(self):
+        self.assertEqual(
+            get_accessible_folder_ids(self.member), {self.root.id, self.child.id}
+        )
+
+        grandchild = Folder.objects.create(
+            name="Grandchild", owner=self.owner, parent=self.child
+        )
+        self.assertIn(grandchild.id, get_accessible_folder_ids(self.member))
+
+        other_root = Folder.objects.create(name="Other", owner=self.owner)
+        self.child.parent = other_root
+        self.child.save()
+        self.assertEqual(get_accessible_folder_ids(self.member), {self.root.id})
+
+    def test_cached_sets_are_copies(self):
+        get_accessible_folder_ids(self.member).add("tampered")
+
+        self.assertNotIn("tampered", get_accessible_folder_ids(self.member))
+
+
+# Without the cross-request cache, so that only the memo can skip queries.
+@mock.patch("api.permission_cache._CACHE_TIMEOUT", 0)
+class RequestPermissionMemoTests(FolderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.child = Folder.objects.create(
+            name="Child", owner=self.owner, parent=self.root
+        )
+        FolderPermission.objects.create(
+            folder=self.root, user=self.member, access=FolderPermission.Access.WRITE
+        )
+        self.activity = self._create_activity_in_folder(self.child)
+
+    def test_lookups_are_memoised_for_the_request(self):
+        request_started.send(sender=self.__class__)
+        self.addCleanup(request_finished.send, sender=self.__class__)
+
+        self.assertTrue(can_write_activity(self.member, self.activity))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(can_write_activity(self.member, self.activity))
+            self.assertTrue(resolve_folder_access(self.member, self.child).can_read)
+
+    def test_memo_is_dropped_when_permissions_change_during_the_request(self):
+        request_started.send(sender=self.__class__)
+        self.addCleanup(request_finished.send, sender=self.__class__)
+        self.assertTrue(can_write_activity(self.member, self.activity))
+
+        FolderPermission.objects.filter(user=self.member).delete()
+
+        self.assertFalse(can_write_activity(self.member, self.activity))
+
+    def test_memo_does_not_outlive_the_request(self):
+        request_started.send(sender=self.__class__)
+        resolve_folder_access(self.member, self.child)
+        request_finished.send(sender=self.__class__)
+
+        with self.assertNumQueries(2):
+            resolve_folder_access(self.member, self.child)
+
+
+class SharedPermissionCacheCheckTests(SimpleTestCase):
+    def test_several_workers_need_a_shared_cache(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "4"}):
+            self.assertEqual(
+                [error.id for error in check_shared_permission_cache(None)],
+                ["api.E001"],
+            )
+
+            with override_settings(PERMISSION_CACHE_TIMEOUT=0):
+                self.assertEqual(check_shared_permission_cache(None), [])
+
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "1"}):
+            self.assertEqual(check_shared_permission_cache(None), [])
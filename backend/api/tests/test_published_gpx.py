@@ -0,0 +1,98 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the public published-activity GPX download."""
+
+import uuid
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from api.models import Activity
+
+CONTENT = b'<?xml version="1.0"?><gpx>' + b"x" * 1000 + b"</gpx>"
+
+
+class PublishedGPXTests(TestCase):
+    def setUp(self):
+        self.activity = Activity.objects.create(
+            author_id="1", name="Tour", description=""
+        )
+        self.activity.storePublishedFile(ContentFile(CONTENT))
+        self.addCleanup(self.activity.delete)
+        self.url = f"/api/v1/published/{self.activity.id}.gpx"
+
+    def _content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_streams_the_published_file_without_database_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._content(response), CONTENT)
+        self.assertEqual(response["Content-Type"], "application/gpx+xml")
+        self.assertEqual(response["Content-Length"], str(len(CONTENT)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    def test_unpublished_activity_is_not_found(self):
+        response = self.client.get(f"/api/v1/published/{uuid.uuid4()}.gpx")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_requests_get_not_modified(self):
+        response = self.client.get(self.url)
+
+        by_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        by_date = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_date.status_code, 304)
+        self.assertEqual(by_etag["ETag"], response["ETag"])
+
+    def test_republishing_changes_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.activity.storePublishedFile(ContentFile(CONTENT + b"<!-- again -->"))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_byte_ranges(self):
+        size = len(CONTENT)
+        for header, start, end in (
+            ("bytes=0-9", 0, 9),
+            ("bytes=10-", 10, size - 1),
+            ("bytes=-6", size - 6, size - 1),
+            ("bytes=1000-99999", 1000, size - 1),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self._content(response), CONTENT[start : end + 1])
+                self.assertEqual(
+                    response["Content-Range"], f"bytes {start}-{end}/{size}"
+                )
+                self.assertEqual(response["Content-Length"], str(end - start + 1))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(CONTENT)}-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_multiple_or_stale_ranges_get_the_whole_file(self):
+        multiple = self.client.get(self.url, HTTP_RANGE="bytes=0-1,5-6")
+        stale = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"'
+        )
+
+        for response in (multiple, stale):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self._content(response), CONTENT)
@@ -1,10 +1,13 @@
 # Copyright (c) Soundscape Community Contributors.
-"""Tests for the /api/v1/users/ endpoint."""
+"""Tests for the /api/v1/users/ endpoint and team name search."""
 
 from django.contrib.auth import get_user_model
-
+from django.test import SimpleTestCase
 from rest_framework.test import APITestCase
 
+from api.search import _prefix_upper_bound
+from users.models import Team
+
 User = get_user_model()
 
 
@@ -70,3 +73,66 @@ class UserSearchTests(APITestCase):
         response = self.client.get("/api/v1/users/", {"search": "testuser"})
         self.assertEqual(response.status_code, 200)
         self.assertLessEqual(len(response.data), 25)
+
+    def test_results_are_ranked(self):
+        for username in ("annabel", "joanna", "ann", "anna"):
+            User.objects.create_user(username=username, password="pass")
+        self.client.force_authenticate(user=self.alice)
+
+        response = self.client.get("/api/v1/users/", {"search": "ANN"})
+
+        # The exact match, then prefix matches, then other matches.
+        self.assertEqual(
+            [u["username"] for u in response.data], ["ann", "anna", "annabel", "joanna"]
+        )
+
+    def test_prefix_search(self):
+        for username in ("bobby", "rebob", "boa"):
+            User.objects.create_user(username=username, password="pass")
+        self.client.force_authenticate(user=self.alice)
+
+        response = self.client.get("/api/v1/users/", {"prefix": "Bob"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([u["username"] for u in response.data], ["bob", "bobby"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    def test_prefix_search_for_non_ascii_terms(self):
+        for username in ("Émile", "Emily", "Zoë", "zoe"):
+            User.objects.create_user(username=username, password="pass")
+        self.client.force_authenticate(user=self.alice)
+
+        self.assertEqual(
+            [
+                u["username"]
+                for u in self.client.get("/api/v1/users/", {"prefix": "Ém"}).data
+            ],
+            ["Émile"],
+        )
+        self.assertEqual(
+            [
+                u["username"]
+                for u in self.client.get("/api/v1/users/", {"prefix": "zoë"}).data
+            ],
+            ["Zoë"],
+        )
+
+    def test_team_search(self):
+        for name in ("Field Team", "Fieldwork", "Office"):
+            Team.objects.create(name=name, owner=self.alice)
+        Team.objects.create(name="Fieldworkers", owner=self.bob)
+        self.client.force_authenticate(user=self.alice)
+
+        contains = self.client.get("/api/v1/teams/", {"search": "work"})
+        prefix = self.client.get("/api/v1/teams/", {"prefix": "field"})
+
+        self.assertEqual([t["name"] for t in contains.data], ["Fieldwork"])
+        self.assertEqual([t["name"] for t in prefix.data], ["Fieldwork", "Field Team"])
+
+
+class PrefixUpperBoundTests(SimpleTestCase):
+    def test_upper_bound(self):
+        self.assertEqual(_prefix_upper_bound("bob"), "boc")
+        self.assertEqual(_prefix_upper_bound("b\U0010ffff"), "c")
+        self.assertIsNone(_prefix_upper_bound("\U0010ffff\U0010ffff"))
@@ -0,0 +1,192 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the batch waypoint create/update/delete endpoint."""
+
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.models import (
+    Activity,
+    FolderPermission,
+    Waypoint,
+    WaypointGroup,
+    WaypointGroupType,
+)
+from api.tests.base import FolderTestMixin
+
+
+class WaypointBatchTests(FolderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.activity = self._create_activity_in_folder(self.root)
+        self.group = WaypointGroup.objects.create(
+            activity=self.activity, type=WaypointGroupType.ORDERED
+        )
+        self.stops = [
+            Waypoint.objects.create(
+                group=self.group,
+                index=index,
+                name=f"Stop {index}",
+                latitude=Decimal("1.0"),
+                longitude=Decimal("2.0"),
+            )
+            for index in range(4)
+        ]
+        self.url = f"/api/v1/waypoint_groups/{self.group.id}/waypoints/batch/"
+        self.client.force_authenticate(user=self.owner)
+
+    def _post(self, operations):
+        return self.client.post(self.url, {"operations": operations}, format="json")
+
+    def _route(self):
+        return list(
+            Waypoint.objects.filter(group=self.group).values_list("index", "name")
+        )
+
+    def test_applies_mixed_operations(self):
+        Activity.objects.filter(id=self.activity.id).update(unpublished_changes=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._post(
+                [
+                    {"op": "delete", "id": str(self.stops[1].id)},
+                    {
+                        "op": "create",
+                        "name": "New",
+                        "latitude": "3.5",
+                        "longitude": "4.5",
+                    },
+                    {"op": "update", "id": str(self.stops[2].id), "name": "Renamed"},
+                    {"op": "delete", "id": str(self.stops[0].id)},
+                ]
+            )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self._route(), [(0, "Renamed"), (1, "Stop 3"), (2, "New")])
+        results = response.data["results"]
+        self.assertEqual(
+            [result["op"] for result in results],
+            ["delete", "create", "update", "delete"],
+        )
+        self.assertEqual(results[1]["waypoint"]["index"], 2)
+        self.assertEqual(results[1]["waypoint"]["latitude"], "3.500000")
+        self.assertEqual(
+            results[2]["waypoint"],
+            {**results[2]["waypoint"], "index": 0, "name": "Renamed"},
+        )
+        self.assertNotIn("waypoint", results[0])
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        query_counts = []
+        for count in (2, 40):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self._post(
+                    [
+                        {
+                            "op": "create",
+                            "name": f"Pasted {index}",
+                            "latitude": "1.0",
+                            "longitude": "2.0",
+                        }
+                        for index in range(count)
+                    ]
+                )
+            self.assertEqual(response.status_code, 200, response.data)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual([index for index, _ in self._route()], list(range(46)))
+
+    def test_invalid_operations_reject_the_whole_batch(self):
+        other_group = WaypointGroup.objects.create(
+            activity=self.activity, type=WaypointGroupType.UNORDERED
+        )
+        stranger = Waypoint.objects.create(
+            group=other_group, name="Elsewhere", latitude=1, longitude=2
+        )
+
+        response = self._post(
+            [
+                {"op": "delete", "id": str(self.stops[0].id)},
+                {"op": "create", "name": "Missing coordinates"},
+                {"op": "update", "id": str(stranger.id), "name": "Moved"},
+                {"op": "update", "id": str(self.stops[0].id), "name": "Deleted twice"},
+                {"op": "rename"},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data["operations"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("latitude", errors[1])
+        self.assertIn("id", errors[2])
+        self.assertIn("id", errors[3])
+        self.assertIn("op", errors[4])
+        self.assertEqual(len(self._route()), 4)
+
+    def test_unordered_groups_keep_null_indexes(self):
+        pois = WaypointGroup.objects.create(
+            activity=self.activity, type=WaypointGroupType.UNORDERED
+        )
+
+        response = self.client.post(
+            f"/api/v1/waypoint_groups/{pois.id}/waypoints/batch/",
+            {
+                "operations": [
+                    {
+                        "op": "create",
+                        "name": "Cafe",
+                        "latitude": "1.0",
+                        "longitude": "2.0",
+                    }
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(Waypoint.objects.get(group=pois).index)
+
+    def test_requires_write_access(self):
+        FolderPermission.objects.create(
+            folder=self.root, team=self.team, access=FolderPermission.Access.READ
+        )
+        self.client.force_authenticate(user=self.member)
+
+        response = self._post([{"op": "delete", "id": str(self.stops[0].id)}])
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(self._route()), 4)
+
+    def test_batch_size_is_limited(self):
+        with mock.patch("api.views._WAYPOINT_BATCH_MAX_OPERATIONS", 2):
+            response = self._post(
+                [{"op": "delete", "id": str(stop.id)} for stop in self.stops]
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self._route()), 4)
+
+    def test_operations_can_be_sent_as_a_bare_list(self):
+        response = self.client.post(
+            self.url, [{"op": "delete", "id": str(self.stops[0].id)}], format="json"
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(self._route()), 3)
+
+    def test_other_bodies_are_rejected(self):
+        for body in ({"operations": "delete"}, {}, "delete", 3):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, format="json")
+
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("operations", response.data)
+        self.assertEqual(len(self._route()), 4)
@@ -3,7 +3,9 @@ from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 from api.models import Activity, MediaType, Waypoint, WaypointGroup, WaypointGroupType, WaypointMedia
@@ -100,7 +102,8 @@ class WaypointReorderTests(TestCase):
         self.activity.save(update_fields=["unpublished_changes"])
 
         url = f"/api/v1/waypoint_groups/{self.group.id}/reverse_order/"
-        response = self.client.post(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
 
         self.assertEqual(response.status_code, 200, response.data)
         self.wp0.refresh_from_db()
@@ -187,7 +190,8 @@ class WaypointReorderTests(TestCase):
         self.activity.save(update_fields=["unpublished_changes"])
 
         url = f"/api/v1/waypoint_groups/{self.group.id}/make_return_route/"
-        response = self.client.post(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
 
         self.assertEqual(response.status_code, 200, response.data)
         self.activity.refresh_from_db()
@@ -280,3 +284,154 @@ class WaypointReorderTests(TestCase):
         response = self.client.post(url)
 
         self.assertEqual(response.status_code, 400, response.data)
+
+    def _append_waypoints(self, count):
+        start = Waypoint.objects.filter(group=self.group).count()
+        return [
+            Waypoint.objects.create(
+                group=self.group,
+                index=index,
+                name=f"Stop {index}",
+                latitude=Decimal("1.000000"),
+                longitude=Decimal("2.000000"),
+            )
+            for index in range(start, start + count)
+        ]
+
+    def test_delete_waypoint_compacts_later_indexes(self):
+        self._append_waypoints(3)
+        self.activity.unpublished_changes = False
+        self.activity.save(update_fields=["unpublished_changes"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/v1/waypoints/{self.wp1.id}/")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("index", "name")),
+            [(0, "First"), (1, "Stop 2"), (2, "Stop 3"), (3, "Stop 4")],
+        )
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
+
+    def test_delete_waypoint_without_an_index(self):
+        Waypoint.objects.filter(id=self.wp1.id).update(index=None)
+
+        response = self.client.delete(f"/api/v1/waypoints/{self.wp1.id}/")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("index", "name")),
+            [(0, "First")],
+        )
+
+    def test_delete_waypoint_query_count_does_not_depend_on_route_length(self):
+        query_counts = []
+        for count in (3, 30):
+            self._append_waypoints(count)
+            first = Waypoint.objects.get(group=self.group, index=0)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(f"/api/v1/waypoints/{first.id}/")
+            self.assertEqual(response.status_code, 204)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("index", flat=True)),
+            list(range(33)),
+        )
+
+    def test_reorder_applies_a_full_permutation(self):
+        stops = self._append_waypoints(4)
+        self.activity.unpublished_changes = False
+        self.activity.save(update_fields=["unpublished_changes"])
+        order = [self.wp0, stops[3], self.wp1, stops[0], stops[1], stops[2]]
+
+        url = f"/api/v1/waypoint_groups/{self.group.id}/reorder/"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"waypoints": [str(w.id) for w in order]}, format="json")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([w["id"] for w in response.data["waypoints"]], [str(w.id) for w in order])
+        self.assertEqual([w["index"] for w in response.data["waypoints"]], list(range(6)))
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("id", flat=True)),
+            [w.id for w in order],
+        )
+        self.activity.refresh_from_db()
+        self.assertTrue(self.activity.unpublished_changes)
+
+    def test_reorder_rejects_lists_that_are_not_a_permutation(self):
+        other_group = WaypointGroup.objects.create(activity=self.activity, type=WaypointGroupType.ORDERED)
+        stranger = Waypoint.objects.create(
+            group=other_group, index=0, name="Elsewhere", latitude=Decimal("1.0"), longitude=Decimal("2.0")
+        )
+        url = f"/api/v1/waypoint_groups/{self.group.id}/reorder/"
+
+        for waypoints in (
+            [str(self.wp1.id)],
+            [str(self.wp1.id), str(self.wp1.id)],
+            [str(self.wp1.id), str(stranger.id)],
+            str(self.wp1.id),
+        ):
+            with self.subTest(waypoints=waypoints):
+                response = self.client.post(url, {"waypoints": waypoints}, format="json")
+                self.assertEqual(response.status_code, 400, response.data)
+
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("id", flat=True)),
+            [self.wp0.id, self.wp1.id],
+        )
+
+    def test_reorder_accepts_a_bare_list_of_ids(self):
+        url = f"/api/v1/waypoint_groups/{self.group.id}/reorder/"
+        response = self.client.post(url, [str(self.wp1.id), str(self.wp0.id)], format="json")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            list(Waypoint.objects.filter(group=self.group).values_list("id", flat=True)),
+            [self.wp1.id, self.wp0.id],
+        )
+
+    def test_reorder_rejects_other_bodies(self):
+        url = f"/api/v1/waypoint_groups/{self.group.id}/reorder/"
+
+        for body in ({}, str(self.wp1.id), 3):
+            with self.subTest(body=body):
+                response = self.client.post(url, body, format="json")
+                self.assertEqual(response.status_code, 400, response.data)
+                self.assertIn("waypoints", response.data)
+
+    def test_reorder_rejects_unordered_group(self):
+        unordered_group = WaypointGroup.objects.create(activity=self.activity, type=WaypointGroupType.UNORDERED)
+
+        url = f"/api/v1/waypoint_groups/{unordered_group.id}/reorder/"
+        response = self.client.post(url, {"waypoints": []}, format="json")
+
+        self.assertEqual(response.status_code, 400, response.data)
+
+    def test_make_return_route_query_count_does_not_depend_on_route_length(self):
+        url = f"/api/v1/waypoint_groups/{self.group.id}/make_return_route/"
+        query_counts = []
+        for count in (3, 30):
+            Waypoint.objects.filter(group=self.group).exclude(index__lt=2).delete()
+            for waypoint in self._append_waypoints(count):
+                WaypointMedia.objects.create(
+                    waypoint=waypoint, media="shared.mp3", type=MediaType.AUDIO, mime_type="audio/mpeg", index=0
+                )
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url)
+
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(len(response.data["waypoints"]), 2 * (count + 2) - 1)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(
+            WaypointMedia.objects.filter(waypoint__group=self.group, media="shared.mp3").count(),
+            30 + 29,
+        )
+        route = response.data["waypoints"]
+        self.assertEqual([waypoint["index"] for waypoint in route], list(range(63)))
+        self.assertEqual(route[32]["audio_clips"][0]["mime_type"], "audio/mpeg")
@@ -8,6 +8,8 @@ from .views import (
     ActivityViewSet,
     FolderPermissionViewSet,
     FolderViewSet,
+    ImportJobViewSet,
+    published_activity_gpx,
     TeamMembershipViewSet,
     TeamViewSet,
     RuntimeConfigView,
@@ -23,6 +25,7 @@ router.register(r'waypoint_groups', WaypointGroupViewSet)
 router.register(r'waypoints', WaypointViewSet)
 router.register(r'waypoints_media', WaypointMediaViewSet)
 router.register(r'folders', FolderViewSet)
+router.register(r'import_jobs', ImportJobViewSet)
 router.register(r'folder_permissions', FolderPermissionViewSet, basename='folder_permission')
 router.register(r'teams', TeamViewSet)
 router.register(r'team_memberships', TeamMembershipViewSet)
@@ -30,5 +33,6 @@ router.register(r'users', UserViewSet)
 
 urlpatterns = [
     path('v1/runtime-config/', RuntimeConfigView.as_view()),
+    path('v1/published/<uuid:activity_id>.gpx', published_activity_gpx, name='published-activity-gpx'),
     path('v1/', include(router.urls)),
 ]
@@ -4,15 +4,18 @@
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.db.models import Q as UserQ
-from django.http import HttpResponse
-from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
 from django.db import models, transaction
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_http_methods
+from files.responses import storage_file_response
 from users.models import Team, TeamMembership
 
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -24,29 +27,56 @@ from .models import (
     Activity,
     Folder,
     FolderTeamPermission,
-    FolderPermissionAccess,
     FolderUserPermission,
+    ImportJob,
     MediaType,
     Waypoint,
     WaypointGroup,
     WaypointGroupType,
     WaypointMedia,
 )
-from .permissions import can_manage_team, can_write_activity, get_accessible_folder_ids, resolve_folder_access
+from .permissions import (
+    can_manage_team,
+    can_write_activity,
+    get_accessible_folder_ids,
+    get_writable_folder_ids,
+    resolve_folder_access,
+)
 from .serializers import (
     ActivityListSerializer,
     ActivityDetailSerializer,
     FolderPermissionSerializer,
     FolderSerializer,
+    ImportJobSerializer,
     TeamMembershipSerializer,
     TeamSerializer,
     UserSerializer,
+    WaypointBatchFieldsSerializer,
     WaypointGroupSerializer,
     WaypointSerializer,
     WaypointMediaSerializer,
 )
-from .model_utils import duplicate_activity, shift_waypoints_after_delete
-from .gpx_utils import activity_to_gpx, gpx_to_activity
+from .model_utils import (
+    annotate_activity_counts,
+    append_return_route,
+    apply_waypoint_batch,
+    duplicate_activity,
+    prefetch_activity_tree,
+    renumber_waypoints,
+    shift_waypoints_after_delete,
+)
+from .gpx_utils import activity_gpx_version, activity_to_gpx_file, gpx_to_activity, open_activity_gpx
+from .import_jobs import enqueue_import_job
+from .pagination import ActivityCursorPagination
+from .search import ranked_search, search_activities
+from .geo import BoundingBox, activities_in_bbox, waypoints_in_bbox
+
+_WAYPOINT_BATCH_MAX_OPERATIONS = getattr(settings, 'WAYPOINT_BATCH_MAX_OPERATIONS', 1000)
+_PUBLISHED_GPX_MAX_AGE = getattr(settings, 'PUBLISHED_GPX_MAX_AGE', 5 * 60)  # seconds
+_USER_PREFIX_SEARCH_MAX_AGE = getattr(settings, 'USER_PREFIX_SEARCH_MAX_AGE', 30)  # seconds
+_ACTIVITY_SEARCH_MAX_RESULTS = getattr(settings, 'ACTIVITY_SEARCH_MAX_RESULTS', 50)
+_ACTIVITY_BBOX_MAX_RESULTS = getattr(settings, 'ACTIVITY_BBOX_MAX_RESULTS', 100)
+_WAYPOINT_BBOX_MAX_RESULTS = getattr(settings, 'WAYPOINT_BBOX_MAX_RESULTS', 500)
 
 
 class ActivityWritePermissionMixin:
@@ -57,10 +87,35 @@ class ActivityWritePermissionMixin:
             raise PermissionDenied("No write access to activity")
 
 
-def gpx_response(content, filename):
-    response = HttpResponse(content, content_type='application/gpx+xml')
-    response['Content-Disposition'] = 'attachment; filename="{0}.gpx"'.format(filename)
-    return response
+def list_from_body(data, field: str) -> list:
+    """
+    The list sent as the request body, either bare or as its *field*. Raises
+    ValidationError with a *field* error for any other body.
+    """
+    value = data if isinstance(data, list) else data.get(field) if isinstance(data, dict) else None
+    if not isinstance(value, list):
+        raise ValidationError({field: ['Expected a list.']})
+    return value
+
+
+def gpx_response(gpx_file, filename):
+    return FileResponse(gpx_file, as_attachment=True, filename=f'{filename}.gpx',
+                        content_type='application/gpx+xml')
+
+
+@require_http_methods(['GET', 'HEAD'])
+def published_activity_gpx(request, activity_id):
+    """
+    Public download of the GPX file written when an activity is published. The file is
+    streamed straight from storage without touching the database, so responses can be
+    cached by a CDN or reverse proxy and revalidated with the ETag.
+    """
+    return storage_file_response(
+        request,
+        Activity(id=activity_id).gpx_file_path,
+        content_type='application/gpx+xml',
+        cache_control={'public': True, 'max_age': _PUBLISHED_GPX_MAX_AGE},
+    )
 
 
 def get_accessible_activity_queryset(user):
@@ -69,9 +124,29 @@ def get_accessible_activity_queryset(user):
     if user.is_staff:
         return Activity.objects.all()
     accessible_folder_ids = get_accessible_folder_ids(user)
+    # Both conditions are on Activity's own columns, so no row can match twice.
     return Activity.objects.filter(
         models.Q(author_id=str(user.id)) | models.Q(folder_id__in=accessible_folder_ids)
-    ).distinct()
+    )
+
+
+def search_from_query_params(queryset, field, request):
+    """Applies the request's ``?prefix=`` or ``?search=`` as a ranked search on *field*."""
+    params = request.query_params
+    if 'prefix' in params:
+        return ranked_search(queryset, field, params['prefix'], prefix=True)
+    return ranked_search(queryset, field, params.get('search', ''))
+
+
+def bbox_from_query_params(request):
+    """The request's ``?bbox=minlon,minlat,maxlon,maxlat``, or None without one."""
+    value = request.query_params.get('bbox')
+    if value is None:
+        return None
+    try:
+        return BoundingBox.parse(value)
+    except ValueError as error:
+        raise ValidationError({'bbox': str(error)})
 
 
 class RuntimeConfigView(APIView):
@@ -88,8 +163,27 @@ class RuntimeConfigView(APIView):
 
 class ActivityViewSet(ModelViewSet):
     queryset = Activity.objects.all()
+    pagination_class = ActivityCursorPagination
+
+    # Actions that read the full waypoint tree of a single activity.
+    tree_actions = frozenset({'retrieve', 'publish'})
+    # Actions that return activities with ActivityListSerializer.
+    list_actions = frozenset({'list', 'search'})
 
     def get_queryset(self):
+        queryset = self.get_base_queryset()
+        if self.action in self.tree_actions:
+            queryset = prefetch_activity_tree(queryset)
+        elif self.action in self.list_actions:
+            queryset = annotate_activity_counts(queryset)
+            omitted = ActivityListSerializer.omitted_fields(self.request)
+            queryset = queryset.defer('search_document', *omitted)
+        return queryset
+
+    def get_activity_with_tree(self, activity_id):
+        return prefetch_activity_tree(Activity.objects.filter(id=activity_id)).get()
+
+    def get_base_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
             return Activity.objects.none()
@@ -111,10 +205,23 @@ class ActivityViewSet(ModelViewSet):
         return get_accessible_activity_queryset(user)
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in self.list_actions:
             return ActivityListSerializer
         return ActivityDetailSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        With ``?bbox=minlon,minlat,maxlon,maxlat``, returns the activities with a waypoint
+        in the box, the nearest to its centre first, as ``{"results": [...]}``.
+        """
+        bbox = bbox_from_query_params(request)
+        if bbox is None:
+            return super().list(request, *args, **kwargs)
+
+        activities = activities_in_bbox(self.get_queryset(), bbox)[:_ACTIVITY_BBOX_MAX_RESULTS]
+        serializer = self.get_serializer(activities, many=True)
+        return Response({'results': serializer.data})
+
     def perform_create(self, serializer):
         # Make sure the user id is valid and append it to the activity
         user_id = self.request.user.id
@@ -156,12 +263,26 @@ class ActivityViewSet(ModelViewSet):
             raise PermissionDenied("No permission to delete activity")
         instance.delete()
 
+    @action(detail=False, methods=['GET'], name='Search')
+    def search(self, request):
+        """
+        Returns the activities matching ``?q=`` in their name, description or waypoint
+        text, best match first. Accepts ``folder_id`` and ``omit`` like the list.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'A search query is required.'})
+
+        activities = search_activities(self.get_queryset(), query)[:_ACTIVITY_SEARCH_MAX_RESULTS]
+        serializer = self.get_serializer(activities, many=True)
+        return Response({'results': serializer.data})
+
     @action(detail=True, methods=['POST'], name='Duplicate')
     def duplicate(self, request, pk=None):
         activity = self.get_object()
         duplicated = duplicate_activity(activity)
 
-        queryset = Activity.objects.get(id=duplicated.id)
+        queryset = self.get_activity_with_tree(duplicated.id)
         serializer = self.get_serializer(queryset, many=False)
         return Response(serializer.data)
 
@@ -171,25 +292,30 @@ class ActivityViewSet(ModelViewSet):
         if not can_write_activity(request.user, activity):
             raise ValidationError("No write access to activity")
 
-        content = activity_to_gpx(activity)
-        content_bytes = bytes(content, 'utf-8')
-        content_file = ContentFile(content_bytes)
-
-        activity.storePublishedFile(content_file)
+        with activity_to_gpx_file(activity) as gpx_file:
+            activity.storePublishedFile(File(gpx_file))
 
         activity.last_published = timezone.now()
         activity.unpublished_changes = False
         activity.save(update_fields=['last_published', 'unpublished_changes'])
 
-        queryset = Activity.objects.get(id=activity.id)
+        queryset = self.get_activity_with_tree(activity.id)
         serializer = self.get_serializer(queryset, many=False)
         return Response(serializer.data)
 
     @action(detail=True, methods=['GET'], name='Export GPX')
     def export_gpx(self, request, pk=None):
         activity = self.get_object()
-        content = activity_to_gpx(activity)
-        return gpx_response(content, activity.name)
+        etag = f'"{activity_gpx_version(activity)}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = gpx_response(open_activity_gpx(activity), activity.name)
+
+        response['ETag'] = etag
+        # Clients may keep the download but must check it is still current before reusing it.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     @action(detail=False, methods=['POST'], name='Import GPX')
     def import_gpx(self, request):
@@ -207,10 +333,37 @@ class ActivityViewSet(ModelViewSet):
             raise ValidationError(
                 'Invalid activity. Please use a previously exported GPX file containing the activity.') from e
 
-        serializer = self.get_serializer(activity, many=False)
+        serializer = self.get_serializer(self.get_activity_with_tree(activity.id), many=False)
         return Response(serializer.data)
 
 
+class ImportJobViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    """GPX imports that run in the background.
+
+    ``POST`` a ``gpx`` file to queue an import; the response is ``202`` with the new
+    job. Poll ``import_jobs/{id}/`` for its status, media download progress, stage
+    timings and error, and read ``activity`` once it has succeeded.
+    """
+
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        if not user or not user.is_authenticated:
+            return ImportJob.objects.none()
+        return ImportJob.objects.filter(user=user)
+
+    def create(self, request):
+        gpx = request.FILES.get('gpx')
+        if gpx is None:
+            raise ValidationError('Missing GPX file')
+
+        job = enqueue_import_job(gpx, request.user)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=202)
+
+
 class WaypointGroupViewSet(ActivityWritePermissionMixin, ModelViewSet):
     queryset = WaypointGroup.objects.all()
     serializer_class = WaypointGroupSerializer
@@ -230,6 +383,12 @@ class WaypointGroupViewSet(ActivityWritePermissionMixin, ModelViewSet):
         self._check_activity_write_permission(instance.activity)
         instance.delete()
 
+    def _group_response(self, group):
+        # Loads the waypoints and their media up front instead of two queries per waypoint.
+        group = WaypointGroup.objects.prefetch_related('waypoint_set__waypointmedia_set').get(id=group.id)
+        serializer = self.get_serializer(group, many=False)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['POST'], name='Reverse Order')
     @transaction.atomic
     def reverse_order(self, request, pk=None):
@@ -240,20 +399,116 @@ class WaypointGroupViewSet(ActivityWritePermissionMixin, ModelViewSet):
             raise ValidationError("Only ordered waypoint groups can be reversed")
 
         waypoints = list(Waypoint.objects.select_for_update().filter(group=group).order_by("index"))
-        if len(waypoints) > 1:
-            for offset, waypoint in enumerate(waypoints):
-                waypoint.index = -(offset + 1)
-            Waypoint.objects.bulk_update(waypoints, ["index"])
-
-            updated_at = timezone.now()
-            for index, waypoint in enumerate(reversed(waypoints)):
-                waypoint.index = index
-                waypoint.updated = updated_at
-            Waypoint.objects.bulk_update(waypoints, ["index", "updated"])
+        if renumber_waypoints(list(reversed(waypoints))):
             group.activity.child_entity_did_update()
 
-        serializer = self.get_serializer(group, many=False)
-        return Response(serializer.data)
+        return self._group_response(group)
+
+    @action(detail=True, methods=['POST'], name='Reorder')
+    @transaction.atomic
+    def reorder(self, request, pk=None):
+        """
+        Puts the waypoints of an ordered group in the order of the given waypoint ids, sent
+        bare or as ``waypoints``.
+        """
+        group = self.get_object()
+        self._check_activity_write_permission(group.activity)
+
+        if group.type != WaypointGroupType.ORDERED:
+            raise ValidationError("Only ordered waypoint groups can be reordered")
+
+        waypoint_ids = list_from_body(request.data, 'waypoints')
+
+        waypoints = {
+            str(waypoint.id): waypoint
+            for waypoint in Waypoint.objects.select_for_update().filter(group=group)
+        }
+        new_order = [str(waypoint_id) for waypoint_id in waypoint_ids]
+        if len(new_order) != len(waypoints) or set(new_order) != set(waypoints):
+            raise ValidationError("waypoints must list every waypoint of the group exactly once")
+
+        if renumber_waypoints([waypoints[waypoint_id] for waypoint_id in new_order]):
+            group.activity.child_entity_did_update()
+
+        return self._group_response(group)
+
+    @action(detail=True, methods=['POST'], url_path='waypoints/batch', name='Batch Waypoints')
+    @transaction.atomic
+    def batch_waypoints(self, request, pk=None):
+        """
+        Applies a list of waypoint operations, sent bare or as ``operations``, to the group
+        in one transaction. Each operation is ``{"op": "create", ...fields}``,
+        ``{"op": "update", "id": ..., ...fields}`` or ``{"op": "delete", "id": ...}``.
+        Nothing is applied unless every operation is valid.
+        """
+        group = self.get_object()
+        self._check_activity_write_permission(group.activity)
+
+        operations = list_from_body(request.data, 'operations')
+        if len(operations) > _WAYPOINT_BATCH_MAX_OPERATIONS:
+            raise ValidationError(f"A batch can hold at most {_WAYPOINT_BATCH_MAX_OPERATIONS} operations")
+
+        waypoints = list(Waypoint.objects.select_for_update().filter(group=group).order_by('index'))
+        waypoints_by_id = {str(waypoint.id): waypoint for waypoint in waypoints}
+        creates, updates, delete_ids = [], [], set()
+        errors = []
+        seen_ids = set()
+
+        for operation in operations:
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op not in ('create', 'update', 'delete'):
+                errors.append({'op': ['Must be one of create, update or delete.']})
+                continue
+
+            waypoint = None
+            if op != 'create':
+                waypoint_id = str(operation.get('id'))
+                waypoint = waypoints_by_id.get(waypoint_id)
+                if waypoint is None:
+                    errors.append({'id': ['Not a waypoint of this group.']})
+                    continue
+                if waypoint_id in seen_ids:
+                    errors.append({'id': ['Only one operation per waypoint is allowed.']})
+                    continue
+                seen_ids.add(waypoint_id)
+
+            if op == 'delete':
+                delete_ids.add(waypoint.id)
+                errors.append({})
+                continue
+
+            fields = WaypointBatchFieldsSerializer(waypoint, data=operation, partial=op == 'update')
+            if not fields.is_valid():
+                errors.append(fields.errors)
+            elif op == 'create':
+                creates.append(fields.validated_data)
+                errors.append({})
+            else:
+                updates.append((waypoint, fields.validated_data))
+                errors.append({})
+
+        if any(errors):
+            raise ValidationError({'operations': errors})
+
+        created = apply_waypoint_batch(group, waypoints, creates, updates, delete_ids)
+
+        saved_ids = [waypoint.id for waypoint in created] + [waypoint.id for waypoint, _ in updates]
+        saved = Waypoint.objects.filter(id__in=saved_ids).select_related('group').prefetch_related('waypointmedia_set')
+        saved_by_id = {waypoint.id: waypoint for waypoint in saved}
+        created = iter(created)
+        results = []
+        for operation in operations:
+            if operation['op'] == 'create':
+                waypoint = next(created)
+            else:
+                waypoint = waypoints_by_id[str(operation['id'])]
+
+            result = {'op': operation['op'], 'id': str(waypoint.id)}
+            if waypoint.id in saved_by_id:
+                result['waypoint'] = WaypointSerializer(saved_by_id[waypoint.id]).data
+            results.append(result)
+
+        return Response({'results': results})
 
     @action(detail=True, methods=['POST'], name='Make Return Route')
     @transaction.atomic
@@ -264,34 +519,12 @@ class WaypointGroupViewSet(ActivityWritePermissionMixin, ModelViewSet):
         if group.type != WaypointGroupType.ORDERED:
             raise ValidationError("Only ordered waypoint groups can be made into return routes")
 
-        waypoints = list(Waypoint.objects.select_for_update().filter(group=group).order_by("index"))
-        if len(waypoints) > 1:
-            next_index = len(waypoints)
-            for waypoint in reversed(waypoints[:-1]):
-                return_waypoint = Waypoint.objects.create(
-                    group=group,
-                    index=next_index,
-                    name=waypoint.name,
-                    description=waypoint.description,
-                    departure_callout=waypoint.departure_callout,
-                    arrival_callout=waypoint.arrival_callout,
-                    latitude=waypoint.latitude,
-                    longitude=waypoint.longitude,
-                )
-                next_index += 1
-
-                for waypoint_media in waypoint.media_items:
-                    WaypointMedia.objects.create(
-                        waypoint=return_waypoint,
-                        media=waypoint_media.media.name,
-                        type=waypoint_media.type,
-                        mime_type=waypoint_media.mime_type,
-                        description=waypoint_media.description,
-                        index=waypoint_media.index,
-                    )
+        waypoints = list(
+            Waypoint.objects.select_for_update().filter(group=group).order_by("index").prefetch_related('waypointmedia_set')
+        )
+        append_return_route(group, waypoints)
 
-        serializer = self.get_serializer(group, many=False)
-        return Response(serializer.data)
+        return self._group_response(group)
 
 
 class WaypointViewSet(ActivityWritePermissionMixin, ModelViewSet):
@@ -303,6 +536,23 @@ class WaypointViewSet(ActivityWritePermissionMixin, ModelViewSet):
             group__activity__in=get_accessible_activity_queryset(self.request.user)
         )
 
+    def list(self, request, *args, **kwargs):
+        """
+        With ``?bbox=minlon,minlat,maxlon,maxlat``, returns the waypoints in the box, the
+        nearest to its centre first.
+        """
+        bbox = bbox_from_query_params(request)
+        if bbox is None:
+            return super().list(request, *args, **kwargs)
+
+        waypoints = (
+            waypoints_in_bbox(self.get_queryset(), bbox)
+            .select_related('group')
+            .prefetch_related('waypointmedia_set')[:_WAYPOINT_BBOX_MAX_RESULTS]
+        )
+        serializer = self.get_serializer(waypoints, many=True)
+        return Response(serializer.data)
+
     # Lifecycle
 
     def perform_create(self, serializer):
@@ -395,6 +645,7 @@ class WaypointViewSet(ActivityWritePermissionMixin, ModelViewSet):
         other_waypoint.index = current_index
         other_waypoint.save()
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         group: WaypointGroup = instance.group
         self._check_activity_write_permission(group.activity)
@@ -444,17 +695,8 @@ class FolderViewSet(ModelViewSet):
             return
         if folder and parent.id == folder.id:
             raise ValidationError("Folder cannot be its own parent")
-        current = parent
-        depth = 0
-        seen_ids = set()
-        while current is not None and depth < 100:
-            if current.id in seen_ids:
-                break
-            if folder and current.id == folder.id:
-                raise ValidationError("Folder cannot be moved under its descendant")
-            seen_ids.add(current.id)
-            current = current.parent
-            depth += 1
+        if folder and folder.id in parent.ancestor_ids:
+            raise ValidationError("Folder cannot be moved under its descendant")
 
     def get_queryset(self):
         user = self.request.user
@@ -463,7 +705,6 @@ class FolderViewSet(ModelViewSet):
         if user.is_staff:
             return Folder.objects.all()
         accessible_ids = get_accessible_folder_ids(user)
-        # Follow-up: replace ancestor traversal with a recursive CTE if needed for larger hierarchies.
         return Folder.objects.filter(id__in=accessible_ids)
 
     def perform_create(self, serializer):
@@ -485,7 +726,12 @@ class FolderViewSet(ModelViewSet):
         access = resolve_folder_access(self.request.user, serializer.instance)
         if not access.can_write:
             raise PermissionDenied("No write access to folder")
-        serializer.save()
+        try:
+            serializer.save()
+        except DjangoValidationError as exc:
+            # A concurrent move can still make the new parent a descendant; Folder.save
+            # checks the paths in the database again.
+            raise ValidationError(exc.messages) from exc
 
     def perform_destroy(self, instance):
         access = resolve_folder_access(self.request.user, instance)
@@ -498,43 +744,7 @@ class FolderPermissionViewSet(GenericViewSet):
     serializer_class = FolderPermissionSerializer
 
     def _get_writable_folder_ids(self):
-        user = self.request.user
-        if not user or not user.is_authenticated:
-            return set()
-        if user.is_staff:
-            return set(Folder.objects.values_list("id", flat=True))
-
-        # Owned folders are always writable.
-        owned_ids = set(Folder.objects.filter(owner=user).values_list("id", flat=True))
-
-        # Folders with explicit WRITE permission for this user or their teams.
-        team_ids = list(TeamMembership.objects.filter(user_id=user.id).values_list("team_id", flat=True))
-        user_write_ids = set(
-            FolderUserPermission.objects.filter(user_id=user.id, access=FolderPermissionAccess.WRITE)
-            .values_list("folder_id", flat=True)
-        )
-        team_write_ids = set(
-            FolderTeamPermission.objects.filter(team_id__in=team_ids, access=FolderPermissionAccess.WRITE)
-            .values_list("folder_id", flat=True)
-        )
-        write_perm_folder_ids = user_write_ids | team_write_ids
-
-        writable_ids = owned_ids | write_perm_folder_ids
-
-        # Include descendants that inherit write access.
-        frontier = set(writable_ids)
-        while frontier:
-            child_ids = set(
-                Folder.objects.filter(parent_id__in=frontier)
-                .exclude(id__in=writable_ids)
-                .values_list("id", flat=True)
-            )
-            if not child_ids:
-                break
-            writable_ids |= child_ids
-            frontier = child_ids
-
-        return writable_ids
+        return get_writable_folder_ids(self.request.user)
 
     def get_queryset(self):
         writable_ids = self._get_writable_folder_ids()
@@ -634,11 +844,13 @@ class TeamViewSet(ModelViewSet):
         if not user or not user.is_authenticated:
             return Team.objects.none()
         if user.is_staff:
-            return Team.objects.all()
-        return Team.objects.filter(
-            models.Q(owner=user)
-            | models.Q(memberships__user=user, memberships__role=TeamMembership.Role.ADMIN)
-        ).distinct()
+            teams = Team.objects.all()
+        else:
+            administered = TeamMembership.objects.filter(user=user, role=TeamMembership.Role.ADMIN)
+            teams = Team.objects.filter(models.Q(owner=user) | models.Q(id__in=administered.values("team_id")))
+        if self.action == "list":
+            teams = search_from_query_params(teams, "name", self.request)
+        return teams
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -695,7 +907,9 @@ class UserViewSet(ListModelMixin, GenericViewSet):
 
     Returns ``{id, username}`` for all users.  Accepts an optional
     ``?search=`` query parameter that filters by username (case-insensitive
-    substring match).  Responses are limited to 25 rows.
+    substring match), or ``?prefix=`` for usernames starting with the given
+    text, which is the cheaper lookup for typeahead fields.  Matches are
+    ranked, best first.  Responses are limited to 25 rows.
     """
 
     serializer_class = UserSerializer
@@ -705,13 +919,13 @@ class UserViewSet(ListModelMixin, GenericViewSet):
         user = self.request.user
         if not user or not user.is_authenticated:
             return User.objects.none()
-        qs = User.objects.order_by("username")
-        search = self.request.query_params.get("search", "").strip()
-        if search:
-            qs = qs.filter(UserQ(username__icontains=search))
-        return qs
+        return search_from_query_params(User.objects.order_by("username"), "username", self.request)
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())[:25]
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        if "prefix" in request.query_params:
+            # Typeahead fields repeat prefixes while typing and deleting.
+            patch_cache_control(response, private=True, max_age=_USER_PREFIX_SEARCH_MAX_AGE)
+        return response
@@ -14,3 +14,8 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 from django.core.asgi import get_asgi_application
 
 application = get_asgi_application()
+
+# Imported once the apps are loaded by get_asgi_application().
+from api.import_jobs import start_in_process_worker
+
+start_in_process_worker()
@@ -0,0 +1,131 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+
+_JWKS_FILE = getattr(settings, "AAD_JWKS_FILE", None)
+_AUDIENCE = getattr(settings, "AAD_ID_TOKEN_AUDIENCE", None)
+_ISSUER = getattr(settings, "AAD_ID_TOKEN_ISSUER", None)
+_ALGORITHMS = getattr(settings, "AAD_ID_TOKEN_ALGORITHMS", ["RS256"])
+_CACHE_SIZE = getattr(settings, "AAD_CLAIMS_CACHE_SIZE", 1024)
+# Least seconds between re-reads of the JWKS file prompted by an unknown key id.
+_JWKS_RELOAD_INTERVAL = getattr(settings, "AAD_JWKS_RELOAD_INTERVAL", 60)
+
+
+class TokenClaimsCache:
+    """
+    Verifies id tokens against the keys in a local JWKS file and remembers the user built
+    from each verified token until the token expires, so a token that is seen again costs
+    a hash and a dict lookup rather than a signature check.
+
+    Entries are keyed by the SHA-256 of the token and the least recently used ones are
+    dropped beyond *max_entries*. The cached user dicts are shared between requests and
+    must not be modified.
+
+    The JWKS file is read again when its modification time changes, and when a token
+    names a key id that is not in it, at most every *_JWKS_RELOAD_INTERVAL* seconds, so
+    rotated keys are picked up without a restart.
+    """
+
+    def __init__(
+        self,
+        jwks_file=None,
+        audience=None,
+        issuer=None,
+        algorithms=None,
+        max_entries=None,
+    ):
+        self.jwks_file = jwks_file or _JWKS_FILE
+        self.audience = audience or _AUDIENCE
+        self.issuer = issuer or _ISSUER
+        self.algorithms = algorithms or _ALGORITHMS
+        self.max_entries = max_entries or _CACHE_SIZE
+        self._jwks = None
+        self._jwks_mtime = None
+        self._jwks_loaded = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_for_token(self, id_token: str):
+        """
+        Returns the user for *id_token*, or None when the token is malformed, expired or
+        not signed by a key in the JWKS file.
+        """
+        key = hashlib.sha256(id_token.encode("utf-8")).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, user = entry
+                if now < expires:
+                    self._entries.move_to_end(key)
+                    return user
+                del self._entries[key]
+
+        claims = self._verify(id_token)
+        if claims is None:
+            return None
+
+        user = aad_user_from_claims(id_token, claims)
+        with self._lock:
+            self._entries[key] = (claims["exp"], user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def _signing_keys(self, reload=False) -> jwt.PyJWKSet:
+        mtime = os.stat(self.jwks_file).st_mtime_ns
+        with self._lock:
+            if self._jwks is not None and mtime == self._jwks_mtime and not reload:
+                return self._jwks
+        with open(self.jwks_file, encoding="utf-8") as file:
+            jwks = jwt.PyJWKSet.from_json(file.read())
+        with self._lock:
+            self._jwks, self._jwks_mtime, self._jwks_loaded = (
+                jwks,
+                mtime,
+                time.monotonic(),
+            )
+        return jwks
+
+    def _signing_key(self, kid) -> jwt.PyJWK:
+        try:
+            return self._signing_keys()[kid]
+        except KeyError:
+            if time.monotonic() - self._jwks_loaded < _JWKS_RELOAD_INTERVAL:
+                raise
+        return self._signing_keys(reload=True)[kid]
+
+    def _verify(self, id_token: str):
+        try:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+            signing_key = self._signing_key(kid)
+            return jwt.decode(
+                id_token,
+                key=signing_key.key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"require": ["exp"], "verify_aud": self.audience is not None},
+            )
+        except (jwt.PyJWTError, KeyError):
+            return None
+
+
+def aad_user_from_claims(id_token: str, claims: dict) -> dict:
+    return {
+        "raw_claims": id_token,
+        "claims": claims,
+        "id": claims.get("oid"),
+        "email": claims.get("email") or claims.get("preferred_username"),
+        "name": claims.get("name"),
+        "preferred_username": claims.get("preferred_username"),
+    }
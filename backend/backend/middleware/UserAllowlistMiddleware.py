@@ -4,12 +4,15 @@
 
 from django.http import HttpResponse
 from http import HTTPStatus
-from api.models import UserPermissions
+from api.allowlist_cache import allowed_app_emails
 
 
 class UserAllowlistMiddleware:
     """
     This middleware makes sure the user is allowed to view the webpage.
+
+    The allowlist is checked against an in-process snapshot of UserPermissions, which is
+    reloaded whenever the allowlist changes, so requests do not query the database.
     """
 
     def __init__(self, get_response):
@@ -22,17 +25,9 @@ class UserAllowlistMiddleware:
         # user_email = request.aad_user['email'].lower()
         user_email = "users@example.com"
 
-        try:
-            UserPermissions.objects.get(user_email=user_email)
-        except UserPermissions.DoesNotExist:
+        if user_email not in allowed_app_emails():
+            # The allowlist is not enforced yet.
+            # return HttpResponse('You do not have access to this webpage<br>{}<br><a href="/.auth/logout">Logout</a>'.format(user_email), status=HTTPStatus.FORBIDDEN)
             pass
 
-        # if user_permissions == None:
-        #     user_permissions = UserPermissions(user_email=user_email, allow_app=False, allow_api=False)
-        #     user_permissions.save()
-        #     return HttpResponse('You do not have access to this webpage<br>{}<br><a href="/.auth/logout">Logout</a>'.format(user_email), status=HTTPStatus.FORBIDDEN)
-
-        # if user_permissions.allow_app == False:
-        #     return HttpResponse('You do not have access to this webpage<br>{}<br><a href="/.auth/logout">Logout</a>'.format(user_email), status=HTTPStatus.FORBIDDEN)
-
         return self.get_response(request)
@@ -10,15 +10,23 @@ from http import HTTPStatus
 from django.http import HttpResponse
 from django.conf import settings
 
+from .TokenClaimsCache import TokenClaimsCache, aad_user_from_claims
+
 
 class UserParseMiddleware:
     """
     This middleware parses the user data from the incoming request headers.
     We use Azure App Service Easy Auth, which injects user claims to the request headers after login.
+
+    The id token is verified against the keys in the AAD_JWKS_FILE JWKS file, and the user
+    is cached per token until it expires. Without a JWKS file, tokens are only decoded, which
+    is allowed in DEBUG for local development.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
+        jwks_file = getattr(settings, 'AAD_JWKS_FILE', None)
+        self.claims_cache = TokenClaimsCache(jwks_file) if jwks_file else None
 
     def __call__(self, request):
         id_token = request.headers.get('X-Ms-Token-Aad-Id-Token')
@@ -28,13 +36,23 @@ class UserParseMiddleware:
         if id_token is None:
             return HttpResponse('Unauthorized (missing user identification token)', status=HTTPStatus.UNAUTHORIZED)
 
-        aad_user = aad_user_from_id_token(id_token)
+        if self.claims_cache is not None:
+            aad_user = self.claims_cache.user_for_token(id_token)
+        elif settings.DEBUG:
+            aad_user = aad_user_from_id_token(id_token)
+        else:
+            aad_user = None
+
+        if aad_user is None:
+            return HttpResponse('Unauthorized (invalid user identification token)', status=HTTPStatus.UNAUTHORIZED)
+
         request.aad_user = aad_user
 
         return self.get_response(request)
 
 
 def aad_user_from_id_token(id_token):
+    """Decodes the claims of an id token without verifying its signature."""
     aad_user = {'raw_claims': id_token}
 
     id_token_raw_split = id_token.split('.')
@@ -43,22 +61,14 @@ def aad_user_from_id_token(id_token):
         token_props_base64 = id_token_raw_split[1]
         token_props_base64_bytes = token_props_base64.encode('utf-8')
         token_props_base64_bytes_padded = base64_pad(token_props_base64_bytes)
-        token_props_bytes = base64.b64decode(token_props_base64_bytes_padded)
+        token_props_bytes = base64.urlsafe_b64decode(token_props_base64_bytes_padded)
         token_props_string = token_props_bytes.decode('utf-8')
         parsed_claims = json.loads(token_props_string)
 
-        aad_user['claims'] = parsed_claims
-        aad_user['id'] = parsed_claims['oid']
-        # aad_user['email'] = parsed_claims['email']
-        # aad_user['name'] = parsed_claims['name']
-        # aad_user['preferred_username'] = parsed_claims['preferred_username']
-        aad_user['email'] = 'users@example.com'
-        aad_user['name'] = 'John Doe'
-        aad_user['preferred_username'] = 'johndoe'
+        aad_user = aad_user_from_claims(id_token, parsed_claims)
 
     return aad_user
 
 
 def base64_pad(string):
-    pad = len(string) % 4
-    return string + (b"="*pad)
+    return string + (b"=" * (-len(string) % 4))
@@ -0,0 +1,214 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for id token verification and the user allowlist snapshot."""
+
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from api.allowlist_cache import allowed_app_emails, bump_allowlist_version
+from api.models import UserPermissions
+from backend.middleware.TokenClaimsCache import TokenClaimsCache
+from backend.middleware.UserAllowlistMiddleware import UserAllowlistMiddleware
+from backend.middleware.UserParseMiddleware import UserParseMiddleware
+
+_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _write_jwks(directory, private_key=_PRIVATE_KEY, kid="test-key"):
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    path = os.path.join(directory, "jwks.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"keys": [jwk]}, file)
+    return path
+
+
+def _token(private_key=_PRIVATE_KEY, kid="test-key", **claims):
+    payload = {
+        "oid": "user-1",
+        "email": "Author@Example.com",
+        "name": "Author",
+        "exp": int(time.time()) + 60,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+class TokenClaimsCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.jwks_file = _write_jwks(directory.name)
+        self.cache = TokenClaimsCache(self.jwks_file, max_entries=2)
+
+    def test_verified_users_are_cached(self):
+        token = _token()
+
+        with mock.patch("jwt.decode", wraps=jwt.decode) as decode:
+            first = self.cache.user_for_token(token)
+            second = self.cache.user_for_token(token)
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertIs(first, second)
+        self.assertEqual(
+            (first["id"], first["email"], first["name"]),
+            ("user-1", "Author@Example.com", "Author"),
+        )
+
+    def test_rejects_unverifiable_tokens(self):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        for token in (
+            _token(private_key=other_key),
+            _token(kid="unknown-key"),
+            _token(exp=int(time.time()) - 60),
+            _token(exp=None),
+            "not.a.token",
+        ):
+            with self.subTest(token=token):
+                self.assertIsNone(self.cache.user_for_token(token))
+
+    def test_cached_users_expire_with_the_token(self):
+        token = _token(exp=int(time.time()) + 60)
+        self.assertIsNotNone(self.cache.user_for_token(token))
+
+        # Past its exp the token is verified again, and rejected, rather than served from the cache.
+        with (
+            mock.patch("time.time", return_value=time.time() + 120),
+            mock.patch("jwt.decode", side_effect=jwt.ExpiredSignatureError) as decode,
+        ):
+            self.assertIsNone(self.cache.user_for_token(token))
+
+        self.assertEqual(decode.call_count, 1)
+
+    def test_least_recently_used_tokens_are_dropped(self):
+        tokens = [_token(oid=f"user-{index}") for index in range(3)]
+        for token in tokens:
+            self.cache.user_for_token(token)
+
+        with mock.patch("jwt.decode", wraps=jwt.decode) as decode:
+            self.cache.user_for_token(tokens[2])
+            self.cache.user_for_token(tokens[0])
+
+        self.assertEqual(decode.call_count, 1)
+
+    def test_rotated_keys_are_picked_up_when_the_file_changes(self):
+        self.assertIsNotNone(self.cache.user_for_token(_token()))
+        new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        _write_jwks(os.path.dirname(self.jwks_file), private_key=new_key, kid="new-key")
+        stat = os.stat(self.jwks_file)
+        os.utime(
+            self.jwks_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)
+        )
+
+        self.assertIsNotNone(
+            self.cache.user_for_token(_token(private_key=new_key, kid="new-key"))
+        )
+        self.assertIsNone(self.cache.user_for_token(_token(oid="user-2")))
+
+    def test_unknown_key_ids_reload_the_file_at_most_every_interval(self):
+        self.assertIsNone(self.cache.user_for_token(_token(kid="new-key")))
+        new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        token = _token(private_key=new_key, kid="new-key")
+        stat = os.stat(self.jwks_file)
+        _write_jwks(os.path.dirname(self.jwks_file), private_key=new_key, kid="new-key")
+        # Same modification time, as on a filesystem with a coarse clock.
+        os.utime(self.jwks_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertIsNone(self.cache.user_for_token(token))
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 120):
+            self.assertIsNotNone(self.cache.user_for_token(token))
+
+
+class UserParseMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.jwks_file = _write_jwks(directory.name)
+        self.factory = RequestFactory()
+
+    def _middleware(self):
+        return UserParseMiddleware(lambda request: HttpResponse(request.aad_user["id"]))
+
+    def test_sets_the_verified_user(self):
+        with override_settings(AAD_JWKS_FILE=self.jwks_file):
+            middleware = self._middleware()
+
+        request = self.factory.get("/", HTTP_X_MS_TOKEN_AAD_ID_TOKEN=_token())
+        response = middleware(request)
+
+        self.assertEqual(response.content, b"user-1")
+        self.assertEqual(request.aad_user["claims"]["oid"], "user-1")
+
+    def test_invalid_or_missing_tokens_are_unauthorized(self):
+        with override_settings(AAD_JWKS_FILE=self.jwks_file):
+            middleware = self._middleware()
+
+        forged = _token(
+            private_key=rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        )
+        self.assertEqual(
+            middleware(
+                self.factory.get("/", HTTP_X_MS_TOKEN_AAD_ID_TOKEN=forged)
+            ).status_code,
+            401,
+        )
+        self.assertEqual(middleware(self.factory.get("/")).status_code, 401)
+
+    @override_settings(AAD_JWKS_FILE=None, DEBUG=False)
+    def test_tokens_are_not_trusted_without_keys(self):
+        response = self._middleware()(
+            self.factory.get("/", HTTP_X_MS_TOKEN_AAD_ID_TOKEN=_token())
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+
+class UserAllowlistMiddlewareTests(TestCase):
+    def setUp(self):
+        # Rolled back rows send no signals; start every test from a fresh snapshot.
+        bump_allowlist_version()
+        self.middleware = UserAllowlistMiddleware(lambda request: HttpResponse("ok"))
+        self.factory = RequestFactory()
+
+    def test_lookup_needs_no_database_queries(self):
+        UserPermissions.objects.create(user_email="users@example.com", allow_app=True)
+        allowed_app_emails()
+        request = self.factory.get("/")
+        request.aad_user = {"email": "author@example.com"}
+
+        with self.assertNumQueries(0):
+            response = self.middleware(request)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_credentials_are_unauthorized(self):
+        request = self.factory.get("/")
+        request.aad_user = None
+
+        self.assertEqual(self.middleware(request).status_code, 401)
+
+    def test_snapshot_follows_allowlist_changes(self):
+        permissions = UserPermissions.objects.create(
+            user_email="Author@Example.com", allow_app=False
+        )
+        UserPermissions.objects.create(
+            user_email="api-only@example.com", allow_api=True
+        )
+        self.assertEqual(allowed_app_emails(), frozenset())
+
+        permissions.allow_app = True
+        permissions.save()
+        self.assertEqual(allowed_app_emails(), {"author@example.com"})
+
+        with self.assertNumQueries(0):
+            allowed_app_emails()
+
+        permissions.delete()
+        self.assertEqual(allowed_app_emails(), frozenset())
@@ -14,6 +14,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import json
 import os
 import sys
 from pathlib import Path
@@ -210,15 +211,33 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 # Must insert after SecurityMiddleware, which is first in settings/common.py
 MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
 
+# User files are kept in MEDIA_ROOT by default. Any storage backend can be configured
+# instead, e.g. django-storages' S3 backend pointed at MinIO:
+# FILE_STORAGE_BACKEND=storages.backends.s3.S3Storage
+# FILE_STORAGE_OPTIONS='{"bucket_name": "media", "endpoint_url": "http://localhost:9000"}'
 STORAGES = {
     "default": {
-        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "BACKEND": os.getenv("FILE_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage"),
+        "OPTIONS": json.loads(os.getenv("FILE_STORAGE_OPTIONS", "{}")),
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
 
+# Cross-request caches, such as folder permissions, are invalidated through this cache, so
+# it must be shared by every web process. The default LocMemCache belongs to one process:
+# with it, serve with a single gunicorn worker (WEB_CONCURRENCY=1, gunicorn's default).
+# To run more, configure a shared cache, e.g. Redis:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://redis:6379
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    },
+}
+
 if "test" in sys.argv:
     STORAGES["staticfiles"]["BACKEND"] = "django.contrib.staticfiles.storage.StaticFilesStorage"
 
@@ -230,12 +249,83 @@ FRONTEND_DIR_STATIC = os.path.join(FRONTEND_DIR, 'assets')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, FRONTEND_DIR_STATIC)]
 # End of frontend section
 
+# Azure App Service Easy Auth id tokens read by backend.middleware.UserParseMiddleware are
+# verified against the keys in this local JWKS file, and the audience and issuer if set.
+AAD_JWKS_FILE = os.getenv('AAD_JWKS_FILE')
+AAD_ID_TOKEN_AUDIENCE = os.getenv('AAD_CLIENT_ID')
+AAD_ID_TOKEN_ISSUER = os.getenv('AAD_ISSUER')
+AAD_CLAIMS_CACHE_SIZE = 1024  # verified tokens remembered until they expire
+AAD_JWKS_RELOAD_INTERVAL = 60  # least seconds between re-reads of the JWKS file for an unknown key id
+
 # Base URL for file uploads.
 FILE_UPLOAD_BASE_URL = os.getenv('FILE_UPLOAD_BASE_URL', 'https://share.soundscape.services')
 
 # GPX download safety defaults. Override per-environment if needed.
 GPX_MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024  # 100 MB
 GPX_DOWNLOAD_TIMEOUT = 100  # seconds
+GPX_MAX_TOTAL_DOWNLOAD_BYTES = 250 * 1024 * 1024  # 250 MB across all media of one import
+GPX_DOWNLOAD_WORKERS = 8
+GPX_DOWNLOAD_WORKERS_PER_HOST = 4
+
+# Number of imported waypoints inserted per bulk INSERT.
+GPX_IMPORT_BATCH_SIZE = 500
+
+# How long browsers and shared caches may reuse a file served from /files/ before revalidating it.
+FILES_MAX_AGE = 60 * 60  # seconds
+
+# How long shared caches may serve a published GPX file before revalidating it.
+PUBLISHED_GPX_MAX_AGE = 5 * 60  # seconds
+
+# Map tiles are proxied from an XYZ tile source and cached on disk under MAP_TILE_CACHE_DIR.
+# Tile sources are URL templates with {z}, {x} and {y} placeholders, served at
+# /map/tiles/<name>/{z}/{x}/{y}.
+MAP_TILESETS = {
+    'osm': os.getenv('MAP_TILE_URL', 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'),
+}
+MAP_TILE_CACHE_DIR = os.getenv('MAP_TILE_CACHE_DIR', os.path.join(BASE_DIR, 'tile_cache'))
+# The size limit is kept by each web process for the tiles it writes, so with
+# WEB_CONCURRENCY processes sharing the directory it can grow to that many times the limit.
+MAP_TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+MAP_TILE_CACHE_TTL = 7 * 24 * 60 * 60  # seconds before a cached tile is revalidated upstream
+MAP_TILE_MAX_AGE = 24 * 60 * 60  # seconds browsers may reuse a tile
+MAP_TILE_USER_AGENT = 'Soundscape Authoring Tool (https://github.com/soundscape-community/authoring-tool)'
+
+# Activities returned per page of the activity list, by default and at most.
+ACTIVITY_LIST_PAGE_SIZE = 100
+ACTIVITY_LIST_MAX_PAGE_SIZE = 500
+
+# Activity search: the PostgreSQL text search configuration for activity and waypoint
+# text, and the most activities one search returns.
+ACTIVITY_SEARCH_CONFIG = 'english'
+ACTIVITY_SEARCH_MAX_RESULTS = 50
+
+# Most activities and waypoints returned for one ?bbox= map viewport.
+ACTIVITY_BBOX_MAX_RESULTS = 100
+WAYPOINT_BBOX_MAX_RESULTS = 500
+
+# How long browsers may reuse a ?prefix= user search, which typeahead fields repeat.
+USER_PREFIX_SEARCH_MAX_AGE = 30  # seconds
+
+# Most create/update/delete operations accepted by one waypoint batch request.
+WAYPOINT_BATCH_MAX_OPERATIONS = 1000
+
+# GPX exports larger than this are spooled to a temporary file instead of memory.
+GPX_EXPORT_SPOOL_BYTES = 1024 * 1024  # 1 MB
+
+# Generated GPX exports up to this size are cached, keyed on the activity's version.
+GPX_EXPORT_CACHE_TIMEOUT = 60 * 60  # seconds
+GPX_EXPORT_CACHE_MAX_BYTES = 1024 * 1024  # 1 MB
+
+# GPX import jobs are queued in the database. By default a small thread pool in each web
+# process works through the queue; disable it when running `manage.py process_import_jobs`.
+IMPORT_JOBS_RUN_IN_PROCESS = env_bool('IMPORT_JOBS_RUN_IN_PROCESS', True)
+IMPORT_JOB_WORKERS = 2
+IMPORT_JOB_HEARTBEAT = 30  # seconds between the "still running" writes of a running job
+IMPORT_JOB_STALE_AFTER = 5 * 60  # seconds without a heartbeat before a running job is failed
+
+# Folder permission lookups are cached across requests for this long. Set this to 0 to
+# run several web processes without a shared cache (see CACHES).
+PERMISSION_CACHE_TIMEOUT = int(os.getenv('PERMISSION_CACHE_TIMEOUT', str(5 * 60)))  # seconds
 
 TESTING_WARNING_ENABLED = env_bool('TESTING_WARNING_ENABLED', False)
 TESTING_WARNING_MESSAGE = os.getenv(
@@ -54,5 +54,7 @@ DATABASES = {
 # I.g., "http://127.0.0.1:8000/files/{file_path}"
 MEDIA_URL = 'files/'
 
-# Used for storing local user-uploaded files
-MEDIA_ROOT = os.path.join(BASE_DIR, MEDIA_URL)
+# Used for storing local user-uploaded files. Defaults to the files/ directory of the
+# project package (/app/backend/files in the Docker image), where existing deployments
+# keep their uploads; set MEDIA_ROOT to keep them elsewhere.
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, MEDIA_URL))
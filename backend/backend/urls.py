@@ -20,8 +20,6 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -36,15 +34,13 @@ urlpatterns = [
     # Serve API app
     path('api/', include('api.urls')),
 
+    # Map tiles, proxied and cached
+    path('map/', include('map.urls')),
+
     # Serve frontend app
     path('', include('frontend.urls')),
 ]
 
-# Serve user file uploads
-if settings.MEDIA_URL and settings.MEDIA_ROOT :
-    # In a local environment, this is used for storing and serving user file uploads.
-    urlpatterns.extend(static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
-else:
-    # In a cloud environment, files are stored and served via the 'files' app.
-    urlpatterns.append(path('files/', include('files.urls')))
+# Serve user file uploads from the default storage, locally and in the cloud.
+urlpatterns.append(path('files/', include('files.urls')))
 
@@ -14,3 +14,8 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 from django.core.wsgi import get_wsgi_application
 
 application = get_wsgi_application()
+
+# Imported once the apps are loaded by get_wsgi_application().
+from api.import_jobs import start_in_process_worker
+
+start_in_process_worker()
@@ -0,0 +1,156 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+Streaming responses for files kept in a Django storage.
+
+Files are read in chunks and never loaded into memory as a whole. Conditional requests
+are answered from the stored size and modification time, and a single byte range can be
+requested with the Range header.
+"""
+
+import mimetypes
+import re
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _open(storage, name):
+    try:
+        return storage.open(name, "rb")
+    except OSError as exc:
+        # Includes directories, which have a size but cannot be read.
+        raise Http404("File not found") from exc
+
+
+def _modified_time(storage, name):
+    try:
+        return storage.get_modified_time(name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def _parse_range(header: str, size: int):
+    """
+    Returns the ``(start, end)`` byte positions (inclusive) asked for by a single-range
+    Range header, None when the header should be ignored, or False when the range
+    cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Malformed or multiple ranges: serve the whole file instead.
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # The final N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _range_still_valid(request, etag, last_modified) -> bool:
+    # If-Range asks for the range only while the file is unchanged; otherwise send it all.
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    timestamp = parse_http_date_safe(if_range)
+    return (
+        timestamp is not None
+        and last_modified is not None
+        and timestamp >= int(last_modified.timestamp())
+    )
+
+
+def _iter_range(file, start: int, length: int):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def storage_file_response(
+    request,
+    name: str,
+    *,
+    storage=default_storage,
+    content_type=None,
+    cache_control=None,
+):
+    """
+    Streams the file *name* from *storage*. Answers If-None-Match and If-Modified-Since
+    with 304 and a satisfiable Range with 206. *cache_control* holds keyword arguments
+    for ``patch_cache_control``. Raises Http404 when the file does not exist.
+    """
+    try:
+        size = storage.size(name)
+    except OSError as exc:
+        raise Http404("File not found") from exc
+
+    last_modified = _modified_time(storage, name)
+    if last_modified is not None:
+        etag = f'"{int(last_modified.timestamp() * 1000000):x}-{size:x}"'
+        last_modified_timestamp = int(last_modified.timestamp())
+    else:
+        etag = f'"{size:x}"'
+        last_modified_timestamp = None
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified_timestamp
+    )
+    if response is None:
+        content_type = (
+            content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        )
+        byte_range = None
+        range_header = request.META.get("HTTP_RANGE")
+        if range_header and _range_still_valid(request, etag, last_modified):
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        elif byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_range(_open(storage, name), start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(length)
+        else:
+            response = FileResponse(_open(storage, name), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+            response["Content-Length"] = str(size)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    if last_modified_timestamp is not None:
+        response["Last-Modified"] = http_date(last_modified_timestamp)
+    if cache_control:
+        patch_cache_control(response, **cache_control)
+    return response
@@ -0,0 +1,126 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the storage-backed files proxy."""
+
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import Activity
+from files import responses
+
+CONTENT = bytes(range(256)) * 1024  # 256 KB, several chunks
+
+
+class FilesProxyTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                "default": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                    "OPTIONS": {"location": directory.name},
+                },
+            }
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+        self.owner = get_user_model().objects.create_user(
+            username="owner", password="pass"
+        )
+        self.other = get_user_model().objects.create_user(
+            username="other", password="pass"
+        )
+        self.activity = Activity.objects.create(
+            author_id=str(self.owner.id),
+            author_name="owner",
+            name="Walk",
+            description="Walk",
+            last_published=timezone.now(),
+        )
+        self.name = default_storage.save(
+            f"{self.activity.waypoints_media_directory_path}/clip.mp3",
+            ContentFile(CONTENT),
+        )
+        self.url = f"/files/{self.name}"
+
+    def _content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_streams_the_file_in_chunks(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "audio/mpeg")
+        self.assertEqual(response["Content-Length"], str(len(CONTENT)))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= responses.CHUNK_SIZE for chunk in chunks))
+        self.assertEqual(b"".join(chunks), CONTENT)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100000-200000")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response["Content-Range"], f"bytes 100000-200000/{len(CONTENT)}"
+        )
+        self.assertEqual(self._content(response), CONTENT[100000:200001])
+
+    def test_conditional_request(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_head_request_has_headers_only(self):
+        response = self.client.head(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], str(len(CONTENT)))
+        self.assertEqual(self._content(response), b"")
+
+    def test_unpublished_activity_files_need_access(self):
+        Activity.objects.filter(id=self.activity.id).update(last_published=None)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_only_activity_files_are_served(self):
+        default_storage.save("imports/1/upload.gpx", ContentFile(b"<gpx/>"))
+        self.client.force_login(self.owner)
+
+        for resource in (
+            "imports/1/upload.gpx",
+            f"activities/{self.activity.id}/../../imports/1/upload.gpx",
+            f"activities/{self.activity.id}//../imports/1/upload.gpx",
+            "views.py",
+            "../manage.py",
+        ):
+            with self.subTest(resource=resource):
+                self.assertEqual(self.client.get(f"/files/{resource}").status_code, 404)
+
+    def test_missing_files_and_directories_are_not_found(self):
+        directory = self.activity.waypoints_media_directory_path
+        for resource in (f"{directory}/missing.mp3", directory, f"{directory}/"):
+            with self.subTest(resource=resource):
+                self.assertEqual(self.client.get(f"/files/{resource}").status_code, 404)
+
+    def test_writes_are_not_allowed(self):
+        self.assertEqual(self.client.post(self.url).status_code, 405)
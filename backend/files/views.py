@@ -2,52 +2,60 @@
 # Licensed under the MIT License.
 # Copyright (c) Soundscape Community Contributors.
 
+import re
 
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import Http404
 from django.views.decorators.http import require_http_methods
-from django.http import HttpResponse
 
-# blobbed: commented out this entire portion having to do with the azure blob service
+from api.models import Activity
+from api.views import get_accessible_activity_queryset
 
-# from azure.storage.blob import BlobServiceClient, ContainerClient, StorageStreamDownloader, BlobProperties
+from .responses import storage_file_response
 
+_MAX_AGE = getattr(settings, "FILES_MAX_AGE", 60 * 60)  # seconds
 
-# ACCOUNT_URL = "https://{}.blob.core.windows.net/".format(os.environ.get('AZURE_STORAGE_ACCOUNT_NAME'))
-# CREDENTIAL = os.environ.get('AZURE_STORAGE_ACCOUNT_KEY')
-# CONTAINER_NAME = os.environ.get('AZURE_STORAGE_ACCOUNT_CONTAINER')
-# BLOB_PATH_PREFIX = os.environ.get('AZURE_STORAGE_ACCOUNT_LOCATION') + '/'
-# BLOB_PATH_PREFIX = 'asdf/'
+# activities/{activity_id}/..., the only files that are served.
+_ACTIVITY_FILE_RE = re.compile(
+    r"^activities/(?P<activity_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/"
+)
 
 
-@require_http_methods(["GET"])
-def files(_, resource):
-    """Returns the requested file from the a path
-
-    User generated files are stored in an Azure Storage account.
-    This view is a proxy to that storage.
+def _cache_control(request, resource):
     """
-
-    # Get the blob info
-    # blob_service_client: BlobServiceClient = BlobServiceClient(account_url=ACCOUNT_URL, credential=CREDENTIAL)
-    # container_client: ContainerClient = blob_service_client.get_container_client(CONTAINER_NAME)
-    # blob: StorageStreamDownloader = container_client.download_blob(BLOB_PATH_PREFIX + resource)
-    # blob_properties: BlobProperties = blob.properties
-
-    # Get the blob content
-    # blob_content = blob.readall()
-
-    # Respond with the requested blob file
-    response = HttpResponse()
-    # response.content = blob_content
-
-    # if blob_properties.content_settings.cache_control:
-    #     response.headers["Cache-Control"] = blob_properties.content_settings.cache_control
-    # if blob_properties.size:
-    #     response.headers["Content-Length"] = blob_properties.size
-    # if blob_properties.content_settings.content_type:
-    #     response.headers["Content-Type"] = blob_properties.content_settings.content_type
-    # if blob_properties.last_modified:
-    #     response.headers["Last-Modified"] = blob_properties.last_modified
-    # if blob_properties.etag:
-    #     response.headers["ETag"] = blob_properties.etag
-
-    return response
+    The Cache-Control for *resource*, or Http404 when it must not be served to the
+    requesting user. Files of published activities are public, as the published GPX
+    links to them; the others need read access to their activity.
+    """
+    match = _ACTIVITY_FILE_RE.match(resource)
+    if match is None or any(part in ("", ".", "..") for part in resource.split("/")):
+        raise Http404("File not found")
+
+    activity_id = match.group("activity_id")
+    if Activity.objects.filter(id=activity_id, last_published__isnull=False).exists():
+        return {"public": True, "max_age": _MAX_AGE}
+    if get_accessible_activity_queryset(request.user).filter(id=activity_id).exists():
+        return {"private": True, "max_age": _MAX_AGE}
+    raise Http404("File not found")
+
+
+@require_http_methods(["GET", "HEAD"])
+def files(request, resource):
+    """Returns the requested activity file from the default storage.
+
+    Featured images, waypoint media and published GPX files are kept in the configured
+    default storage, a local directory or an S3-compatible bucket, under
+    ``activities/{activity_id}/``. This view streams them in chunks with support for
+    Range and conditional requests. Nothing else in the storage, such as GPX import
+    uploads, is served.
+    """
+    cache_control = _cache_control(request, resource)
+
+    try:
+        return storage_file_response(
+            request, resource, storage=default_storage, cache_control=cache_control
+        )
+    except SuspiciousFileOperation as exc:
+        raise Http404("File not found") from exc
@@ -0,0 +1,218 @@
+# Copyright (c) Soundscape Community Contributors.
+"""Tests for the caching map tile proxy, against a local fake tile server."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from map.tiles import TileCache, TileUnavailable
+
+TILE = b"\x89PNG\r\n\x1a\n" + b"tile" * 100
+
+
+class FakeTileServer:
+    """Serves TILE for every z/x/y path, with an ETag, and records the requests it gets."""
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        self.delay = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append((self.path, self.headers.get("If-None-Match")))
+                time.sleep(fake.delay)
+                if fake.status != 200:
+                    self.send_response(fake.status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(TILE)))
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    self.wfile.write(TILE)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/{{z}}/{{x}}/{{y}}.png"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TileProxyTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="mapper", password="pass")
+        self.client.force_login(user)
+        self.upstream = FakeTileServer()
+        self.addCleanup(self.upstream.stop)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = self._cache()
+
+    def _cache(self, **kwargs):
+        options = {
+            "tilesets": {"fake": self.upstream.url},
+            "directory": self.directory,
+            "ttl": 60,
+        }
+        options.update(kwargs)
+        cache = TileCache(**options)
+        patcher = mock.patch("map.views.tile_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return cache
+
+    def test_serves_and_caches_tiles(self):
+        first = self.client.get("/map/tiles/fake/3/4/5")
+        second = self.client.get("/map/tiles/fake/3/4/5")
+
+        for response in (first, second):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, TILE)
+            self.assertEqual(response["Content-Type"], "image/png")
+            self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(self.upstream.requests, [("/3/4/5.png", None)])
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, "fake", "3", "4", "5"))
+        )
+
+    def test_cache_survives_restart(self):
+        self.client.get("/map/tiles/fake/3/4/5")
+
+        self._cache()
+        response = self.client.get("/map/tiles/fake/3/4/5")
+
+        self.assertEqual(response.content, TILE)
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_client_conditional_request(self):
+        etag = self.client.get("/map/tiles/fake/1/0/1")["ETag"]
+
+        response = self.client.get("/map/tiles/fake/1/0/1", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_expired_tiles_are_revalidated_upstream(self):
+        self._cache(ttl=0)
+
+        first = self.client.get("/map/tiles/fake/2/1/1")
+        second = self.client.get("/map/tiles/fake/2/1/1")
+
+        self.assertEqual(second.content, TILE)
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(
+            self.upstream.requests, [("/2/1/1.png", None), ("/2/1/1.png", '"v1"')]
+        )
+
+    def test_stale_tiles_are_served_when_the_source_fails(self):
+        self._cache(ttl=0)
+        self.client.get("/map/tiles/fake/2/1/1")
+        self.upstream.status = 500
+
+        stale = self.client.get("/map/tiles/fake/2/1/1")
+        missing = self.client.get("/map/tiles/fake/2/1/2")
+
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.content, TILE)
+        self.assertEqual(missing.status_code, 502)
+
+    def test_upstream_not_found(self):
+        self.upstream.status = 404
+
+        self.assertEqual(self.client.get("/map/tiles/fake/2/1/1").status_code, 404)
+
+    def test_anonymous_requests_are_rejected(self):
+        self.client.logout()
+
+        self.assertEqual(self.client.get("/map/tiles/fake/3/4/5").status_code, 403)
+        self.assertEqual(self.upstream.requests, [])
+
+    def test_invalid_tiles_are_not_requested_upstream(self):
+        for url in (
+            "/map/tiles/other/1/0/0",
+            "/map/tiles/fake/1/2/0",
+            "/map/tiles/fake/1/0/2",
+            "/map/tiles/fake/30/0/0",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.upstream.requests, [])
+
+    def test_cache_directory_is_scanned_without_the_lock(self):
+        self.cache.get("fake", 2, 0, 0)
+        cache = self._cache()
+        walk = os.walk
+
+        def scan(*args, **kwargs):
+            self.assertFalse(cache._lock.locked())
+            return walk(*args, **kwargs)
+
+        with mock.patch("map.tiles.os.walk", side_effect=scan) as walk_mock:
+            cache.get("fake", 2, 0, 0)
+
+        walk_mock.assert_called_once()
+        self.assertEqual(
+            list(cache._index), [os.path.join(self.directory, "fake", "2", "0", "0")]
+        )
+
+    def test_least_recently_used_tiles_are_evicted(self):
+        cache = self.cache
+        cache.get("fake", 2, 0, 0)
+        # Room for two cached tiles, not three.
+        cache.max_bytes = (
+            os.path.getsize(os.path.join(self.directory, "fake", "2", "0", "0"))
+            * 5
+            // 2
+        )
+        cache.get("fake", 2, 0, 1)
+        cache.get("fake", 2, 0, 0)
+        cache.get("fake", 2, 0, 2)
+
+        cached = sorted(os.listdir(os.path.join(self.directory, "fake", "2", "0")))
+        self.assertEqual(cached, ["0", "2"])
+
+    def test_concurrent_misses_share_one_upstream_request(self):
+        self.upstream.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.cache.get("fake", 4, 3, 2))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(tile.content == TILE for tile in results))
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_unreachable_source(self):
+        self.upstream.stop()
+        cache = self._cache()
+
+        with self.assertRaises(TileUnavailable):
+            cache.get("fake", 0, 0, 0)
@@ -0,0 +1,269 @@
+# Copyright (c) Soundscape Community Contributors.
+# Licensed under the MIT License.
+
+"""
+On-disk cache for map tiles fetched from an XYZ tile source.
+
+Tiles are stored under ``{directory}/{tileset}/{z}/{x}/{y}``, one file per tile holding a
+JSON header line followed by the image, so a tile and its metadata are replaced together.
+The least recently used tiles are removed once the cache grows past its size limit. Each
+process counts the tiles on disk when it first needs to and the tiles it writes itself, so
+the limit holds per web process: with several workers sharing the directory it can grow
+to about that many times the limit. Tiles older than the TTL are revalidated upstream
+with If-None-Match/If-Modified-Since, and are served stale if the tile source cannot be
+reached. Concurrent misses for the same tile share a single upstream request.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+
+import requests
+from django.conf import settings
+
+_TILESETS = getattr(
+    settings, "MAP_TILESETS", {"osm": "https://tile.openstreetmap.org/{z}/{x}/{y}.png"}
+)
+_CACHE_DIR = getattr(
+    settings, "MAP_TILE_CACHE_DIR", os.path.join(settings.BASE_DIR, "tile_cache")
+)
+_CACHE_MAX_BYTES = getattr(settings, "MAP_TILE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+_CACHE_TTL = getattr(settings, "MAP_TILE_CACHE_TTL", 7 * 24 * 60 * 60)
+_MAX_TILE_BYTES = getattr(settings, "MAP_TILE_MAX_BYTES", 1024 * 1024)
+_UPSTREAM_TIMEOUT = getattr(settings, "MAP_TILE_UPSTREAM_TIMEOUT", 10)
+_USER_AGENT = getattr(settings, "MAP_TILE_USER_AGENT", "Soundscape Authoring Tool")
+
+
+class TileNotFound(Exception):
+    """The tile source has no tile at the requested coordinates."""
+
+
+class TileUnavailable(Exception):
+    """The tile source failed and no cached copy of the tile exists."""
+
+
+@dataclass(frozen=True)
+class Tile:
+    content: bytes
+    content_type: str
+    etag: str  # Strong validator for our clients, derived from the content.
+    fetched: float
+    upstream_etag: str | None = None
+    upstream_last_modified: str | None = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched < ttl
+
+
+def _content_etag(content: bytes) -> str:
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class TileCache:
+    """
+    Fetches tiles from the XYZ URL templates in *tilesets* and keeps them in *directory*.
+    """
+
+    def __init__(
+        self,
+        tilesets: dict | None = None,
+        directory: str | None = None,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+        timeout: float | None = None,
+    ):
+        self.tilesets = dict(_TILESETS if tilesets is None else tilesets)
+        self.directory = directory or _CACHE_DIR
+        self.max_bytes = _CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = _CACHE_TTL if ttl is None else ttl
+        self.timeout = _UPSTREAM_TIMEOUT if timeout is None else timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # Cached tile paths from least to most recently used, with their sizes. Built from
+        # the directory on first use, ordered by modification time, which hits refresh.
+        self._index = None
+        self._total_bytes = 0
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = _USER_AGENT
+
+    def get(self, tileset: str, z: int, x: int, y: int) -> Tile:
+        """
+        Returns the tile, from the cache when it is fresh. Raises TileNotFound when the
+        tile source has no such tile and TileUnavailable when it cannot be fetched.
+        """
+        key = (tileset, z, x, y)
+        cached = self._read(key)
+        if cached is not None and cached.is_fresh(self.ttl):
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            tile = self._fetch(key, cached)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(tile)
+            return tile
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _path(self, key) -> str:
+        tileset, z, x, y = key
+        return os.path.join(self.directory, tileset, str(z), str(x), str(y))
+
+    def _fetch(self, key, stale: Tile | None) -> Tile:
+        tileset, z, x, y = key
+        url = self.tilesets[tileset].format(z=z, x=x, y=y)
+        headers = {}
+        if stale is not None:
+            if stale.upstream_etag:
+                headers["If-None-Match"] = stale.upstream_etag
+            if stale.upstream_last_modified:
+                headers["If-Modified-Since"] = stale.upstream_last_modified
+
+        try:
+            response = self._session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            )
+        except requests.RequestException as exc:
+            if stale is not None:
+                return stale
+            raise TileUnavailable(str(exc)) from exc
+
+        try:
+            if response.status_code == 304 and stale is not None:
+                tile = replace(stale, fetched=time.time())
+            elif response.status_code == 200:
+                chunks = []
+                downloaded = 0
+                for chunk in response.iter_content(chunk_size=65536):
+                    downloaded += len(chunk)
+                    if downloaded > _MAX_TILE_BYTES:
+                        raise TileUnavailable("Tile exceeds the maximum allowed size")
+                    chunks.append(chunk)
+                content = b"".join(chunks)
+                tile = Tile(
+                    content=content,
+                    content_type=response.headers.get("Content-Type", "image/png"),
+                    etag=_content_etag(content),
+                    fetched=time.time(),
+                    upstream_etag=response.headers.get("ETag"),
+                    upstream_last_modified=response.headers.get("Last-Modified"),
+                )
+            elif response.status_code == 404:
+                raise TileNotFound(url)
+            elif stale is not None:
+                return stale
+            else:
+                raise TileUnavailable(f"Tile source returned {response.status_code}")
+        except requests.RequestException as exc:
+            if stale is not None:
+                return stale
+            raise TileUnavailable(str(exc)) from exc
+        finally:
+            response.close()
+
+        self._write(key, tile)
+        return tile
+
+    def _read(self, key) -> Tile | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                header = json.loads(file.readline())
+                content = file.read()
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return Tile(content=content, **header)
+
+    def _write(self, key, tile: Tile) -> None:
+        path = self._path(key)
+        header = {
+            "content_type": tile.content_type,
+            "etag": tile.etag,
+            "fetched": tile.fetched,
+            "upstream_etag": tile.upstream_etag,
+            "upstream_last_modified": tile.upstream_last_modified,
+        }
+        data = json.dumps(header).encode() + b"\n" + tile.content
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # A read-only or full disk only costs us the cache.
+            return
+        self._track(path, len(data))
+
+    def _scan_index(self) -> OrderedDict:
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        return OrderedDict((path, size) for _, path, size in entries)
+
+    def _ensure_index(self) -> None:
+        # The directory is walked without holding the lock, so tile requests are not held
+        # up by a large cache; when several threads race, the first index built is kept.
+        if self._index is not None:
+            return
+        index = self._scan_index()
+        with self._lock:
+            if self._index is None:
+                self._index = index
+                self._total_bytes = sum(index.values())
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._ensure_index()
+        with self._lock:
+            if path in self._index:
+                self._index.move_to_end(path)
+
+    def _track(self, path: str, size: int) -> None:
+        self._ensure_index()
+        with self._lock:
+            self._total_bytes += size - self._index.pop(path, 0)
+            self._index[path] = size
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_path, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+tile_cache = TileCache()
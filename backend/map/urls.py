@@ -3,8 +3,8 @@
 
 from django.urls import path
 
-from .views import map
+from .views import tile
 
 urlpatterns = [
-    path('', map)
+    path('tiles/<slug:tileset>/<int:z>/<int:x>/<int:y>', tile),
 ]
@@ -2,62 +2,43 @@
 # Licensed under the MIT License.
 # Copyright (c) Soundscape Community Contributors.
 
-# commenting out all azure stuff
-
-# import os
-# import requests
-# from http import HTTPStatus
-# from django.views.decorators.http import require_http_methods
-# from django.http import HttpResponse
-
-# AZURE_MAPS_SUBSCRIPTION_KEY = os.environ.get('AZURE_MAPS_SUBSCRIPTION_KEY')
-# if AZURE_MAPS_SUBSCRIPTION_KEY == None:
-#     raise Exception('Invalid Azure Maps subscription key')
-
-
-# @require_http_methods(["GET"])
-# def map(request):
-#     """
-#     Returns a map tile from Azure Maps.
-
-#     Soundscape Authoring is a publicly exposed application, so we use server-to-server
-#     access to Azure Maps REST APIs so the subscription key can be securely stored.
-
-#     More info: https://docs.microsoft.com/en-us/rest/api/maps/render-v2/get-map-tile 
-#     """
-#     x = request.GET.get('x')
-#     y = request.GET.get('y')
-#     zoom = request.GET.get('zoom')
-
-#     if x == None or y == None or zoom == None:
-#         return HttpResponse('Missing required parameters', status=HTTPStatus.BAD_REQUEST)
-
-#     tileset_id = request.GET.get('tileset_id', "microsoft.base.road")
-#     tile_size = request.GET.get('tile_size', "256")
-#     language = request.GET.get('language', "en-US")
-#     view = request.GET.get('view', "Auto")
-
-#     params = {
-#         'api-version': '2.1',
-#         'subscription-key': AZURE_MAPS_SUBSCRIPTION_KEY,
-#         'tilesetId': tileset_id,
-#         'tileSize': tile_size,
-#         'language': language,
-#         'view': view,
-#         'zoom': zoom,
-#         'x': x,
-#         'y': y
-#     }
-
-#     tile_response = requests.get("https://atlas.microsoft.com/map/tile", params)
-
-#     response = HttpResponse()
-#     response.status_code = tile_response.status_code
-#     response.content = tile_response.content
-
-#     for header_key in ["Cache-Control", "Content-Length", "Content-Type", "Date", "ETag", "Expires"]:
-#         header_value = tile_response.headers.get(header_key)
-#         if header_value != None:
-#             response.headers[header_key] = header_value
-
-#     return response
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_http_methods
+
+from .tiles import TileNotFound, TileUnavailable, tile_cache
+
+_MAX_ZOOM = getattr(settings, 'MAP_TILE_MAX_ZOOM', 19)
+_MAX_AGE = getattr(settings, 'MAP_TILE_MAX_AGE', 24 * 60 * 60)  # seconds
+
+
+@require_http_methods(["GET", "HEAD"])
+def tile(request, tileset, z, x, y):
+    """Returns a map tile from the configured tile source.
+
+    Tiles are proxied through an on-disk cache so that the tile source sees one request per
+    tile rather than one per user, and can be replaced without changing the frontend. Only
+    signed-in users are served, so the proxy is not an open relay to the tile source.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponse('Authentication credentials were not provided.', status=HTTPStatus.FORBIDDEN)
+
+    if tileset not in tile_cache.tilesets or z > _MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        raise Http404('Tile not found')
+
+    try:
+        cached = tile_cache.get(tileset, z, x, y)
+    except TileNotFound as exc:
+        raise Http404('Tile not found') from exc
+    except TileUnavailable:
+        return HttpResponse('Tile source unavailable', status=HTTPStatus.BAD_GATEWAY)
+
+    response = get_conditional_response(request, etag=cached.etag)
+    if response is None:
+        response = HttpResponse(cached.content, content_type=cached.content_type)
+    response['ETag'] = cached.etag
+    patch_cache_control(response, private=True, max_age=_MAX_AGE)
+    return response
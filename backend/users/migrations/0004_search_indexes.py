@@ -0,0 +1,45 @@
+# Copyright (c) Soundscape Community Contributors.
+
+from django.db import migrations
+
+# (model, column) pairs searched by api.search.ranked_search.
+SEARCHED_COLUMNS = [("User", "username"), ("Team", "name")]
+
+
+def _indexes(apps, schema_editor):
+    for model_name, column in SEARCHED_COLUMNS:
+        table = apps.get_model("users", model_name)._meta.db_table
+        yield table, column, f"{table}_{column}_search"
+
+
+def create_search_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    postgresql = schema_editor.connection.vendor == "postgresql"
+    if postgresql:
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column, name in _indexes(apps, schema_editor):
+        if postgresql:
+            # Serves Django's UPPER(column) LIKE lookups: icontains and istartswith.
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} USING gin (UPPER({quote(column)}) gin_trgm_ops)"
+            )
+        else:
+            # Serves prefix searches as a range over LOWER(column).
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} (LOWER({quote(column)}))"
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    for _, _, name in _indexes(apps, schema_editor):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_team_teammembership"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -52,6 +52,8 @@ export default class App extends React.Component {
 
       user: {},
       activities: [], // Holds activities metadata excluding waypoints
+      activitiesCursor: null, // Cursor of the next page of activities, null after the last page
+      loadingMoreActivities: false,
       folders: [],
       selectedFolderId: null,
       selectedActivity: null, // Holds the selected activity including it's waypoints
@@ -97,6 +99,7 @@ export default class App extends React.Component {
     // Activities
 
     this.showActivities = this.showActivities.bind(this);
+    this.loadMoreActivities = this.loadMoreActivities.bind(this);
     this.activitySelected = this.activitySelected.bind(this);
     this.activityCreated = this.activityCreated.bind(this);
     this.activityImported = this.activityImported.bind(this);
@@ -269,9 +272,10 @@ export default class App extends React.Component {
     const toastId = showLoading('Loading activities...');
 
     API.getActivities(this.state.selectedFolderId)
-      .then((activities) => {
+      .then(({ activities, cursor }) => {
         this.setState({
           activities,
+          activitiesCursor: cursor,
           selectedActivityIds: selectedActivityIds.filter((id) =>
             activities.some((activity) => activity.id === id),
           ),
@@ -287,6 +291,32 @@ export default class App extends React.Component {
       });
   }
 
+  loadMoreActivities() {
+    const { activitiesCursor, selectedFolderId } = this.state;
+    if (!activitiesCursor || this.state.loadingMoreActivities) {
+      return;
+    }
+
+    this.setState({ loadingMoreActivities: true });
+    API.getActivities(selectedFolderId, { cursor: activitiesCursor })
+      .then(({ activities, cursor }) => {
+        this.setState((prevState) => {
+          // Ignore a page that arrives after another folder was selected.
+          if (prevState.selectedFolderId !== selectedFolderId) {
+            return null;
+          }
+          return { activities: [...prevState.activities, ...activities], activitiesCursor: cursor };
+        });
+      })
+      .catch((error) => {
+        error.title = 'Error loading activities';
+        showError(error);
+      })
+      .finally(() => {
+        this.setState({ loadingMoreActivities: false });
+      });
+  }
+
   showActivities() {
     this.setState({
       selectedActivity: null,
@@ -409,7 +439,9 @@ export default class App extends React.Component {
 
     for (let i = 0; i < folderIds.length; i += BATCH_SIZE) {
       const batch = folderIds.slice(i, i + BATCH_SIZE);
-      const settledResults = await Promise.allSettled(batch.map((id) => API.getActivities(id)));
+      const settledResults = await Promise.allSettled(
+        batch.map((id) => API.getAllActivities(id, { omit: ['description', 'image_alt'] })),
+      );
       settledResults.forEach((result, index) => {
         const currentFolderId = batch[index];
         if (result.status === 'fulfilled') {
@@ -890,6 +922,9 @@ export default class App extends React.Component {
                   ) : (
                     <ActivitiesTable
                       activities={this.state.activities}
+                      hasMoreActivities={Boolean(this.state.activitiesCursor)}
+                      loadingMoreActivities={this.state.loadingMoreActivities}
+                      onLoadMoreActivities={this.loadMoreActivities}
                       folders={this.state.folders}
                       selectedFolderId={this.state.selectedFolderId}
                       selectedActivityIds={this.state.selectedActivityIds}
@@ -22,6 +22,8 @@ axios.interceptors.response.use(
   },
 );
 
+const IMPORT_JOB_POLL_INTERVAL = 1000; // ms
+
 const multipartRequestConfig = {
   headers: {
     'content-type': 'multipart/form-data',
@@ -61,15 +63,51 @@ class API {
 
   // Activities
 
-  async getActivities(folderId = null) {
+  // One page of the list, newest first. Pass the returned cursor to get the next page;
+  // it is null after the last one.
+  async getActivities(folderId = null, { omit = [], cursor = null } = {}) {
     const params = {};
     if (folderId === null) {
       params.folder_id = 'none';
     } else if (folderId) {
       params.folder_id = folderId;
     }
-    return axios.get('activities/', { params }).then((data) => {
-      return data.map((data) => new Activity(data));
+    if (omit.length > 0) {
+      params.omit = omit.join(',');
+    }
+    if (cursor) {
+      params.cursor = cursor;
+    }
+
+    const page = await axios.get('activities/', { params });
+    return {
+      activities: page.results.map((data) => new Activity(data)),
+      cursor: page.next ? new URL(page.next, window.location.origin).searchParams.get('cursor') : null,
+    };
+  }
+
+  // Every activity in a folder, for operations that must see all of them.
+  async getAllActivities(folderId = null, { omit = [] } = {}) {
+    const activities = [];
+    let cursor = null;
+    do {
+      const page = await this.getActivities(folderId, { omit, cursor });
+      activities.push(...page.activities);
+      cursor = page.cursor;
+    } while (cursor);
+    return activities;
+  }
+
+  async searchActivities(query) {
+    return axios.get('activities/search/', { params: { q: query } }).then((data) => {
+      return data.results.map((data) => new Activity(data));
+    });
+  }
+
+  // bounds is [minLon, minLat, maxLon, maxLat]; results are nearest to its centre first.
+  async getActivitiesInBounds(bounds) {
+    return axios.get('activities/', { params: { bbox: bounds.join(',') } }).then((data) => {
+      return data.results.map((data) => new Activity(data));
     });
   }
 
@@ -95,10 +133,17 @@ class API {
   }
 
   async importActivity(gpx) {
+    // Imports run in the background; poll the job until it finishes.
     const formData = objectToFormData({ gpx });
-    return axios.post('activities/import_gpx/', formData, multipartRequestConfig).then((data) => {
-      return new Activity(data);
-    });
+    let job = await axios.post('import_jobs/', formData, multipartRequestConfig);
+    while (job.status !== 'succeeded') {
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Import failed');
+      }
+      await new Promise((resolve) => setTimeout(resolve, IMPORT_JOB_POLL_INTERVAL));
+      job = await axios.get(`import_jobs/${job.id}/`);
+    }
+    return this.getActivity(job.activity);
   }
 
   async updateActivity(activity) {
@@ -193,13 +238,17 @@ class API {
 
   // Users
 
-  async searchUsers(search = '') {
-    const params = search ? { search } : {};
+  async searchUsers(search = '', { prefix = false } = {}) {
+    const params = search ? { [prefix ? 'prefix' : 'search']: search } : {};
     return axios.get('users/', { params });
   }
 
   // Waypoints
 
+  async getWaypointsInBounds(bounds) {
+    return axios.get('waypoints/', { params: { bbox: bounds.join(',') } });
+  }
+
   async createWaypoint(waypoint) {
     // We use FormData as the object may contain a file (featured image)
     const formData = objectToFormData(waypoint);
@@ -220,6 +269,14 @@ class API {
     return axios.post(`waypoint_groups/${waypointGroupId}/reverse_order/`);
   }
 
+  async reorderWaypointGroup(waypointGroupId, waypointIds) {
+    return axios.post(`waypoint_groups/${waypointGroupId}/reorder/`, { waypoints: waypointIds });
+  }
+
+  async batchWaypoints(waypointGroupId, operations) {
+    return axios.post(`waypoint_groups/${waypointGroupId}/waypoints/batch/`, { operations });
+  }
+
   async makeWaypointGroupReturnRoute(waypointGroupId) {
     return axios.post(`waypoint_groups/${waypointGroupId}/make_return_route/`);
   }
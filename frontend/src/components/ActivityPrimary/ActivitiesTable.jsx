@@ -232,6 +232,18 @@ export default function ActivitiesTable(props) {
           <ListGroup className="border-bottom" variant="flush">
             {props.activities.length > 0 ? activityRows : <ActivityRowEmpty key="empty-row-activity" />}
           </ListGroup>
+          {props.hasMoreActivities && (
+            <div className="p-3 text-center">
+              <Button
+                size="sm"
+                variant="outline-primary"
+                onClick={props.onLoadMoreActivities}
+                disabled={props.loadingMoreActivities}
+              >
+                {props.loadingMoreActivities ? 'Loading…' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </div>
       </div>
     </>
@@ -27,7 +27,8 @@ import Activity from '../../data/Activity';
 const DEFAULT_MAP_BOUNDS = [[47.64203029829583, -122.14126189681534]];
 
 const OSM_ATTR = {
-  url: 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+  // Tiles are proxied and cached by the backend; see MAP_TILESETS in the Django settings.
+  url: import.meta.env.VITE_MAP_TILE_URL || '/map/tiles/osm/{z}/{x}/{y}',
   attribution:
     '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
   referrerPolicy: 'strict-origin-when-cross-origin',
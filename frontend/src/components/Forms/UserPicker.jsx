@@ -32,7 +32,7 @@ export default function UserPicker({ value, onChange, placeholder = 'Search user
     const requestId = searchRequestIdRef.current + 1;
     searchRequestIdRef.current = requestId;
     setIsLoading(true);
-    API.searchUsers(query)
+    API.searchUsers(query, { prefix: true })
       .then((users) => {
         if (searchRequestIdRef.current !== requestId) {
           return;
@@ -21,7 +21,7 @@ export default defineConfig({
         xfwd: true,
         changeOrigin: false,
       },
-      '^(/admin|/api|/api-auth|/dj-rest-auth|/files|/.auth)/.*': {
+      '^(/admin|/api|/api-auth|/dj-rest-auth|/files|/map|/.auth)/.*': {
         target: 'http://localhost:8000',
         xfwd: true,
         changeOrigin: true